@@ -0,0 +1,115 @@
+// draw the curves and surfaces of a catalog record with BokehJS
+// the data is from the detail page endpoints, see pvfree/plots.py
+function plotCurves(curves, target) {
+  var fig = Bokeh.Plotting.figure({
+    title: curves.title,
+    x_axis_label: curves.x_label,
+    y_axis_label: curves.y_label,
+    width: 800, height: 600, sizing_mode: 'scale_width'
+  });
+  curves.lines.forEach(function(line, n) {
+    fig.line({
+      x: line.x, y: line.y, line_color: curves.colors[n], line_width: 4,
+      legend_label: line.label
+    });
+  });
+  // markers have one point per line, in the same colors
+  curves.markers.forEach(function(m) {
+    fig.scatter({
+      x: m.x, y: m.y, size: 15, color: curves.colors, marker: m.marker
+    });
+  });
+  $(target).empty();
+  Bokeh.Plotting.show(fig, target);
+}
+
+function drawCurves(url, target) {
+  $.getJSON(url, function(curves) {
+    plotCurves(curves, target);
+  });
+}
+
+// extent of an image with pixel centers at values
+function pixelExtent(values) {
+  var n = values.length;
+  var step = n > 1 ? (values[n - 1] - values[0]) / (n - 1) : 1;
+  return [values[0] - step / 2, values[n - 1] + step / 2];
+}
+
+function drawSurface(url, target) {
+  $.getJSON(url, function(surface) {
+    var xs = pixelExtent(surface.x);
+    var ys = pixelExtent(surface.y);
+    var fig = Bokeh.Plotting.figure({
+      title: surface.title,
+      x_axis_label: surface.x_label,
+      y_axis_label: surface.y_label,
+      x_range: xs, y_range: ys,
+      width: 800, height: 600, sizing_mode: 'scale_width'
+    });
+    var mapper = new Bokeh.LinearColorMapper({
+      palette: surface.palette, low: surface.low, high: surface.high
+    });
+    fig.image({
+      image: [surface.z], x: xs[0], y: ys[0], dw: xs[1] - xs[0],
+      dh: ys[1] - ys[0], color_mapper: mapper
+    });
+    fig.add_layout(
+      new Bokeh.ColorBar({color_mapper: mapper, title: surface.z_label}),
+      'right');
+    fig.add_tools(new Bokeh.HoverTool({tooltips: [
+      [surface.x_label, '$x'], [surface.y_label, '$y'],
+      [surface.z_label, '@image']
+    ]}));
+    $(target).empty();
+    Bokeh.Plotting.show(fig, target);
+  });
+}
+
+// draw the curves, and switch to the surface with the plot mode buttons
+function setupPlots(curvesUrl, surfaceUrl, target) {
+  function draw() {
+    var mode = $('.plot-mode.active').data('mode');
+    if (mode === 'surface') {
+      var shape = $('#surface-shape').val().split('x');
+      drawSurface(surfaceUrl + '?' + $.param({ny: shape[0], nx: shape[1]}),
+                  target);
+    } else {
+      drawCurves(curvesUrl, target);
+    }
+  }
+  $('.plot-mode').on('click', function() {
+    $('.plot-mode').removeClass('active');
+    $(this).addClass('active');
+    $('#surface-shape').toggle($(this).data('mode') === 'surface');
+    draw();
+  });
+  $('#surface-shape').on('change', draw);
+  draw();
+}
+
+// overlaid curves of several records, and a table of their parameters with
+// the rows that differ highlighted
+function drawComparison(url, detailUrl, target, table) {
+  $.getJSON(url, function(comparison) {
+    plotCurves(comparison.curves, target);
+    var head = $('<tr>').append($('<th>').text('Name'));
+    comparison.records.forEach(function(record, n) {
+      head.append($('<th>').append(
+        $('<a>').attr('href', detailUrl + record.id + '/').text(record.Name)
+          .css('color', comparison.curves.colors[n])));
+    });
+    var body = $('<tbody>');
+    comparison.params.forEach(function(param) {
+      var row = $('<tr>').toggleClass('warning', param.differs)
+        .append($('<td>').append($('<b>').text(param.name)));
+      param.values.forEach(function(value) {
+        row.append($('<td>').text(value === null ? '' : value));
+      });
+      body.append(row);
+    });
+    $(table).empty().append($('<thead>').append(head), body);
+  }).fail(function(xhr) {
+    $(target).text(xhr.responseJSON ? xhr.responseJSON.error : xhr.statusText);
+  });
+}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from parameters.models import PVInverter, PVModule, CEC_Module
+from parameters.models import PVInverter, PVModule, CEC_Module, UploadJob
 from itertools import chain
 
 
@@ -97,20 +97,28 @@ class PVInverterAdmin(admin.ModelAdmin):
         'Name', 'Source', 'Manufacturer', 'Vintage', 'SAM_Version',
         'Vac', 'Paco', 'Vdco', 'Pdco', 'Pso', 'C0', 'C1', 'C2', 'C3',
         'Vdcmax', 'Idcmax', 'Mppt_low', 'Mppt_high', 'Pnt', 'CEC_Date',
-        'CEC_Type', 'created_on', 'modified_on'
+        'CEC_Type', 'cec_efficiency', 'euro_efficiency', 'created_on',
+        'modified_on'
     )
     search_fields = ('Name',)
-    list_filter = ('SAM_Version', VacRangeFilter, PacoRangeFilter)
+    list_filter = (
+        'SAM_Version', 'Source', VacRangeFilter, PacoRangeFilter)
     fields = (
         'Name', ('Vac', 'Paco'), ('Vdco', 'Pdco'), ('C0', 'C1'), ('C2', 'C3'),
         ('Pso', 'Pnt'), ('Vdcmax', 'Idcmax'), ('Mppt_low', 'Mppt_high'),
-        ('CEC_Date', 'CEC_Type'), 'SAM_Version', ('created_by', 'modified_by'))
+        ('CEC_Date', 'CEC_Type'), 'SAM_Version',
+        ('Manufacturer', 'Vintage', 'Source'),
+        ('cec_efficiency', 'euro_efficiency'), ('created_by', 'modified_by'))
+    readonly_fields = (
+        'Manufacturer', 'Vintage', 'Source', 'cec_efficiency',
+        'euro_efficiency')
 
 
 class PVModuleAdmin(admin.ModelAdmin):
     list_display = ('Name', 'nameplate', 'Vintage', 'Material',
-                    'Isco', 'Voco', 'Impo', 'Vmpo', 'created_on',
-                    'modified_on')
+                    'Isco', 'Voco', 'Impo', 'Vmpo', 'fill_factor',
+                    'module_eff', 'noct', 'low_irradiance_eff', 'pmp_noct',
+                    'created_on', 'modified_on')
     fields = (
         'Name', ('Vintage', 'is_vintage_estimated'),
         ('Area', 'Material'), ('Cells_in_Series', 'Parallel_Strings'),
@@ -120,8 +128,13 @@ class PVModuleAdmin(admin.ModelAdmin):
         ('A0', 'A1', 'A2', 'A3', 'A4'),
         ('B0', 'B1', 'B2', 'B3', 'B4', 'B5'),
         ('N', 'DTC', 'FD'), ('A', 'B'),
+        ('nameplate', 'fill_factor', 'module_eff', 'noct'),
+        ('low_irradiance_eff', 'pmp_noct'),
         'Notes', ('created_by', 'modified_by')
     )
+    readonly_fields = (
+        'nameplate', 'fill_factor', 'module_eff', 'noct',
+        'low_irradiance_eff', 'pmp_noct')
     search_fields = ('Name',)
     list_filter = ('Material',)
 
@@ -129,20 +142,32 @@ class PVModuleAdmin(admin.ModelAdmin):
 class CEC_ModuleAdmin(admin.ModelAdmin):
     list_display = (
         'Name', 'nameplate', 'Date', 'Technology', 'Version', 'I_sc_ref',
-        'V_oc_ref', 'I_mp_ref', 'V_mp_ref', 'created_on', 'modified_on')
+        'V_oc_ref', 'I_mp_ref', 'V_mp_ref', 'low_irradiance_eff',
+        'pmp_noct', 'created_on', 'modified_on')
     fields = (
         ('Name', 'Manufacturer'), ('Date', 'Version'),
         ('Technology', 'Bifacial', 'BIPV'), ('Length', 'Width'),
         ('A_c', 'N_s'), ('I_sc_ref', 'V_oc_ref'), ('I_mp_ref', 'V_mp_ref'),
         ('I_L_ref', 'I_o_ref'), ('alpha_sc', 'beta_oc'), ('R_s', 'R_sh_ref'),
         ('a_ref', 'gamma_r'), ('Adjust', 'T_NOCT'), ('PTC', 'STC'),
+        ('nameplate', 'low_irradiance_eff', 'pmp_noct'),
         ('created_by', 'modified_by'))
+    readonly_fields = ('nameplate', 'low_irradiance_eff', 'pmp_noct')
     search_fields = ('Name',)
     # TODO: make a ManufacturerRangeFilter
     list_filter = ('Technology', 'BIPV', 'Bifacial', 'Version')
 
 
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'file_name', 'model', 'status', 'rows', 'created', 'duplicate',
+        'failed', 'user', 'created_on', 'finished_on')
+    list_filter = ('status', 'model')
+    readonly_fields = [f.name for f in UploadJob._meta.fields]
+
+
 # Register your models here.
 admin.site.register(PVInverter, PVInverterAdmin)
 admin.site.register(PVModule, PVModuleAdmin)
 admin.site.register(CEC_Module, CEC_ModuleAdmin)
+admin.site.register(UploadJob, UploadJobAdmin)
@@ -1,6 +1,11 @@
 from django.contrib.auth.models import User
+from django.http import HttpResponse
+from parameters.cache import cached_result, result_key
 from parameters.models import PVInverter, PVModule, CEC_Module
+from parameters.pagination import KeysetPaginator
+from parameters.versions import parse_version
 from tastypie import fields
+from tastypie.exceptions import BadRequest
 from tastypie.resources import ModelResource, ALL, ALL_WITH_RELATIONS
 from tastypie.authorization import DjangoAuthorization
 from tastypie.authentication import ApiKeyAuthentication
@@ -33,11 +38,67 @@ class UserResource(ModelResource):
         allowed_methods = ['get']
 
 
-class PVInverterResource(ModelResource):
+class CachedListResource(ModelResource):
+    """
+    Model resource with list responses cached by query string and format
+    until the next write to the model. Lists are of the latest SAM library
+    version, unless the ``version`` argument is ``all`` or a version number.
+
+    Identical records of several versions are stored once, so the version
+    field of a record, *EG*: ``SAM_Version``, is the first version it
+    appeared in. Its newest version is ``latest_version``, and ``versions``
+    lists every version it's part of.
+    """
+
+    def apply_filters(self, request, applicable_filters):
+        model = self._meta.object_class
+        try:
+            version = parse_version(model, request.GET.get('version'))
+        except ValueError as exc:
+            raise BadRequest(str(exc))
+        return super().apply_filters(
+            request, applicable_filters).in_version(version)
+
+    def _version_name(self, version):
+        model = self._meta.object_class
+        return dict(model._meta.get_field(model.VERSION_FIELD).choices)[
+            version]
+
+    def dehydrate_latest_version(self, bundle):
+        return self._version_name(bundle.data['latest_version'])
+
+    def dehydrate_versions(self, bundle):
+        # memberships are prefetched with the records
+        return [
+            self._version_name(v) for v in sorted(
+                m.version for m in bundle.obj.memberships.all())]
+
+    def get_list(self, request, **kwargs):
+        model = self._meta.object_class
+        key = result_key(
+            model, 'api', self._meta.resource_name,
+            sorted(request.GET.lists()), self.determine_format(request),
+            kwargs)
+
+        get_list = super().get_list
+
+        def get_response():
+            # errors are raised, so they aren't cached
+            response = get_list(request, **kwargs)
+            return response.content, response['Content-Type']
+
+        content, content_type = cached_result(key, get_response)
+        return HttpResponse(content, content_type=content_type)
+
+
+class PVInverterResource(CachedListResource):
     created_by = fields.ForeignKey(UserResource, 'created_by')
     modified_by = fields.ForeignKey(UserResource, 'modified_by')
+    latest_version = fields.IntegerField(
+        attribute='latest_version', readonly=True)
+    versions = fields.ListField(readonly=True)
     class Meta:
-        queryset = PVInverter.objects.all()
+        queryset = PVInverter.objects.prefetch_related('memberships')
         filtering = {
             'created_by': ALL_WITH_RELATIONS,
             "Name": (
@@ -45,9 +106,19 @@ class PVInverterResource(ModelResource):
             ),
             "Vac": ('exact', 'lt', 'lte', 'gt', 'gte'),
             "Paco": ('exact', 'lt', 'lte', 'gt', 'gte'),
+            "Manufacturer": (
+                'exact', 'iexact', 'istartswith', 'icontains', 'iendswith'
+            ),
+            "Vintage": ('exact', 'year', 'lt', 'lte', 'gt', 'gte'),
+            "Source": ('exact', 'iexact'),
+            "cec_efficiency": ('exact', 'lt', 'lte', 'gt', 'gte', 'isnull'),
+            "euro_efficiency": ('exact', 'lt', 'lte', 'gt', 'gte', 'isnull'),
         }
+        ordering = [
+            'Name', 'Paco', 'Vintage', 'cec_efficiency', 'euro_efficiency']
         authorization = IsAuthenticatedOrReadOnly()
         authentication = ApiKeyAuthOrReadOnly()
+        paginator_class = KeysetPaginator
 
     def dehydrate_SAM_Version(self, bundle):
         samver = bundle.data['SAM_Version']
@@ -60,7 +131,7 @@ class PVInverterResource(ModelResource):
         return bundle
 
 
-class PVModuleResource(ModelResource):
+class PVModuleResource(CachedListResource):
     created_by = fields.ForeignKey(UserResource, 'created_by')
     modified_by = fields.ForeignKey(UserResource, 'modified_by')
     class Meta:
@@ -71,10 +142,20 @@ class PVModuleResource(ModelResource):
                 'iexact', 'istartswith', 'icontains', 'iregex', 'iendswith'
             ),
             "nameplate": ('exact', 'lt', 'lte', 'gt', 'gte'),
+            "fill_factor": ('exact', 'lt', 'lte', 'gt', 'gte'),
+            "module_eff": ('exact', 'lt', 'lte', 'gt', 'gte'),
+            "noct": ('exact', 'lt', 'lte', 'gt', 'gte'),
+            "low_irradiance_eff": (
+                'exact', 'lt', 'lte', 'gt', 'gte', 'isnull'),
+            "pmp_noct": ('exact', 'lt', 'lte', 'gt', 'gte', 'isnull'),
             "Vintage": ('year')
         }
+        ordering = [
+            'Name', 'nameplate', 'module_eff', 'low_irradiance_eff',
+            'pmp_noct']
         authorization = IsAuthenticatedOrReadOnly()
         authentication = ApiKeyAuthOrReadOnly()
+        paginator_class = KeysetPaginator
 
     def dehydrate_Material(self, bundle):
         celltype = bundle.data['Material']
@@ -85,11 +166,14 @@ class PVModuleResource(ModelResource):
         return bundle
 
 
-class CECModuleResource(ModelResource):
+class CECModuleResource(CachedListResource):
     created_by = fields.ForeignKey(UserResource, 'created_by')
     modified_by = fields.ForeignKey(UserResource, 'modified_by')
+    latest_version = fields.IntegerField(
+        attribute='latest_version', readonly=True)
+    versions = fields.ListField(readonly=True)
     class Meta:
-        queryset = CEC_Module.objects.all()
+        queryset = CEC_Module.objects.prefetch_related('memberships')
         filtering = {
             'created_by': ALL_WITH_RELATIONS,
             "Name": (
@@ -98,10 +182,17 @@ class CECModuleResource(ModelResource):
             "V_oc_ref": ('exact', 'lt', 'lte', 'gt', 'gte'),
             "I_sc_ref": ('exact', 'lt', 'lte', 'gt', 'gte'),
             "STC": ('exact', 'lt', 'lte', 'gt', 'gte'),
+            "nameplate": ('exact', 'lt', 'lte', 'gt', 'gte'),
+            "low_irradiance_eff": (
+                'exact', 'lt', 'lte', 'gt', 'gte', 'isnull'),
+            "pmp_noct": ('exact', 'lt', 'lte', 'gt', 'gte', 'isnull'),
         }
+        ordering = [
+            'Name', 'STC', 'nameplate', 'low_irradiance_eff', 'pmp_noct']
         max_limit = None
         authorization = IsAuthenticatedOrReadOnly()
         authentication = ApiKeyAuthOrReadOnly()
+        paginator_class = KeysetPaginator
 
     def dehydrate_Technology(self, bundle):
         cec_mod_tech = bundle.data['Technology']
@@ -0,0 +1,22 @@
+from django.apps import AppConfig
+from django.db.models import signals
+
+
+class ParametersConfig(AppConfig):
+    name = 'parameters'
+
+    def ready(self):
+        from parameters.models import PVInverter, PVModule, CEC_Module
+        from parameters.store import invalidate_store
+        from parameters.search import restore_search_indexes
+        from parameters.cache import bump_generation_receiver
+        # keep the in-memory parameter stores and cached queries in sync
+        # with the database, bumping the generation before the store sees
+        # the write
+        for model in (PVInverter, PVModule, CEC_Module):
+            signals.post_save.connect(bump_generation_receiver, sender=model)
+            signals.post_delete.connect(
+                bump_generation_receiver, sender=model)
+            signals.post_save.connect(invalidate_store, sender=model)
+            signals.post_delete.connect(invalidate_store, sender=model)
+        signals.post_migrate.connect(restore_search_indexes, sender=self)
@@ -0,0 +1,98 @@
+"""
+Shared cache of catalog queries, keyed by a per-model generation.
+
+Every write to a catalog table bumps the generation of its model, so cached
+values for older generations are never read again and expire on their own.
+The generation and the values use the Django cache, so they're shared by
+all processes if the cache backend is, and the backend evicts the least
+recently used values when it's full.
+"""
+import hashlib
+import json
+import time
+from django.core.cache import cache
+
+KEY_PREFIX = 'parameters'
+TIMEOUT = 24 * 60 * 60  # [s]
+RESULT_TIMEOUT = 60 * 60  # [s]
+
+
+def _generation_key(model):
+    return f'{KEY_PREFIX}:{model._meta.label_lower}:generation'
+
+
+def generation(model):
+    """Current generation of ``model``."""
+    key = _generation_key(model)
+    gen = cache.get(key)
+    if gen is None:
+        # start from the clock so an evicted generation isn't reused
+        cache.add(key, time.time_ns(), timeout=None)
+        gen = cache.get(key)
+    return gen
+
+
+def bump_generation(model):
+    """Invalidate the cached values of ``model``."""
+    key = _generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # missing key
+        generation(model)
+
+
+def bump_generation_receiver(sender, **kwargs):
+    """Signal receiver for ``post_save`` and ``post_delete``."""
+    bump_generation(sender)
+
+
+def cache_key(model, *parts):
+    """Key of a cached value of ``model`` for the current generation."""
+    parts = ':'.join(str(p) for p in parts)
+    return (
+        f'{KEY_PREFIX}:{model._meta.label_lower}:{generation(model)}:{parts}')
+
+
+def table_total(model, version='all'):
+    """
+    Number of records of ``model`` in a SAM library ``version``, see
+    :meth:`~parameters.models.CatalogQuerySet.in_version`, cached until the
+    next write.
+    """
+    return cache.get_or_set(
+        cache_key(model, 'total', version),
+        model.objects.in_version(version).count, timeout=TIMEOUT)
+
+
+def normalize_search(text):
+    """
+    Search text with the same results as ``text``, so equivalent searches
+    share a cache key. Searches are case insensitive, so case and extra
+    whitespace are dropped.
+    """
+    return ' '.join((text or '').lower().split())
+
+
+def result_key(model, kind, *parts):
+    """
+    Key of a cached result of ``model`` for the current generation. The
+    parts can be any JSON values, *EG*: search text or query parameters, and
+    are hashed so the key is short and safe for any cache backend.
+    """
+    digest = hashlib.sha1(
+        json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return cache_key(model, kind, digest)
+
+
+def cached_result(key, compute, timeout=RESULT_TIMEOUT):
+    """
+    Cached value of ``key``, or call ``compute`` and cache the value unless
+    it's ``None``.
+    """
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout=timeout)
+    return value
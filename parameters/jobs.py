@@ -0,0 +1,165 @@
+"""
+Import SAM library uploads in a background thread, so large files don't time
+out the request. The upload is saved to a temporary file, and its
+:class:`~parameters.models.UploadJob` records the progress of the import for
+the upload page to poll.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from django.core.exceptions import FieldError
+from django.db import IntegrityError, connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from parameters.models import UploadJob
+
+LOGGER = logging.getLogger(__name__)
+
+# active jobs that haven't progressed for this long were interrupted, *EG*: by
+# a restart, and don't block uploads of the same file
+STALE_JOB = timedelta(minutes=10)
+
+# sent by the model of a job that finished, with the ``job`` and the ids of
+# the ``created`` records
+upload_finished = Signal()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _expire_jobs():
+    now = timezone.now()
+    with transaction.atomic():
+        stale = list(UploadJob.objects.select_for_update().filter(
+            status__in=UploadJob.ACTIVE,
+            modified_on__lt=now - STALE_JOB).values_list('pk', 'path'))
+        UploadJob.objects.filter(pk__in=[pk for pk, _ in stale]).update(
+            status=UploadJob.FAILED, message='Upload was interrupted.',
+            finished_on=now, modified_on=now)
+    # interrupted jobs don't remove their files
+    for _, path in stale:
+        _remove_file(path)
+    if stale:
+        LOGGER.warning('upload jobs interrupted: %d', len(stale))
+
+
+def start_upload(model, upload_file, user, sam_version=''):
+    """
+    Save an upload to a temporary file and create a pending job to import
+    it, unless the same file is already being imported into the same model.
+
+    :param model: name of the model in :attr:`UploadJob.MODELS`
+    :param upload_file: a Django ``UploadedFile``
+    :param sam_version: SAM version of inverter uploads
+    :returns: the job, and whether it was created or is the active job of
+        the same file
+    """
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix='pvfree-upload-', suffix='.csv')
+    with os.fdopen(fd, 'wb') as fp:
+        for chunk in upload_file.chunks():
+            digest.update(chunk)
+            fp.write(chunk)
+    key = {'model': model, 'sam_version': sam_version,
+           'sha256': digest.hexdigest()}
+    _expire_jobs()
+    while True:
+        # the unique constraint on active jobs settles concurrent uploads
+        try:
+            with transaction.atomic():
+                job = UploadJob.objects.create(
+                    user=user, file_name=upload_file.name, path=path,
+                    size=os.path.getsize(path), **key)
+            return job, True
+        except IntegrityError:
+            job = UploadJob.objects.filter(
+                status__in=UploadJob.ACTIVE, **key).first()
+            if job is not None:
+                os.remove(path)
+                return job, False
+            # the active job finished in the meantime, try again
+
+
+def run_upload(job_id):
+    """
+    Import the file of a pending job, recording the progress after each
+    batch. Each batch is committed separately, so the progress is visible
+    and a failed job keeps the records it created.
+
+    :returns: the finished job
+    """
+    jobs = UploadJob.objects.filter(pk=job_id)
+    job = jobs.select_related('user').get()
+    model = job.get_model()
+    # inverter uploads are for a SAM version
+    args = (job.sam_version or None,) if job.model == 'PVInverter' else ()
+    now = timezone.now()
+    jobs.update(status=UploadJob.RUNNING, started_on=now, modified_on=now)
+
+    def progress(summary, bytes_read, size):
+        failed = summary['failed']
+        created = len(summary['created'])
+        jobs.update(
+            bytes_read=bytes_read,
+            rows=(created + summary['duplicate'] + summary['unchanged']
+                  + len(failed)),
+            created=created, duplicate=summary['duplicate'],
+            unchanged=summary['unchanged'], failed=len(failed),
+            errors=failed[:UploadJob.MAX_ERRORS], modified_on=timezone.now())
+
+    try:
+        with open(job.path, 'rb') as fp:
+            summary = model.upload(
+                fp, job.user, *args, progress=progress, atomic=False)
+    except Exception as exc:
+        if isinstance(exc, (KeyError, FieldError)):
+            message = 'File "{}" has wrong format for {}. -- {}'.format(
+                job.file_name, job.get_model_display(), exc)
+        else:
+            LOGGER.exception('upload job %d failed', job_id)
+            message = 'Upload of file "{}" failed. -- {}'.format(
+                job.file_name, exc)
+        now = timezone.now()
+        jobs.update(
+            status=UploadJob.FAILED, message=message, finished_on=now,
+            modified_on=now)
+    else:
+        created = summary['created']
+        counts = [
+            f'{len(created)} created', f'{summary["duplicate"]} duplicate']
+        if model.VERSION_FIELD is not None:
+            counts.append(f'{summary["unchanged"]} unchanged')
+        counts.append(f'{len(summary["failed"])} failed')
+        message = 'Uploaded {} file "{}": {}.'.format(
+            job.get_model_display(), job.file_name, ', '.join(counts))
+        now = timezone.now()
+        jobs.update(
+            status=UploadJob.DONE, message=message, finished_on=now,
+            modified_on=now)
+        upload_finished.send(sender=model, job=job, created=created)
+    finally:
+        _remove_file(job.path)
+    return jobs.get()
+
+
+def _upload_thread(job_id):
+    try:
+        run_upload(job_id)
+    finally:
+        # the thread has its own connection
+        connection.close()
+
+
+def run_upload_async(job_id):
+    """Import the file of a pending job in a background thread."""
+    thread = threading.Thread(
+        target=_upload_thread, args=(job_id,), daemon=True)
+    thread.start()
+    return thread
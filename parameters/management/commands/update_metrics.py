@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from parameters.models import (
+    PVInverter, PVModule, CEC_Module, METRICS_BATCH_SIZE)
+
+MODELS = {
+    'pvinverters': PVInverter, 'pvmodules': PVModule,
+    'cec_modules': CEC_Module}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute the precomputed model metrics, EG: CEC weighted efficiency,'
+        ' for existing records.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables', nargs='*',
+            help=f'tables to update: {", ".join(MODELS)}, default is all')
+        parser.add_argument(
+            '--batch-size', type=int, default=METRICS_BATCH_SIZE,
+            help='number of records evaluated at once')
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='only update records without metrics')
+
+    def handle(self, *args, **options):
+        tables = options['tables'] or list(MODELS)
+        unknown = set(tables) - set(MODELS)
+        if unknown:
+            raise CommandError(f'unknown tables: {", ".join(sorted(unknown))}')
+        for table in tables:
+            model = MODELS[table]
+            pks = None
+            if options['missing']:
+                # metrics are NULL when the model can't be evaluated, so
+                # check all of them
+                missing = {f'{f}__isnull': True for f in model.METRIC_FIELDS}
+                pks = model.objects.filter(**missing).values_list(
+                    'pk', flat=True)
+            count = model.update_metrics(pks, options['batch_size'])
+            self.stdout.write(f'{table}: updated {count} records')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from parameters.management.commands.update_metrics import MODELS
+from pvfree.plots import warm_plots
+
+
+class Command(BaseCommand):
+    help = 'Cache the detail page plots of existing records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables', nargs='*',
+            help=f'tables to plot: {", ".join(MODELS)}, default is all')
+
+    def handle(self, *args, **options):
+        tables = options['tables'] or list(MODELS)
+        unknown = set(tables) - set(MODELS)
+        if unknown:
+            raise CommandError(f'unknown tables: {", ".join(sorted(unknown))}')
+        for table in tables:
+            count = warm_plots(MODELS[table])
+            self.stdout.write(f'{table}: cached {count} plots')
@@ -0,0 +1,120 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:40
+
+import datetime
+import re
+from django.db import migrations, models
+import numpy as np
+
+BATCH_SIZE = 1000
+MISSING_VINTAGE = 1990
+INVERTER_SOURCE = re.compile(r'\[(\w*) (\d{4})\]')
+
+
+def inverter_name_fields(name, cec_date):
+    """Copy of ``parameters.models.inverter_name_fields`` as of 0016."""
+    mfg = name.split(':', 1)[0]
+    if (cec_date is not None and cec_date.toordinal()
+            != datetime.date(MISSING_VINTAGE, 1, 1).toordinal()):
+        return {'Manufacturer': mfg, 'Vintage': cec_date, 'Source': 'CEC'}
+    match = INVERTER_SOURCE.search(name)
+    src, yr = "UNK", MISSING_VINTAGE
+    if match:
+        src, yr = match.groups()
+        try:
+            yr = int(yr)
+        except ValueError:
+            yr = MISSING_VINTAGE
+    return {
+        'Manufacturer': mfg, 'Vintage': datetime.date(yr, 1, 1),
+        'Source': src}
+
+
+def sapm_module_fields(Impo, Vmpo, Isco, Voco, Area, A, B, DTC):
+    """Copy of ``parameters.models.sapm_module_fields`` as of 0016."""
+    nameplate = Impo * Vmpo
+    pvmod_temp = 800.0 * np.exp(A + B*1.0) + 20.0
+    return {
+        'nameplate': nameplate, 'fill_factor': nameplate / Isco / Voco,
+        'module_eff': nameplate / Area / 1000.0,
+        'noct': pvmod_temp + 0.8*DTC}
+
+
+def backfill_derived_fields(apps, schema_editor):
+    PVInverter = apps.get_model('parameters', 'PVInverter')
+    PVModule = apps.get_model('parameters', 'PVModule')
+    CEC_Module = apps.get_model('parameters', 'CEC_Module')
+    pvinvs = list(PVInverter.objects.all())
+    for pvinv in pvinvs:
+        for k, v in inverter_name_fields(pvinv.Name, pvinv.CEC_Date).items():
+            setattr(pvinv, k, v)
+    PVInverter.objects.bulk_update(
+        pvinvs, ['Manufacturer', 'Vintage', 'Source'], batch_size=BATCH_SIZE)
+    pvmods = list(PVModule.objects.all())
+    if pvmods:
+        params = np.array([
+            (p.Impo, p.Vmpo, p.Isco, p.Voco, p.Area, p.A, p.B, p.DTC)
+            for p in pvmods], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            derived = sapm_module_fields(*params.T)
+        for n, pvmod in enumerate(pvmods):
+            for k, v in derived.items():
+                setattr(pvmod, k, float(v[n]))
+        PVModule.objects.bulk_update(
+            pvmods, list(derived), batch_size=BATCH_SIZE)
+    cec_mods = list(CEC_Module.objects.all())
+    for cec_mod in cec_mods:
+        cec_mod.nameplate = cec_mod.I_mp_ref * cec_mod.V_mp_ref
+    CEC_Module.objects.bulk_update(
+        cec_mods, ['nameplate'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0015_alter_pvinverter_sam_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cec_module',
+            name='nameplate',
+            field=models.FloatField(db_index=True, default=0.0, editable=False, verbose_name='Nameplate [W]'),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='Manufacturer',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='Source',
+            field=models.CharField(db_index=True, default='UNK', editable=False, max_length=25),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='Vintage',
+            field=models.DateField(db_index=True, default=datetime.date(1990, 1, 1), editable=False),
+        ),
+        migrations.AddField(
+            model_name='pvmodule',
+            name='fill_factor',
+            field=models.FloatField(db_index=True, default=0.0, editable=False, verbose_name='Fill Factor'),
+        ),
+        migrations.AddField(
+            model_name='pvmodule',
+            name='module_eff',
+            field=models.FloatField(db_index=True, default=0.0, editable=False, verbose_name='Module Efficiency'),
+        ),
+        migrations.AddField(
+            model_name='pvmodule',
+            name='nameplate',
+            field=models.FloatField(db_index=True, default=0.0, editable=False, verbose_name='Nameplate [W]'),
+        ),
+        migrations.AddField(
+            model_name='pvmodule',
+            name='noct',
+            field=models.FloatField(db_index=True, default=0.0, editable=False, verbose_name='NOCT [C]'),
+        ),
+        migrations.RunPython(
+            backfill_derived_fields, migrations.RunPython.noop),
+    ]
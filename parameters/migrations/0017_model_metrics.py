@@ -0,0 +1,43 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0016_derived_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cec_module',
+            name='low_irradiance_eff',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Relative efficiency at 200 [W/m2]'),
+        ),
+        migrations.AddField(
+            model_name='cec_module',
+            name='pmp_noct',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Power at NOCT [W]'),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='cec_efficiency',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='CEC weighted efficiency'),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='euro_efficiency',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Euro weighted efficiency'),
+        ),
+        migrations.AddField(
+            model_name='pvmodule',
+            name='low_irradiance_eff',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Relative efficiency at 200 [W/m2]'),
+        ),
+        migrations.AddField(
+            model_name='pvmodule',
+            name='pmp_noct',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True, verbose_name='Power at NOCT [W]'),
+        ),
+    ]
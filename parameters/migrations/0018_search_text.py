@@ -0,0 +1,139 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:47
+
+from datetime import datetime
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+# searched text fields, numbers, and choice field of each model, frozen as of
+# this migration, see PVBaseModel.get_search_text
+SEARCH_FIELDS = {
+    'PVInverter': (
+        ('Name', 'Manufacturer', 'Source', 'CEC_Type', 'CEC_Date'),
+        ('Vac', 'Paco', 'Vdco', 'Pdco', 'Pso', 'Pnt', 'Vdcmax', 'Idcmax',
+         'Mppt_low', 'Mppt_high'),
+        None),
+    'PVModule': (
+        ('Name', 'Vintage'),
+        ('Area', 'Cells_in_Series', 'Parallel_Strings', 'Isco', 'Voco',
+         'Impo', 'Vmpo', 'Aisc', 'Aimp', 'Bvoco', 'Bvmpo'),
+        'Material'),
+    'CEC_Module': (
+        ('Name', 'Manufacturer', 'Date'),
+        ('T_NOCT', 'A_c', 'N_s', 'I_sc_ref', 'V_oc_ref', 'I_mp_ref',
+         'V_mp_ref', 'STC'),
+        'Technology'),
+}
+
+
+def get_search_text(model, obj):
+    text_fields, number_fields, choice_field = SEARCH_FIELDS[model.__name__]
+    terms = [getattr(obj, f) for f in text_fields]
+    if choice_field is not None:
+        choices = dict(model._meta.get_field(choice_field).choices)
+        terms.append(choices.get(int(getattr(obj, choice_field))))
+    values = []
+    for value in terms:
+        if isinstance(value, datetime):
+            value = value.date()
+        if value is not None and value != '':
+            values.append(str(value))
+    for f in number_fields:
+        value = getattr(obj, f)
+        if value is not None and value != '':
+            values.append('%g' % float(value))
+    return ' '.join(values)
+
+
+def backfill_search_text(apps, schema_editor):
+    for name in SEARCH_FIELDS:
+        model = apps.get_model('parameters', name)
+        objs = list(model.objects.all())
+        for obj in objs:
+            obj.search_text = get_search_text(model, obj)
+        model.objects.bulk_update(
+            objs, ['search_text'], batch_size=BATCH_SIZE)
+
+
+def _sqlite_statements(table):
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"Name, search_text, content='{table}', content_rowid='id', "
+        f"tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} "
+        f"BEGIN INSERT INTO {fts}(rowid, Name, search_text) "
+        f"VALUES (new.id, new.Name, new.search_text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, Name, search_text) "
+        f"VALUES ('delete', old.id, old.Name, old.search_text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au "
+        f"AFTER UPDATE OF Name, search_text ON {table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, Name, search_text) "
+        f"VALUES ('delete', old.id, old.Name, old.search_text); "
+        f"INSERT INTO {fts}(rowid, Name, search_text) "
+        f"VALUES (new.id, new.Name, new.search_text); END",
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"]
+
+
+def _run(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name in SEARCH_FIELDS:
+        table = apps.get_model('parameters', name)._meta.db_table
+        if vendor == 'sqlite':
+            _run(schema_editor, _sqlite_statements(table))
+        elif vendor == 'postgresql':
+            _run(schema_editor, [
+                f"CREATE INDEX IF NOT EXISTS {table}_search_trgm ON {table} "
+                f"USING gin (UPPER(search_text) gin_trgm_ops)"])
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name in SEARCH_FIELDS:
+        table = apps.get_model('parameters', name)._meta.db_table
+        if vendor == 'sqlite':
+            fts = f'{table}_fts'
+            _run(schema_editor, [
+                f'DROP TRIGGER IF EXISTS {fts}_{suffix}'
+                for suffix in ('ai', 'ad', 'au')
+            ] + [f'DROP TABLE IF EXISTS {fts}'])
+        elif vendor == 'postgresql':
+            _run(schema_editor, [f'DROP INDEX IF EXISTS {table}_search_trgm'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0017_model_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cec_module',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='pvmodule',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        # needs a superuser, or the database owner if pg_trgm is a trusted
+        # extension, see parameters.search
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,164 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:50
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0018_search_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cec_module',
+            name='A_c',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='Date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='I_mp_ref',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='I_sc_ref',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='N_s',
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='PTC',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='STC',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='T_NOCT',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='Technology',
+            field=models.IntegerField(choices=[(0, ''), (1, '1-a-Si'), (2, '2-a-Si'), (3, '3-a-Si'), (4, 'CIGS'), (5, 'CIS'), (6, 'CdTe'), (7, 'HIT-Si'), (8, 'Mono-c-Si'), (9, 'Multi-c-Si'), (10, 'Thin Film'), (11, 'a-Si'), (12, 'a-Si/nc')], db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='V_mp_ref',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='V_oc_ref',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='cec_module',
+            name='Version',
+            field=models.IntegerField(blank=True, choices=[(0, ''), (1, 'MM105'), (2, 'MM106'), (3, 'MM107'), (4, 'NRELv1'), (5, 'SAM 2018.9.27'), (6, 'SAM 2018.10.29'), (7, 'SAM 2018.11.11'), (8, 'SAM 2018.11.11 r2'), (9, 'SAM 2019.12.19'), (10, 'SAM 2020.2.29 r3'), (11, 'SAM 2021.12.02'), (12, 'SAM 2023.10.31'), (13, 'SAM 2023.12.17')], db_index=True, default=0),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='CEC_Date',
+            field=models.DateField(db_index=True, default=datetime.datetime(1990, 1, 1, 0, 0)),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Idcmax',
+            field=models.FloatField(db_index=True, verbose_name='Max DC current [A]'),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Mppt_high',
+            field=models.FloatField(db_index=True, verbose_name='Higher bound of MPPT [W]'),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Mppt_low',
+            field=models.FloatField(db_index=True, verbose_name='Lower bound of MPPT [W]'),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Paco',
+            field=models.FloatField(db_index=True, verbose_name='Rated AC power [W]'),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Pdco',
+            field=models.FloatField(db_index=True, verbose_name='DC power [W]'),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='SAM_Version',
+            field=models.IntegerField(blank=True, choices=[(0, ''), (1, '2018.11.11.r2'), (2, '2018.11.11.r3-r4'), (3, '2020.2.29.r2.ssc.240'), (4, '2020.11.29.r0.ssc.250'), (5, '2021.12.02.r1.ssc.268'), (6, '2021.12.02.r2.ssc.274'), (7, '2022.11.21.r0.ssc.278'), (8, '2023.12.17.r0.ssc.288'), (9, '2024.12.12.r0.ssc.298')], db_index=True, default=0),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Vac',
+            field=models.FloatField(db_index=True, verbose_name='AC Voltage [V]'),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Vdcmax',
+            field=models.FloatField(db_index=True, verbose_name='Max DC voltage [V]'),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='Vdco',
+            field=models.FloatField(db_index=True, verbose_name='DC voltage [V]'),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Area',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Cells_in_Series',
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Impo',
+            field=models.FloatField(db_index=True, verbose_name='Max Power Current [A]'),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Isco',
+            field=models.FloatField(db_index=True, verbose_name='Short Circuit Current [A]'),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Material',
+            field=models.IntegerField(choices=[(0, ''), (1, '2-a-Si'), (2, '3-a-Si'), (3, 'CIS'), (4, 'CdTe'), (5, 'EFG mc-Si'), (6, 'GaAs'), (7, 'HIT-Si'), (8, 'Si-Film'), (9, 'a-Si / mono-Si'), (10, 'c-Si'), (11, 'mc-Si')], db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Vintage',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Vmpo',
+            field=models.FloatField(db_index=True, verbose_name='Max Power Voltage [V]'),
+        ),
+        migrations.AlterField(
+            model_name='pvmodule',
+            name='Voco',
+            field=models.FloatField(db_index=True, verbose_name='Open Circuit Voltage [V]'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0019_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cec_module',
+            index=models.Index(fields=['Name', 'id'], name='parameters__Name_18cd0e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cec_module',
+            index=models.Index(fields=['STC', 'id'], name='parameters__STC_9f2d7b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cec_module',
+            index=models.Index(fields=['nameplate', 'id'], name='parameters__namepla_a2b621_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pvinverter',
+            index=models.Index(fields=['Name', 'id'], name='parameters__Name_c99b9e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pvinverter',
+            index=models.Index(fields=['Paco', 'id'], name='parameters__Paco_c88d12_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pvinverter',
+            index=models.Index(fields=['Vintage', 'id'], name='parameters__Vintage_cff697_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pvmodule',
+            index=models.Index(fields=['Name', 'id'], name='parameters__Name_478b48_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pvmodule',
+            index=models.Index(fields=['nameplate', 'id'], name='parameters__namepla_787d7f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pvmodule',
+            index=models.Index(fields=['module_eff', 'id'], name='parameters__module__3bc205_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('parameters', '0020_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('PVModule', 'Sandia Modules'), ('PVInverter', 'CEC Inverters'), ('CEC_Module', 'CEC Modules')], max_length=20)),
+                ('sam_version', models.CharField(blank=True, default='', max_length=20)),
+                ('file_name', models.CharField(max_length=255)),
+                ('path', models.CharField(max_length=1024)),
+                ('sha256', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('bytes_read', models.BigIntegerField(default=0)),
+                ('rows', models.IntegerField(default=0)),
+                ('created', models.IntegerField(default=0)),
+                ('duplicate', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('message', models.TextField(blank=True, default='')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('started_on', models.DateTimeField(blank=True, null=True)),
+                ('modified_on', models.DateTimeField(auto_now=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='uploadjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('model', 'sam_version', 'sha256'), name='unique_active_upload'),
+        ),
+    ]
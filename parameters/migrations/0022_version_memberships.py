@@ -0,0 +1,92 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:44
+
+import hashlib
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+# versioned models, their version field, and the parameters that are hashed,
+# frozen as of this migration, see PVBaseModel.get_content_hash
+MODELS = {
+    'PVInverter': ('SAM_Version', (
+        'Name', 'Vac', 'Paco', 'Pdco', 'Vdco', 'Pso', 'C0', 'C1', 'C2', 'C3',
+        'Pnt', 'Vdcmax', 'Idcmax', 'Mppt_low', 'Mppt_high', 'CEC_Date',
+        'CEC_Type')),
+    'CEC_Module': ('Version', (
+        'Name', 'Manufacturer', 'BIPV', 'Date', 'T_NOCT', 'A_c', 'N_s',
+        'I_sc_ref', 'V_oc_ref', 'I_mp_ref', 'V_mp_ref', 'alpha_sc', 'beta_oc',
+        'a_ref', 'I_L_ref', 'I_o_ref', 'R_s', 'R_sh_ref', 'Adjust', 'gamma_r',
+        'PTC', 'Technology', 'Bifacial', 'STC', 'Length', 'Width')),
+}
+
+
+def get_content_hash(model, fields, obj):
+    values = []
+    for name in fields:
+        value = model._meta.get_field(name).to_python(getattr(obj, name))
+        values.append('' if value is None else repr(value))
+    return hashlib.sha256('\x1f'.join(values).encode()).hexdigest()
+
+
+def backfill_versions(apps, schema_editor):
+    for name, (version_field, fields) in MODELS.items():
+        model = apps.get_model('parameters', name)
+        membership = apps.get_model('parameters', f'{name}Version')
+        objs = list(model.objects.all())
+        for obj in objs:
+            obj.content_hash = get_content_hash(model, fields, obj)
+        model.objects.bulk_update(
+            objs, ['content_hash'], batch_size=BATCH_SIZE)
+        membership.objects.bulk_create([
+            membership(record_id=obj.pk, version=getattr(obj, version_field))
+            for obj in objs], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0021_upload_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cec_module',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='PVInverterVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(choices=[(0, ''), (1, '2018.11.11.r2'), (2, '2018.11.11.r3-r4'), (3, '2020.2.29.r2.ssc.240'), (4, '2020.11.29.r0.ssc.250'), (5, '2021.12.02.r1.ssc.268'), (6, '2021.12.02.r2.ssc.274'), (7, '2022.11.21.r0.ssc.278'), (8, '2023.12.17.r0.ssc.288'), (9, '2024.12.12.r0.ssc.298')], db_index=True)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='parameters.pvinverter')),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('record', 'version')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CEC_ModuleVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(choices=[(0, ''), (1, 'MM105'), (2, 'MM106'), (3, 'MM107'), (4, 'NRELv1'), (5, 'SAM 2018.9.27'), (6, 'SAM 2018.10.29'), (7, 'SAM 2018.11.11'), (8, 'SAM 2018.11.11 r2'), (9, 'SAM 2019.12.19'), (10, 'SAM 2020.2.29 r3'), (11, 'SAM 2021.12.02'), (12, 'SAM 2023.10.31'), (13, 'SAM 2023.12.17')], db_index=True)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='parameters.cec_module')),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('record', 'version')},
+            },
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='unchanged',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_versions, migrations.RunPython.noop),
+    ]
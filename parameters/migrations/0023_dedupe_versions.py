@@ -0,0 +1,104 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+# versioned models and their version field
+MODELS = {'PVInverter': 'SAM_Version', 'CEC_Module': 'Version'}
+
+
+def _batches(pks):
+    pks = sorted(pks)
+    for start in range(0, len(pks), BATCH_SIZE):
+        yield pks[start:start + BATCH_SIZE]
+
+
+def dedupe_records(apps, schema_editor):
+    for name in MODELS:
+        model = apps.get_model('parameters', name)
+        membership = apps.get_model('parameters', f'{name}Version')
+        # the oldest of identical records is kept
+        kept, duplicates = {}, {}
+        for pk, content_hash in model.objects.order_by('pk').values_list(
+                'pk', 'content_hash'):
+            first = kept.setdefault(content_hash, pk)
+            if first != pk:
+                duplicates[pk] = first
+        # and the versions of the others are added to it
+        pairs = {
+            (duplicates[pk], version)
+            for pk, version in membership.objects.values_list(
+                'record', 'version')
+            if pk in duplicates}
+        membership.objects.bulk_create(
+            [membership(record_id=pk, version=v) for pk, v in pairs],
+            batch_size=BATCH_SIZE, ignore_conflicts=True)
+        for batch in _batches(duplicates):
+            model.objects.filter(pk__in=batch).delete()
+        latest = {}
+        for pk, version in membership.objects.values_list(
+                'record', 'version'):
+            latest[pk] = max(latest.get(pk, version), version)
+        versions = {}
+        for pk, version in latest.items():
+            versions.setdefault(version, []).append(pk)
+        for version, pks in versions.items():
+            for batch in _batches(pks):
+                model.objects.filter(pk__in=batch).update(
+                    latest_version=version)
+
+
+def split_records(apps, schema_editor):
+    """
+    Copy each record to the other versions it's part of, so there's one
+    record per version again. The copies get new ids, the deleted
+    duplicates can't be restored.
+    """
+    for name, version_field in MODELS.items():
+        model = apps.get_model('parameters', name)
+        membership = apps.get_model('parameters', f'{name}Version')
+        fields = [
+            f.attname for f in model._meta.concrete_fields
+            if not f.primary_key]
+        others = {
+            pk: (record, version)
+            for pk, record, version in membership.objects.exclude(
+                version=models.F(f'record__{version_field}')).values_list(
+                    'pk', 'record', 'version')}
+        for batch in _batches(others):
+            records = model.objects.in_bulk(
+                {others[pk][0] for pk in batch})
+            copies, moved = [], []
+            for pk in batch:
+                record, version = others[pk]
+                copy = model(**{
+                    f: getattr(records[record], f) for f in fields})
+                setattr(copy, version_field, version)
+                copy.latest_version = version
+                copies.append(copy)
+                moved.append(membership(pk=pk, version=version))
+            model.objects.bulk_create(copies)
+            for obj, copy in zip(moved, copies):
+                obj.record_id = copy.pk
+            membership.objects.bulk_update(moved, ['record'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0022_version_memberships'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cec_module',
+            name='latest_version',
+            field=models.IntegerField(choices=[(0, ''), (1, 'MM105'), (2, 'MM106'), (3, 'MM107'), (4, 'NRELv1'), (5, 'SAM 2018.9.27'), (6, 'SAM 2018.10.29'), (7, 'SAM 2018.11.11'), (8, 'SAM 2018.11.11 r2'), (9, 'SAM 2019.12.19'), (10, 'SAM 2020.2.29 r3'), (11, 'SAM 2021.12.02'), (12, 'SAM 2023.10.31'), (13, 'SAM 2023.12.17')], db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='pvinverter',
+            name='latest_version',
+            field=models.IntegerField(choices=[(0, ''), (1, '2018.11.11.r2'), (2, '2018.11.11.r3-r4'), (3, '2020.2.29.r2.ssc.240'), (4, '2020.11.29.r0.ssc.250'), (5, '2021.12.02.r1.ssc.268'), (6, '2021.12.02.r2.ssc.274'), (7, '2022.11.21.r0.ssc.278'), (8, '2023.12.17.r0.ssc.288'), (9, '2024.12.12.r0.ssc.298')], db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(dedupe_records, split_records),
+    ]
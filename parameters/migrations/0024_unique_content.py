@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0023_dedupe_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cec_module',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='pvinverter',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+MODELS = ('PVInverter', 'PVModule', 'CEC_Module')
+
+
+def _run(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_vectors(apps, schema_editor):
+    # stored full text vectors to rank searches, see parameters.search, only
+    # on PostgreSQL, SQLite ranks with its FTS5 tables
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in MODELS:
+        table = apps.get_model('parameters', name)._meta.db_table
+        _run(schema_editor, [
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector "
+            f"tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('simple'::regconfig, "
+            f"coalesce(\"Name\", '')), 'A') || "
+            f"setweight(to_tsvector('simple'::regconfig, "
+            f"coalesce(search_text, '')), 'B')) STORED",
+            f"CREATE INDEX IF NOT EXISTS {table}_search_vector ON {table} "
+            f"USING gin (search_vector)"])
+
+
+def drop_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in MODELS:
+        table = apps.get_model('parameters', name)._meta.db_table
+        _run(schema_editor, [
+            f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parameters', '0025_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vectors, drop_search_vectors),
+    ]
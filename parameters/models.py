@@ -1,14 +1,27 @@
-import csv
+import codecs
+import hashlib
+from contextlib import nullcontext
 from datetime import date, datetime
-from io import StringIO
+import io
 import logging
 import re
-from django.db import models, IntegrityError, DataError
-from django.core.exceptions import ValidationError, MultipleObjectsReturned
+from django.apps import apps
+from django.db import connections, models, router, transaction
+from django.core.exceptions import FieldError, ValidationError
+from django.core.validators import MaxLengthValidator
 from django.contrib.auth.models import User
 from django.db.models import signals
+from django.db.models.constants import OnConflict
+from django.utils import timezone
 from tastypie.models import create_api_key
 import numpy as np
+import pandas as pd
+from parameters.performance import (
+    CEC_PARAMS, SAPM_PARAMS, SANDIA_INVERTER_PARAMS, CEC_EFFICIENCY_LEVELS,
+    EURO_EFFICIENCY_LEVELS, cec_performance, sapm_performance, stack_params,
+    weighted_efficiency, module_metrics)
+from parameters.store import STORES
+from parameters.cache import TIMEOUT, bump_generation, cache, cache_key
 
 LOGGER = logging.getLogger(__name__)
 
@@ -16,6 +29,80 @@ LOGGER = logging.getLogger(__name__)
 signals.post_save.connect(create_api_key, sender=User)
 
 MISSING_VINTAGE = 1990
+METRICS_BATCH_SIZE = 1000
+UPLOAD_BATCH_SIZE = 500
+# bytes read at once from files that aren't Django uploads
+UPLOAD_CHUNK_SIZE = 64 * 2**10
+# the header, units, and SAM names are the first 3 lines of SAM libraries
+UPLOAD_FIRST_ROW = 4
+UPLOAD_DATE_FORMAT = '%m/%d/%Y'
+BOOLEAN_TEXT = {
+    't': True, 'true': True, '1': True, 'f': False, 'false': False,
+    '0': False}
+# catalog queries of the latest SAM library version or of all versions
+LATEST_VERSION = 'latest'
+ALL_VERSIONS = 'all'
+INVERTER_SOURCE = re.compile(r'\[(\w*) (\d{4})\]')
+
+
+def inverter_name_fields(name, cec_date):
+    """
+    Parse manufacturer, vintage, and source from an inverter name, unless the
+    inverter has a CEC date.
+
+    :returns: dictionary with ``Manufacturer``, ``Vintage``, and ``Source``
+    """
+    mfg = name.split(':', 1)[0]
+    if (cec_date is not None and cec_date.toordinal()
+            != date(MISSING_VINTAGE, 1, 1).toordinal()):
+        return {'Manufacturer': mfg, 'Vintage': cec_date, 'Source': 'CEC'}
+    match = INVERTER_SOURCE.search(name)
+    src, yr = "UNK", MISSING_VINTAGE
+    if match:
+        src, yr = match.groups()
+        try:
+            yr = int(yr)
+        except ValueError:
+            yr = MISSING_VINTAGE
+    return {'Manufacturer': mfg, 'Vintage': date(yr, 1, 1), 'Source': src}
+
+
+def sapm_module_fields(Impo, Vmpo, Isco, Voco, Area, A, B, DTC):
+    """
+    Nameplate, fill factor, efficiency, and NOCT of Sandia modules. Arguments
+    can be scalars or arrays.
+
+    :returns: dictionary with ``nameplate``, ``fill_factor``, ``module_eff``,
+        and ``noct``
+    """
+    nameplate = Impo * Vmpo
+    pvmod_temp = 800.0 * np.exp(A + B*1.0) + 20.0
+    return {
+        'nameplate': nameplate, 'fill_factor': nameplate / Isco / Voco,
+        'module_eff': nameplate / Area / 1000.0,
+        'noct': pvmod_temp + 0.8*DTC}
+
+
+class CatalogQuerySet(models.QuerySet):
+    def in_version(self, version=LATEST_VERSION):
+        """
+        Records that are part of a SAM library version.
+
+        :param version: a version number, :data:`LATEST_VERSION` for the
+            records of the latest version, or :data:`ALL_VERSIONS`, models
+            without a :attr:`~PVBaseModel.VERSION_FIELD` only have all
+        """
+        model = self.model
+        if model.VERSION_FIELD is None or version == ALL_VERSIONS:
+            return self
+        if version == LATEST_VERSION:
+            version = model.library_version()
+            if version is None:
+                return self  # no versions yet
+            # the newest version of each record is kept with it, so the
+            # latest records are found without a join
+            return self.filter(latest_version=version)
+        return self.filter(memberships__version=version)
 
 
 class PVBaseModel(models.Model):
@@ -26,61 +113,624 @@ class PVBaseModel(models.Model):
     modified_by = models.ForeignKey(
         User, related_name='+', on_delete=models.PROTECT)
 
+    objects = CatalogQuerySet.as_manager()
+
     class Meta:
         abstract = True
 
     FIELD_MAP = None
+    # model parameters and the precomputed metric columns, which each model
+    # evaluates for a batch of records in a ``compute_metrics(params)``
+    # classmethod that takes the stacked ``METRIC_PARAMS`` from
+    # ``stack_params()`` and returns arrays keyed by ``METRIC_FIELDS``
+    METRIC_PARAMS = ()
+    METRIC_FIELDS = ()
+    # text and numeric fields copied to search_text
+    SEARCH_FIELDS = ()
+    SEARCH_NUMBERS = ()
+    # short names for fields in search queries, *EG*: ``tech:CdTe``
+    QUERY_ALIASES = {}
+    # field with the SAM library version of a record, if the model has one
+    VERSION_FIELD = None
+    # editable fields that aren't part of the content of a record
+    NON_CONTENT_FIELDS = ('created_by', 'modified_by')
 
     @classmethod
-    def upload(cls, csv_file, user, *args):
-        columns, spamreader = _upload_csv(csv_file, cls.FIELD_MAP)
-        for spam in spamreader:
-            kwargs = dict(zip(columns, spam))
-            # skip blank lines
-            if not kwargs:
-                continue
-            _upload_helper(cls, kwargs, user, *args)
-
-
-def _upload_csv(csv_file, field_map):
-    csv_file.seek(0)
-    csv_file = StringIO(csv_file.read().decode('utf-8'), newline='')
-    spamreader = csv.reader(csv_file)
-    columns = next(spamreader)
-    if field_map is not None:
-        for f, m in field_map.items():
-            try:
-                columns[columns.index(f)] = m
-            except ValueError as exc:
-                LOGGER.exception(exc)
-                LOGGER.error('field %s is not in columns', f)
-            LOGGER.debug('replaced %s with %s', f, m)
-    next(spamreader)
-    next(spamreader)
-    return columns, spamreader
-
-
-def _upload_helper(cls, kwargs, user, *args):
-    kwargs['created_by'] = user
-    kwargs['modified_by'] = user
-    kwargs = cls.upload_handler(kwargs, *args)
-    try:
-        # create new PVInverter record
-        obj, created = cls.objects.get_or_create(**kwargs)
-    except IntegrityError as exc:
-        LOGGER.exception(exc)
-        LOGGER.error('%s Upload Failed:\n%r', cls.__name__, kwargs)
-    except ValueError as exc:
-        LOGGER.exception(exc)
-        LOGGER.error('%s Upload Failed:\n%r', cls.__name__, kwargs)
-    except (ValidationError, MultipleObjectsReturned, DataError) as exc:
-        LOGGER.exception(exc)
-        LOGGER.error('%s Upload Failed:\n%r', cls.__name__, kwargs)
+    def content_fields(cls):
+        """
+        Names of the parameters hashed by :meth:`get_content_hash`, the
+        editable fields except the version and who changed the record.
+        """
+        skip = {cls.VERSION_FIELD, *cls.NON_CONTENT_FIELDS}
+        return [
+            f.name for f in cls._meta.concrete_fields
+            if f.editable and not f.primary_key and f.name not in skip]
+
+    @classmethod
+    def get_content_hash(cls, obj):
+        """
+        SHA-256 of the parameters of ``obj``, the same for identical records
+        of different versions. Values are converted to the field types
+        first, so that uploads and the database give the same hash. Takes
+        the object as an argument so it also works with historical models in
+        migrations.
+        """
+        values = []
+        for name in cls.content_fields():
+            value = cls._meta.get_field(name).to_python(getattr(obj, name))
+            values.append('' if value is None else repr(value))
+        return hashlib.sha256('\x1f'.join(values).encode()).hexdigest()
+
+    @classmethod
+    def membership_model(cls):
+        """Model of the versions each record is part of, if any."""
+        if cls.VERSION_FIELD is None:
+            return None
+        return cls._meta.get_field('memberships').related_model
+
+    def validate_content(self):
+        """
+        Raise ``ValidationError`` if another record has the same content
+        hash, because identical records of different versions are one record
+        that is part of each version, see :func:`add_own_version`.
+        """
+        other = type(self).objects.filter(
+            content_hash=self.content_hash).exclude(pk=self.pk).first()
+        if other is not None:
+            raise ValidationError(
+                'Same parameters as %(other)s (id %(pk)d), upload the SAM '
+                'library to add it to another version.',
+                code='duplicate_content',
+                params={'other': other, 'pk': other.pk})
+
+    def clean(self):
+        super().clean()
+        if self.VERSION_FIELD is None:
+            return
+        try:
+            self.set_derived_fields()
+        except (TypeError, ValueError):
+            return  # invalid values are reported by their fields
+        self.validate_content()
+
+    def save(self, *args, **kwargs):
+        # derived columns and metrics are kept in sync with the parameters,
+        # bulk uploads set them before the insert instead
+        self.set_derived_fields()
+        self.set_metrics([self])
+        if self.VERSION_FIELD is not None:
+            self.validate_content()
+        if kwargs.get('update_fields'):
+            # *EG*: API PATCH requests only save the fields they change
+            kwargs['update_fields'] = {*kwargs['update_fields'], *(
+                f.name for f in self._meta.concrete_fields
+                if not f.editable and not f.primary_key)}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def library_version(cls):
+        """
+        Latest SAM library version of any record, or ``None`` if there are
+        none, cached until the next write.
+        """
+        membership = cls.membership_model()
+        if membership is None:
+            return None
+        return cache.get_or_set(
+            cache_key(cls, 'version'),
+            lambda: membership.objects.aggregate(
+                version=models.Max('version'))['version'],
+            timeout=TIMEOUT)
+
+    @classmethod
+    def search_terms(cls, obj):
+        """Text values of ``obj`` to search, override to add displays."""
+        return [getattr(obj, f) for f in cls.SEARCH_FIELDS]
+
+    @classmethod
+    def get_search_text(cls, obj):
+        """
+        Searchable text of ``obj``. Numbers are formatted with ``%g`` so that
+        values from uploads and the database give the same text. Takes the
+        object as an argument so it also works with historical models in
+        migrations.
+        """
+        values = []
+        for value in cls.search_terms(obj):
+            if isinstance(value, datetime):
+                value = value.date()
+            if value is not None and value != '':
+                values.append(str(value))
+        for f in cls.SEARCH_NUMBERS:
+            value = getattr(obj, f)
+            if value is not None and value != '':
+                values.append('%g' % float(value))
+        return ' '.join(values)
+
+    @classmethod
+    def upload(cls, csv_file, user, *args, batch_size=UPLOAD_BATCH_SIZE,
+               progress=None, atomic=True):
+        """
+        Create records from a SAM library CSV file, skipping records that
+        already exist. The file is streamed and decoded in chunks, and read
+        in batches of rows that are normalized and converted to the field
+        types column by column, then inserted with one prepared statement,
+        see :func:`_bulk_insert`, so memory doesn't grow with the file. All
+        batches are in one transaction, unless ``atomic`` is false. Each
+        parameter set of models with a :attr:`VERSION_FIELD` is stored once,
+        rows with the same content as a record of another version are added
+        to its versions instead.
+
+        :param csv_file: a Django ``UploadedFile`` or a binary file
+        :param args: passed to :meth:`normalize_upload`
+        :param batch_size: number of rows read and inserted at once
+        :param progress: callable called after each batch with the summary
+            so far, the number of bytes read, and the size of the file or
+            ``None`` if it's not known
+        :param atomic: if false, each batch is committed in its own
+            transaction, so progress is visible to other connections and an
+            error only rolls back the current batch
+        :returns: dictionary with ``created``, the ids of the created
+            records, ``duplicate``, the number of rows that already exist,
+            ``unchanged``, the number of rows added to an identical record
+            of another version, and ``failed``, the line number and error of
+            each invalid row
+        :raises FieldError: if a column isn't a field of the model
+        :raises KeyError: if a column the model needs is missing
+        """
+        stream = UploadStream(csv_file)
+        names = {f.name for f in cls._meta.get_fields()}
+        summary = {
+            'created': [], 'duplicate': 0, 'unchanged': 0, 'failed': []}
+        try:
+            with transaction.atomic() if atomic else nullcontext():
+                for df in _read_upload(stream, cls.FIELD_MAP, batch_size):
+                    unknown = [c for c in df.columns if c not in names]
+                    if unknown:
+                        raise FieldError(
+                            'Invalid field name(s) for model {}: {}'.format(
+                                cls.__name__, ', '.join(map(repr, unknown))))
+                    if not df.empty:
+                        # a transaction per batch, unless already in one
+                        with transaction.atomic(savepoint=False):
+                            _upload_batch(
+                                cls, cls.normalize_upload(df, *args), user,
+                                summary)
+                    LOGGER.debug(
+                        '%s upload: %d of %s bytes', cls.__name__,
+                        stream.bytes_read, stream.size)
+                    if progress is not None:
+                        progress(summary, stream.bytes_read, stream.size)
+        finally:
+            # without ``atomic``, batches before an error are committed
+            cls.bulk_changed(summary['created'])
+            if summary['unchanged']:
+                # versions were added to existing records
+                bump_generation(cls)
+        LOGGER.info(
+            '%s upload: %d created, %d duplicate, %d unchanged, %d failed',
+            cls.__name__, len(summary['created']), summary['duplicate'],
+            summary['unchanged'], len(summary['failed']))
+        return summary
+
+    @classmethod
+    def normalize_upload(cls, df, *args):
+        """
+        Convert the SAM library values of an upload to field values, *EG*:
+        parse dates and map names to choices, for all rows at once.
+
+        :param df: DataFrame of strings with a column for each field
+        :returns: DataFrame with the same index
+        """
+        return df
+
+    @classmethod
+    def update_metrics(cls, pks=None, batch_size=METRICS_BATCH_SIZE):
+        """
+        Compute :attr:`METRIC_FIELDS` in batches and save them without
+        calling :meth:`save`.
+
+        :param pks: records to update, or ``None`` for all records
+        :param batch_size: number of records evaluated at once
+        :returns: number of records updated
+        """
+        queryset = cls.objects.order_by('pk')
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+        pks = list(queryset.values_list('pk', flat=True))
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            records = list(
+                cls.objects.filter(pk__in=batch).order_by('pk').values(
+                    'pk', *cls.METRIC_PARAMS))
+            objs = [cls(pk=record['pk']) for record in records]
+            cls.set_metrics(objs, records)
+            cls.objects.bulk_update(objs, cls.METRIC_FIELDS)
+            LOGGER.debug('%s metrics updated: %d', cls.__name__, len(objs))
+        cls.bulk_changed(pks)
+        return len(pks)
+
+    @classmethod
+    def set_metrics(cls, objs, records=None):
+        """
+        Compute :attr:`METRIC_FIELDS` for a batch of records and set them
+        without saving.
+
+        :param objs: model instances to set
+        :param records: dictionaries with :attr:`METRIC_PARAMS` for each of
+            ``objs``, or ``None`` to use the values of ``objs``
+        """
+        if records is None:
+            records = [
+                {k: getattr(obj, k) for k in cls.METRIC_PARAMS}
+                for obj in objs]
+        with np.errstate(all='ignore'):
+            metrics = cls.compute_metrics(
+                stack_params(records, cls.METRIC_PARAMS))
+        for k in cls.METRIC_FIELDS:
+            for obj, value in zip(objs, np.ravel(metrics[k]).tolist()):
+                # store NaN and inf as NULL
+                setattr(obj, k, value if np.isfinite(value) else None)
+
+    @classmethod
+    def bulk_changed(cls, pks):
+        """
+        Invalidate stores and caches after bulk changes, which don't send
+        signals.
+        """
+        if pks:
+            bump_generation(cls)
+        store = STORES.get(cls)
+        if store is not None:
+            for pk in pks:
+                store.invalidate(pk)
+
+
+def _file_chunks(upload):
+    if upload.seekable():
+        upload.seek(0)
+    while True:
+        chunk = upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+class UploadStream(io.TextIOBase):
+    """
+    Text stream of an upload that reads and decodes one chunk at a time,
+    with an incremental UTF-8 decoder so characters split between chunks
+    are decoded correctly.
+
+    :param upload: a Django ``UploadedFile``, which is read with its
+        ``chunks()``, or a binary file
+    """
+
+    def __init__(self, upload):
+        self._chunks = (
+            upload.chunks() if hasattr(upload, 'chunks')
+            else _file_chunks(upload))
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self.bytes_read = 0
+        self.size = getattr(upload, 'size', None)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._buffer += self._decoder.decode(b'', final=True)
+                break
+            self.bytes_read += len(chunk)
+            # files opened as text are already decoded
+            self._buffer += (
+                chunk if isinstance(chunk, str)
+                else self._decoder.decode(chunk))
+        if size is None or size < 0:
+            size = len(self._buffer)
+        text, self._buffer = self._buffer[:size], self._buffer[size:]
+        return text
+
+
+def _read_upload(stream, field_map, batch_size):
+    """
+    Read a SAM library CSV file as strings in batches of rows, without the
+    units and SAM names rows, and rename columns with ``field_map``.
+
+    :param stream: text stream, *EG*: an :class:`UploadStream`
+    :returns: iterator of DataFrames indexed by line number, without blank
+        lines
+    """
+    batches = pd.read_csv(
+        stream, dtype=str, keep_default_na=False, skiprows=[1, 2],
+        skip_blank_lines=False, chunksize=batch_size)
+    for n, df in enumerate(batches):
+        # missing values of short lines are NaN
+        df = df.fillna('')
+        df.index += UPLOAD_FIRST_ROW
+        df = df[(df != '').any(axis=1)]
+        if field_map is not None:
+            missing = [f for f in field_map if f not in df.columns]
+            if missing and not n:
+                LOGGER.error('fields %s are not in columns', missing)
+            df = df.rename(columns=field_map)
+        yield df
+
+
+def _parse_dates(column, default, name, ignore=()):
+    """
+    Parse a column of SAM library dates, *EG*: ``12/31/2020``, and use
+    ``default`` for dates that can't be parsed.
+
+    :param ignore: values that are expected to be the default
+    """
+    dates = pd.to_datetime(
+        column, format=UPLOAD_DATE_FORMAT, errors='coerce')
+    bad = dates.isna()
+    unexpected = bad & ~column.isin(ignore)
+    if unexpected.any():
+        LOGGER.warning(
+            '%s has unexpected format on lines %s, set to default: %s',
+            name, list(column.index[unexpected]), default)
+    return dates.where(~bad, pd.Timestamp(default))
+
+
+def _coerce_column(field, column):
+    """
+    Convert a column of an upload to the type of ``field``.
+
+    :returns: the values, and a mask of the invalid values and their error
+        message
+    """
+    if column.dtype != object:
+        # converted by normalize_upload
+        if pd.api.types.is_datetime64_any_dtype(column):
+            invalid = column.isna()
+            values = column.dt.date.astype(object).where(~invalid, None)
+            return values, invalid, field.error_messages['invalid_date']
+        return column.astype(object), column.isna(), field.error_messages[
+            'null']
+    empty = column.isna() | (column == '')
+    if isinstance(field, (models.CharField, models.TextField)):
+        invalid = pd.Series(False, index=column.index)
+        if isinstance(field, models.CharField) and field.max_length:
+            invalid = column.str.len() > field.max_length
+        return column.astype(object), invalid, MaxLengthValidator.message
+    if isinstance(field, models.BooleanField):
+        values = column.str.strip().str.lower().map(BOOLEAN_TEXT)
+        invalid = values.isna() & ~empty
+    elif isinstance(field, (models.FloatField, models.IntegerField)):
+        values = pd.to_numeric(column.where(~empty), errors='coerce')
+        invalid = values.isna() & ~empty
+        # NaN is a float, only check the few values that aren't numbers
+        if invalid.any():
+            invalid.loc[invalid] = (
+                column[invalid].str.strip().str.lower() != 'nan')
+        if isinstance(field, models.IntegerField):
+            # whole floats are saved as integers
+            invalid |= values.notna() & (values % 1 != 0)
+    elif isinstance(field, models.DateField):
+        values = pd.to_datetime(column.where(~empty), errors='coerce')
+        invalid = values.isna() & ~empty
+        values = values.dt.date
     else:
-        if created:
-            LOGGER.info('%s Created:\n%r', cls.__name__, obj)
+        values, invalid = column, empty & False
+    values = values.astype(object).where(~empty, None)
+    message = field.error_messages['invalid']
+    if not field.null:
+        # empty values of required fields are invalid
+        invalid = invalid | empty
+    return values, invalid, message
+
+
+def _coerce_upload(cls, df):
+    """
+    Convert the columns of an upload to the field types.
+
+    :returns: dictionary of the values of each field, and a dictionary of
+        the error messages of each field for each invalid line
+    """
+    values, errors = {}, {}
+    for name, column in df.items():
+        field = cls._meta.get_field(name)
+        values[name], invalid, message = _coerce_column(field, column)
+        for row, value in column[invalid].items():
+            if value is None or value == '' or pd.isna(value):
+                msg = str(field.error_messages['null'])
+            else:
+                msg = str(message) % {
+                    'value': value, 'limit_value': field.max_length,
+                    'show_value': len(str(value))}
+            errors.setdefault(row, {})[name] = [msg]
+    return values, errors
+
+
+# fields whose values from uploads are already database values
+RAW_FIELDS = (models.CharField, models.FloatField, models.TextField)
+
+
+def _bulk_insert(model, objs):
+    """
+    Insert ``objs`` and ignore conflicts, like ``bulk_create`` with
+    ``ignore_conflicts``, but the values are converted column by column, and
+    skip conversion if they're already database values, and all rows use one
+    prepared statement, instead of compiling SQL for every value.
+    """
+    objs = list(objs)
+    if not objs:
+        return
+    connection = connections[router.db_for_write(model)]
+    ops = connection.ops
+    fields = [
+        f for f in model._meta.concrete_fields
+        if f is not model._meta.auto_field]
+    columns = []
+    for f in fields:
+        values = [f.pre_save(obj, True) for obj in objs]
+        if not isinstance(f, RAW_FIELDS):
+            values = [f.get_db_prep_save(v, connection) for v in values]
+        columns.append(values)
+    rows = list(zip(*columns))
+    # rows per statement, some databases limit the number of parameters
+    max_params = connection.features.max_query_params
+    size = max(max_params // len(fields), 1) if max_params else len(rows)
+    values = '(%s)' % ', '.join(['%s'] * len(fields))
+    sql = '{} {} ({}) VALUES {}{}'.format(
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(f.column) for f in fields),
+        '{}', ops.on_conflict_suffix_sql(
+            fields, OnConflict.IGNORE, None, None))
+    whole = len(rows) - len(rows) % size
+    with connection.cursor() as cursor:
+        if whole:
+            cursor.executemany(
+                sql.format(', '.join([values] * size)),
+                [sum(rows[n:n + size], ()) for n in range(0, whole, size)])
+        if whole < len(rows):
+            cursor.execute(
+                sql.format(', '.join([values] * (len(rows) - whole))),
+                sum(rows[whole:], ()))
+
+
+def _existing_keys(cls, keys):
+    """Ids of the records with the unique ``keys``, keyed by unique key."""
+    key_fields = cls._meta.unique_together[0]
+    # the first key field narrows the query, the rest are matched here
+    queryset = cls.objects.filter(**{
+        f'{key_fields[0]}__in': {key[0] for key in keys}})
+    keys = set(keys)
+    return {
+        key[:-1]: key[-1]
+        for key in queryset.values_list(*key_fields, 'pk')
+        if key[:-1] in keys}
+
+
+def _existing_content(cls, objs):
+    """
+    Ids of the records with the content hashes of ``objs``, keyed by hash,
+    and the versions each of them is already part of.
+    """
+    membership = cls.membership_model()
+    records = {}
+    # the oldest record of identical ones is kept
+    queryset = cls.objects.filter(
+        content_hash__in={obj.content_hash for obj in objs}).order_by('-pk')
+    for content_hash, pk in queryset.values_list('content_hash', 'pk'):
+        records[content_hash] = pk
+    versions = set(membership.objects.filter(
+        record__in=records.values()).values_list('record', 'version'))
+    return records, versions
+
+
+def _add_versions(cls, pairs):
+    """
+    Add records to versions from ``(record id, version)`` pairs, and update
+    their newest version.
+    """
+    membership = cls.membership_model()
+    if membership is None or not pairs:
+        return
+    _bulk_insert(
+        membership, [membership(record_id=pk, version=v) for pk, v in pairs])
+    versions = {}
+    for pk, version in pairs:
+        versions.setdefault(version, []).append(pk)
+    for version, pks in versions.items():
+        cls.objects.filter(pk__in=pks, latest_version__lt=version).update(
+            latest_version=version)
+
+
+def _upload_batch(cls, df, user, summary):
+    """
+    Convert and insert a batch of normalized rows, and add them to
+    ``summary``. Rows with the same content as another record are added to
+    its versions instead.
+    """
+    values, errors = _coerce_upload(cls, df)
+    for row, messages in sorted(errors.items()):
+        error = '; '.join(
+            f'{name}: {" ".join(msgs)}' for name, msgs in messages.items())
+        LOGGER.warning(
+            '%s upload line %d failed: %s', cls.__name__, row, error)
+        summary['failed'].append({'row': row, 'error': error})
+    key_fields = cls._meta.unique_together[0]
+    objs = {}
+    rows = {}
+    for row, *record in zip(df.index, *values.values()):
+        if row in errors:
+            continue
+        obj = cls(
+            created_by=user, modified_by=user, **dict(zip(values, record)))
+        obj.set_derived_fields()
+        key = tuple(getattr(obj, f) for f in key_fields)
+        if key in objs:
+            summary['duplicate'] += 1
         else:
-            LOGGER.warning('%s Already Exists:\n%r', cls.__name__, obj)
+            objs[key] = obj
+            rows[key] = row
+    existing = _existing_keys(cls, objs)
+    new = {key: obj for key, obj in objs.items() if key not in existing}
+    summary['duplicate'] += len(objs) - len(new)
+    version_field = cls.VERSION_FIELD
+    added = set()
+    # rows with the content of another row of this batch
+    same = []
+    if version_field is not None and new:
+        records, versions = _existing_content(cls, new.values())
+        hashes = set()
+        for key, obj in list(new.items()):
+            pk = records.get(obj.content_hash)
+            if pk is None and obj.content_hash not in hashes:
+                hashes.add(obj.content_hash)
+                continue
+            del new[key]
+            if pk is None:
+                same.append(obj)
+                continue
+            pair = (pk, getattr(obj, version_field))
+            if pair in versions or pair in added:
+                summary['duplicate'] += 1
+            else:
+                added.add(pair)
+    # metrics are computed before the insert, instead of updated after
+    cls.set_metrics(list(new.values()))
+    # conflicts are only possible from concurrent uploads of the same rows
+    _bulk_insert(cls, new.values())
+    created = _existing_keys(cls, new)
+    created = [(key, created[key]) for key in new if key in created]
+    summary['created'].extend(pk for _, pk in created)
+    if version_field is not None:
+        pks = {new[key].content_hash: pk for key, pk in created}
+        # rows that conflicted with a concurrent insert of the same content
+        # and another key are added to the versions of that record instead
+        dropped = {
+            key: obj for key, obj in new.items()
+            if obj.content_hash not in pks}
+        if dropped:
+            records, versions = _existing_content(cls, dropped.values())
+            pks.update(records)
+            for key, obj in dropped.items():
+                pk = records.get(obj.content_hash)
+                pair = (pk, getattr(obj, version_field))
+                if pk is None:
+                    summary['failed'].append({
+                        'row': rows[key],
+                        'error': 'record with the same content was deleted'})
+                elif pair in versions or pair in added:
+                    summary['duplicate'] += 1
+                else:
+                    added.add(pair)
+        for obj in same:
+            pk = pks.get(obj.content_hash)
+            if pk is not None:
+                added.add((pk, getattr(obj, version_field)))
+        summary['unchanged'] += len(added)
+        _add_versions(cls, added.union(
+            (pk, getattr(new[key], version_field)) for key, pk in created))
 
 
 class PVInverter(PVBaseModel):
@@ -97,53 +747,72 @@ class PVInverter(PVBaseModel):
     SAMVER_TYPES = {name: idx for idx, name in SAM_VERSION}
 
     Name = models.CharField(max_length=100)
-    Vac = models.FloatField('AC Voltage [V]')
-    Paco = models.FloatField('Rated AC power [W]')
-    Pdco = models.FloatField('DC power [W]')
-    Vdco = models.FloatField('DC voltage [V]')
+    Vac = models.FloatField('AC Voltage [V]', db_index=True)
+    Paco = models.FloatField('Rated AC power [W]', db_index=True)
+    Pdco = models.FloatField('DC power [W]', db_index=True)
+    Vdco = models.FloatField('DC voltage [V]', db_index=True)
     Pso = models.FloatField('Self consumption [W]')
     C0 = models.FloatField()
     C1 = models.FloatField()
     C2 = models.FloatField()
     C3 = models.FloatField()
     Pnt = models.FloatField('Nighttime consumption [W]')
-    Vdcmax = models.FloatField('Max DC voltage [V]')
-    Idcmax = models.FloatField('Max DC current [A]')
-    Mppt_low = models.FloatField('Lower bound of MPPT [W]')
-    Mppt_high = models.FloatField('Higher bound of MPPT [W]')
-    CEC_Date = models.DateField(default=datetime(MISSING_VINTAGE, 1, 1))
+    Vdcmax = models.FloatField('Max DC voltage [V]', db_index=True)
+    Idcmax = models.FloatField('Max DC current [A]', db_index=True)
+    Mppt_low = models.FloatField('Lower bound of MPPT [W]', db_index=True)
+    Mppt_high = models.FloatField('Higher bound of MPPT [W]', db_index=True)
+    CEC_Date = models.DateField(
+        default=datetime(MISSING_VINTAGE, 1, 1), db_index=True)
     CEC_Type = models.CharField(max_length=25, blank=True)
     SAM_Version = models.IntegerField(
-        choices=SAM_VERSION, default=0, blank=True)
+        choices=SAM_VERSION, default=0, blank=True, db_index=True)
 
-    def Manufacturer(self):
-        mfg, _ = self.Name.split(':', 1)
-        return mfg
+    Manufacturer = models.CharField(
+        max_length=100, blank=True, editable=False, db_index=True)
+    Vintage = models.DateField(
+        default=date(MISSING_VINTAGE, 1, 1), editable=False, db_index=True)
+    Source = models.CharField(
+        max_length=25, default='UNK', editable=False, db_index=True)
+    cec_efficiency = models.FloatField(
+        'CEC weighted efficiency', null=True, blank=True, editable=False,
+        db_index=True)
+    euro_efficiency = models.FloatField(
+        'Euro weighted efficiency', null=True, blank=True, editable=False,
+        db_index=True)
 
-    def Vintage(self):
-        if (self.CEC_Date.toordinal()
-            != date(MISSING_VINTAGE, 1, 1).toordinal()):
-            return self.CEC_Date
-        match = re.search(r'\[(\w*) (\d{4})\]', self.Name)
-        if match:
-            _, yr = match.groups()
-            try:
-                yr = int(yr)
-            except ValueError:
-                yr = MISSING_VINTAGE
-        else:
-            yr = MISSING_VINTAGE
-        return date(yr, 1, 1)
+    search_text = models.TextField(blank=True, default='', editable=False)
+    content_hash = models.CharField(
+        max_length=64, blank=True, default='', editable=False, unique=True)
+    latest_version = models.IntegerField(
+        choices=SAM_VERSION, default=0, editable=False, db_index=True)
 
-    def Source(self):
-        if (self.CEC_Date.toordinal()
-            != date(MISSING_VINTAGE, 1, 1).toordinal()):
-            return 'CEC'
-        match = re.search(r'\[(\w*) (\d{4})\]', self.Name)
-        src = "UNK"
-        if match:
-            src, _ = match.groups()
-        return src
+    METRIC_PARAMS = SANDIA_INVERTER_PARAMS
+    VERSION_FIELD = 'SAM_Version'
+    METRIC_FIELDS = ('cec_efficiency', 'euro_efficiency')
+    SEARCH_FIELDS = ('Name', 'Manufacturer', 'Source', 'CEC_Type', 'CEC_Date')
+    QUERY_ALIASES = {'mfg': 'Manufacturer', 'year': 'Vintage'}
+    SEARCH_NUMBERS = (
+        'Vac', 'Paco', 'Vdco', 'Pdco', 'Pso', 'Pnt', 'Vdcmax', 'Idcmax',
+        'Mppt_low', 'Mppt_high')
+
+    @classmethod
+    def compute_metrics(cls, params):
+        return {
+            'cec_efficiency': weighted_efficiency(
+                params, CEC_EFFICIENCY_LEVELS),
+            'euro_efficiency': weighted_efficiency(
+                params, EURO_EFFICIENCY_LEVELS)}
+
+    def set_derived_fields(self):
+        cec_date = self.CEC_Date
+        if isinstance(cec_date, datetime):
+            cec_date = cec_date.date()
+        for k, v in inverter_name_fields(self.Name, cec_date).items():
+            setattr(self, k, v)
+        self.search_text = self.get_search_text(self)
+        self.content_hash = self.get_content_hash(self)
+        self.latest_version = max(
+            self.latest_version or 0, int(self.SAM_Version or 0))
 
     def __str__(self):
         return self.Name
@@ -151,23 +820,20 @@ class PVInverter(PVBaseModel):
     class Meta:
         verbose_name = "Inverter"
         unique_together = ('Name', 'SAM_Version')
+        # keyset pagination by (sort key, id)
+        indexes = [
+            models.Index(fields=['Name', 'id']),
+            models.Index(fields=['Paco', 'id']),
+            models.Index(fields=['Vintage', 'id'])]
 
     @classmethod
-    def upload_handler(cls, kwargs, sam_version):
-        cec_date = kwargs.get('CEC_Date')
-        if cec_date is not None:
-            try:
-                cec_date = datetime.strptime(cec_date, '%m/%d/%Y')
-            except ValueError as exc:
-                if cec_date != 'n/a':
-                    LOGGER.exception(exc)
-                    LOGGER.error(
-                        'CEC_Date: %s has unexpected format', cec_date)
-                cec_date = date(MISSING_VINTAGE, 1, 1)
-                LOGGER.warning('CEC_Date set to default: %s', cec_date)
-            kwargs['CEC_Date'] = cec_date
-        kwargs['SAM_Version'] = sam_version
-        return kwargs
+    def normalize_upload(cls, df, sam_version):
+        if 'CEC_Date' in df:
+            df['CEC_Date'] = _parse_dates(
+                df['CEC_Date'], date(MISSING_VINTAGE, 1, 1), 'CEC_Date',
+                ignore=('n/a',))
+        df['SAM_Version'] = sam_version
+        return df
 
 
 class PVModule(PVBaseModel):
@@ -197,15 +863,15 @@ class PVModule(PVBaseModel):
     NAN_FIELDS = ('C4', 'C5', 'C6', 'C7', 'IXO', 'IXXO')
 
     Name = models.CharField(max_length=100)
-    Vintage = models.DateField()
-    Area = models.FloatField()
-    Material = models.IntegerField(choices=MATERIALS)
-    Cells_in_Series = models.IntegerField()
+    Vintage = models.DateField(db_index=True)
+    Area = models.FloatField(db_index=True)
+    Material = models.IntegerField(choices=MATERIALS, db_index=True)
+    Cells_in_Series = models.IntegerField(db_index=True)
     Parallel_Strings = models.IntegerField()
-    Isco = models.FloatField('Short Circuit Current [A]')
-    Voco = models.FloatField('Open Circuit Voltage [V]')
-    Impo = models.FloatField('Max Power Current [A]')
-    Vmpo = models.FloatField('Max Power Voltage [V]')
+    Isco = models.FloatField('Short Circuit Current [A]', db_index=True)
+    Voco = models.FloatField('Open Circuit Voltage [V]', db_index=True)
+    Impo = models.FloatField('Max Power Current [A]', db_index=True)
+    Vmpo = models.FloatField('Max Power Voltage [V]', db_index=True)
     Aisc = models.FloatField('Short Circuit Current Tempco')
     Aimp = models.FloatField('Max Power Current Tempco')
     C0 = models.FloatField()
@@ -241,21 +907,55 @@ class PVModule(PVBaseModel):
     Notes = models.TextField(max_length=100)
     is_vintage_estimated = models.BooleanField(default=False)
 
+    nameplate = models.FloatField(
+        'Nameplate [W]', default=0.0, editable=False, db_index=True)
+    fill_factor = models.FloatField(
+        'Fill Factor', default=0.0, editable=False, db_index=True)
+    module_eff = models.FloatField(
+        'Module Efficiency', default=0.0, editable=False, db_index=True)
+    noct = models.FloatField(
+        'NOCT [C]', default=0.0, editable=False, db_index=True)
+    low_irradiance_eff = models.FloatField(
+        'Relative efficiency at 200 [W/m2]', null=True, blank=True,
+        editable=False, db_index=True)
+    pmp_noct = models.FloatField(
+        'Power at NOCT [W]', null=True, blank=True, editable=False,
+        db_index=True)
+
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    METRIC_PARAMS = SAPM_PARAMS + ('noct',)
+    METRIC_FIELDS = ('low_irradiance_eff', 'pmp_noct')
+    SEARCH_FIELDS = ('Name', 'Vintage')
+    QUERY_ALIASES = {'tech': 'Material', 'year': 'Vintage'}
+    SEARCH_NUMBERS = (
+        'Area', 'Cells_in_Series', 'Parallel_Strings', 'Isco', 'Voco', 'Impo',
+        'Vmpo', 'Aisc', 'Aimp', 'Bvoco', 'Bvmpo')
+
     def celltype(self):
         return self.TECH_DICT[self.Material]
 
-    def nameplate(self):
-        return self.Impo * self.Vmpo
-
-    def fill_factor(self):
-        return self.nameplate() / self.Isco / self.Voco
+    @classmethod
+    def search_terms(cls, obj):
+        return super().search_terms(obj) + [
+            cls.TECH_DICT.get(int(obj.Material))]
 
-    def module_eff(self):
-        return self.nameplate() / self.Area / 1000.0
+    @classmethod
+    def compute_metrics(cls, params):
+        return module_metrics(
+            lambda ee, tc: sapm_performance(ee, tc, params)['p_mp'],
+            params['noct'])
 
-    def noct(self):
-        pvmod_temp = 800.0 * np.exp(self.A + self.B*1.0) + 20.0
-        return pvmod_temp + 0.8*self.DTC
+    def set_derived_fields(self):
+        # values may still be strings from the upload
+        params = np.array([
+            self.Impo, self.Vmpo, self.Isco, self.Voco, self.Area, self.A,
+            self.B, self.DTC], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            derived = sapm_module_fields(*params)
+        for k, v in derived.items():
+            setattr(self, k, float(v))
+        self.search_text = self.get_search_text(self)
 
     def __str__(self):
         return self.Name
@@ -263,27 +963,28 @@ class PVModule(PVBaseModel):
     class Meta:
         verbose_name = "Module"
         unique_together = ('Name', 'Vintage', 'Notes')
+        # keyset pagination by (sort key, id)
+        indexes = [
+            models.Index(fields=['Name', 'id']),
+            models.Index(fields=['nameplate', 'id']),
+            models.Index(fields=['module_eff', 'id'])]
 
     @classmethod
-    def upload_handler(cls, kwargs):
-        for f in cls.NAN_FIELDS:
-            if not kwargs[f]:
-                nan = kwargs.pop(f)
-                LOGGER.debug('popped "%s" from %s', nan, f)
-        yr = kwargs['Vintage']
-        if yr.endswith('(E)'):
-            yr = yr[:4]
-            kwargs['is_vintage_estimated'] = True
-        try:
-            yr = int(yr)
-        except ValueError:
-            yr = MISSING_VINTAGE
-        kwargs['Vintage'] = date(yr, 1, 1)
-        LOGGER.debug('year = %d', yr)
-        celltype = cls.CELL_TYPES.get(kwargs['Material'], 0)
-        kwargs['Material'] = celltype
-        LOGGER.debug('cell type = %d', celltype)
-        return kwargs
+    def normalize_upload(cls, df):
+        vintage = df['Vintage'].str.strip()
+        estimated = vintage.str.endswith('(E)')
+        year = vintage.where(~estimated, vintage.str[:4])
+        year = pd.to_numeric(
+            year.where(year.str.fullmatch(r'\d+')), errors='coerce')
+        # years that aren't dates are invalid
+        vintage = pd.to_datetime(
+            year.fillna(MISSING_VINTAGE).astype(int).astype(str),
+            format='%Y', errors='coerce')
+        df['Vintage'] = vintage
+        df['is_vintage_estimated'] = estimated
+        df['Material'] = df['Material'].map(cls.CELL_TYPES).fillna(0).astype(
+            int)
+        return df
 
 
 class CEC_Module(PVBaseModel):
@@ -318,14 +1019,14 @@ class CEC_Module(PVBaseModel):
     Name = models.CharField(max_length=100)
     Manufacturer = models.CharField(max_length=100, blank=True)
     BIPV = models.BooleanField()
-    Date = models.DateField()
-    T_NOCT = models.FloatField()
-    A_c = models.FloatField()
-    N_s = models.IntegerField()
-    I_sc_ref = models.FloatField()
-    V_oc_ref = models.FloatField()
-    I_mp_ref = models.FloatField()
-    V_mp_ref = models.FloatField()
+    Date = models.DateField(db_index=True)
+    T_NOCT = models.FloatField(db_index=True)
+    A_c = models.FloatField(db_index=True)
+    N_s = models.IntegerField(db_index=True)
+    I_sc_ref = models.FloatField(db_index=True)
+    V_oc_ref = models.FloatField(db_index=True)
+    I_mp_ref = models.FloatField(db_index=True)
+    V_mp_ref = models.FloatField(db_index=True)
     alpha_sc = models.FloatField()
     beta_oc = models.FloatField()
     a_ref = models.FloatField()
@@ -335,16 +1036,58 @@ class CEC_Module(PVBaseModel):
     R_sh_ref = models.FloatField()
     Adjust = models.FloatField()
     gamma_r = models.FloatField()
-    Version = models.IntegerField(choices=VERSION, default=0, blank=True)
-    PTC = models.FloatField()
-    Technology = models.IntegerField(choices=TECH)
+    Version = models.IntegerField(
+        choices=VERSION, default=0, blank=True, db_index=True)
+    PTC = models.FloatField(db_index=True)
+    Technology = models.IntegerField(choices=TECH, db_index=True)
     Bifacial = models.BooleanField(default=0)
-    STC = models.FloatField()
+    STC = models.FloatField(db_index=True)
     Length = models.FloatField(blank=True, null=True)
     Width = models.FloatField(blank=True, null=True)
 
-    def nameplate(self):
-        return self.I_mp_ref * self.V_mp_ref
+    nameplate = models.FloatField(
+        'Nameplate [W]', default=0.0, editable=False, db_index=True)
+    low_irradiance_eff = models.FloatField(
+        'Relative efficiency at 200 [W/m2]', null=True, blank=True,
+        editable=False, db_index=True)
+    pmp_noct = models.FloatField(
+        'Power at NOCT [W]', null=True, blank=True, editable=False,
+        db_index=True)
+
+    search_text = models.TextField(blank=True, default='', editable=False)
+    content_hash = models.CharField(
+        max_length=64, blank=True, default='', editable=False, unique=True)
+    latest_version = models.IntegerField(
+        choices=VERSION, default=0, editable=False, db_index=True)
+
+    METRIC_PARAMS = CEC_PARAMS + ('T_NOCT',)
+    VERSION_FIELD = 'Version'
+    METRIC_FIELDS = ('low_irradiance_eff', 'pmp_noct')
+    SEARCH_FIELDS = ('Name', 'Manufacturer', 'Date')
+    QUERY_ALIASES = {
+        'mfg': 'Manufacturer', 'tech': 'Technology', 'year': 'Date'}
+    SEARCH_NUMBERS = (
+        'T_NOCT', 'A_c', 'N_s', 'I_sc_ref', 'V_oc_ref', 'I_mp_ref',
+        'V_mp_ref', 'STC')
+
+    @classmethod
+    def search_terms(cls, obj):
+        return super().search_terms(obj) + [
+            dict(cls.TECH).get(int(obj.Technology))]
+
+    @classmethod
+    def compute_metrics(cls, params):
+        return module_metrics(
+            lambda ee, tc: cec_performance(ee, tc, params)['p_mp'],
+            params['T_NOCT'])
+
+    def set_derived_fields(self):
+        # values may still be strings from the upload
+        self.nameplate = float(self.I_mp_ref) * float(self.V_mp_ref)
+        self.search_text = self.get_search_text(self)
+        self.content_hash = self.get_content_hash(self)
+        self.latest_version = max(
+            self.latest_version or 0, int(self.Version or 0))
 
     def __str__(self):
         return self.Name
@@ -352,33 +1095,143 @@ class CEC_Module(PVBaseModel):
     class Meta:
         verbose_name = "CEC Module"
         unique_together = ('Name', 'Date', 'Version')
+        # keyset pagination by (sort key, id)
+        indexes = [
+            models.Index(fields=['Name', 'id']),
+            models.Index(fields=['STC', 'id']),
+            models.Index(fields=['nameplate', 'id'])]
 
     @classmethod
-    def upload_handler(cls, kwargs):
-        # handle technology
-        tech = cls.TECH_TYPES.get(kwargs['Technology'], 0)
-        kwargs['Technology'] = tech
-        LOGGER.debug('Technology = %d', tech)
-        # handle version
-        ver = cls.VER_TYPES.get(kwargs['Version'], 0)
-        kwargs['Version'] = ver
-        LOGGER.debug('Version = %d', ver)
-        # handle BIPV
-        bipv = kwargs['BIPV'] == 'Y'
-        kwargs['BIPV'] = bipv
-        LOGGER.debug('BIPV = %r', bipv)
-        # handle date
-        timestamp = kwargs['Date']
-        try:
-            timestamp = datetime.strptime(timestamp, '%m/%d/%Y')
-        except (ValueError, TypeError) as exc:
-            LOGGER.exception(exc)
-            timestamp = datetime.now()
-        kwargs['Date'] = timestamp
-        LOGGER.debug('Date = %s', timestamp.isoformat())
-        # handle Length and Width
-        if not kwargs['Length']:
-            kwargs['Length'] = None
-        if not kwargs['Width']:
-            kwargs['Width'] = None
-        return kwargs
+    def normalize_upload(cls, df):
+        df['Technology'] = df['Technology'].map(cls.TECH_TYPES).fillna(
+            0).astype(int)
+        df['Version'] = df['Version'].map(cls.VER_TYPES).fillna(0).astype(
+            int)
+        df['BIPV'] = df['BIPV'] == 'Y'
+        df['Date'] = _parse_dates(df['Date'], date.today(), 'Date')
+        return df
+
+
+class VersionMembership(models.Model):
+    """
+    A SAM library version that a record is part of. Records are added to
+    their own version, and to later versions with identical parameters by
+    uploads.
+    """
+    version = models.IntegerField(db_index=True)
+
+    class Meta:
+        abstract = True
+        unique_together = ('record', 'version')
+
+    def __str__(self):
+        return '{} in {}'.format(self.record, self.get_version_display())
+
+
+class PVInverterVersion(VersionMembership):
+    record = models.ForeignKey(
+        PVInverter, related_name='memberships', on_delete=models.CASCADE)
+    version = models.IntegerField(
+        choices=PVInverter.SAM_VERSION, db_index=True)
+
+
+class CEC_ModuleVersion(VersionMembership):
+    record = models.ForeignKey(
+        CEC_Module, related_name='memberships', on_delete=models.CASCADE)
+    version = models.IntegerField(choices=CEC_Module.VERSION, db_index=True)
+
+
+def add_own_version(sender, instance, raw=False, **kwargs):
+    """Add saved records to their version, bulk uploads add them too."""
+    if raw:
+        return
+    sender.membership_model().objects.get_or_create(
+        record=instance, version=getattr(instance, sender.VERSION_FIELD))
+
+
+signals.post_save.connect(add_own_version, sender=PVInverter)
+signals.post_save.connect(add_own_version, sender=CEC_Module)
+
+
+class UploadJob(models.Model):
+    """
+    A SAM library upload imported in the background, with its progress.
+    Only one job at a time imports the same file into the same model.
+    """
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS = [
+        (PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'),
+        (FAILED, 'Failed')]
+    ACTIVE = (PENDING, RUNNING)
+    # model names and the upload selections
+    MODELS = [
+        ('PVModule', 'Sandia Modules'), ('PVInverter', 'CEC Inverters'),
+        ('CEC_Module', 'CEC Modules')]
+    # number of failed rows kept with the job
+    MAX_ERRORS = 100
+
+    user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    model = models.CharField(max_length=20, choices=MODELS)
+    sam_version = models.CharField(max_length=20, blank=True, default='')
+    file_name = models.CharField(max_length=255)
+    path = models.CharField(max_length=1024)
+    sha256 = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=10, choices=STATUS, default=PENDING, db_index=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    bytes_read = models.BigIntegerField(default=0)
+    rows = models.IntegerField(default=0)
+    created = models.IntegerField(default=0)
+    duplicate = models.IntegerField(default=0)
+    unchanged = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True, default='')
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(null=True, blank=True)
+    modified_on = models.DateTimeField(auto_now=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'sam_version', 'sha256'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_upload')]
+
+    def __str__(self):
+        return '{} "{}" ({})'.format(
+            self.get_model_display(), self.file_name, self.status)
+
+    def get_model(self):
+        return apps.get_model('parameters', self.model)
+
+    @property
+    def is_finished(self):
+        return self.status not in self.ACTIVE
+
+    @property
+    def eta(self):
+        """Estimated seconds left, from the bytes read so far."""
+        if self.is_finished:
+            return 0.0
+        if not (self.started_on and self.size and self.bytes_read):
+            return None
+        elapsed = (timezone.now() - self.started_on).total_seconds()
+        return elapsed * (self.size - self.bytes_read) / self.bytes_read
+
+    def progress(self):
+        """Progress of the job as a JSON serializable dictionary."""
+        percent = (
+            100.0 * self.bytes_read / self.size if self.size else None)
+        if self.status == self.DONE:
+            percent = 100.0
+        return {
+            'id': self.pk, 'upload': self.get_model_display(),
+            'file_name': self.file_name, 'status': self.status,
+            'rows': self.rows, 'created': self.created,
+            'duplicate': self.duplicate, 'unchanged': self.unchanged,
+            'failed': self.failed,
+            'errors': self.errors, 'bytes_read': self.bytes_read,
+            'size': self.size, 'percent': percent, 'eta': self.eta,
+            'message': self.message}
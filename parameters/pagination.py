@@ -0,0 +1,171 @@
+"""
+Keyset pagination of catalog querysets.
+
+Instead of skipping ``OFFSET`` rows, the next page starts after the sort key
+and ``id`` of the last row of the previous page, which is a range scan on a
+``(sort key, id)`` index so deep pages are as fast as the first. The key is
+passed as a signed cursor, and querysets that can't use a keyset, *EG*:
+sorted by a nullable field or an annotation, fall back to ``OFFSET``.
+"""
+from datetime import date
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
+from urllib.parse import urlencode
+
+CURSOR_SALT = 'parameters.pagination'
+
+
+def keyset_ordering(queryset):
+    """
+    Ordering of ``queryset`` as a list of field names and ``True`` if
+    descending, ending with the primary key so the order is unique. An
+    unordered queryset is ordered by primary key.
+
+    :returns: list of ``(name, descending)`` or ``None`` if the ordering
+        can't be used as a keyset
+    """
+    opts = queryset.model._meta
+    ordering = []
+    for item in queryset.query.order_by:
+        if not isinstance(item, str) or item == '?':
+            return None
+        desc = item.startswith('-')
+        name = item.lstrip('-')
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None  # annotation or extra select
+        # NULL doesn't compare, so nullable fields can't be keys
+        if field.is_relation or field.null:
+            return None
+        ordering.append((field.name, desc))
+        if field.primary_key:
+            return ordering
+    ordering.append((opts.pk.name, False))
+    return ordering
+
+
+def order_by(ordering):
+    """Arguments of :meth:`~django.db.models.query.QuerySet.order_by`."""
+    return [('-' if desc else '') + name for name, desc in ordering]
+
+
+def keyset_filter(ordering, values):
+    """
+    Filter for the rows after ``values`` in ``ordering``, *EG*: for
+    ``[('Paco', True), ('id', False)]`` the rows with ``Paco < value`` or
+    ``Paco = value and id > pk``.
+    """
+    (name, desc), value = ordering[0], values[0]
+    # redundant bound on the first key so the index range scan is used
+    q = Q(**{f'{name}__{"lte" if desc else "gte"}': value})
+    after, equal = Q(), Q()
+    for (name, desc), value in zip(ordering, values):
+        after |= equal & Q(**{f'{name}__{"lt" if desc else "gt"}': value})
+        equal &= Q(**{name: value})
+    return q & after
+
+
+def _cursor_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def encode_cursor(ordering, obj, **extra):
+    """
+    Signed cursor that points after ``obj``.
+
+    :param obj: a model instance, or a dictionary of field values
+    :param extra: other JSON values to store in the cursor
+    """
+    if isinstance(obj, dict):
+        values = [obj[name] for name, _ in ordering]
+    else:
+        values = [getattr(obj, name) for name, _ in ordering]
+    payload = {
+        'order': order_by(ordering),
+        'values': [_cursor_value(value) for value in values]}
+    payload.update(extra)
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, ordering, **expected):
+    """
+    Decode a cursor from :func:`encode_cursor`.
+
+    :param expected: values the cursor must have, *EG*: the search text
+    :returns: dictionary with the cursor ``values`` and any extra values, or
+        ``None`` if the cursor is invalid or doesn't match ``ordering`` and
+        ``expected``
+    """
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if payload.get('order') != order_by(ordering):
+        return None
+    if any(payload.get(k) != v for k, v in expected.items()):
+        return None
+    return payload
+
+
+class KeysetPaginator(Paginator):
+    """
+    Tastypie paginator with keyset pages. The ``next`` link has an ``after``
+    cursor instead of an ``offset``, so clients that follow ``next`` get
+    constant time pages. ``offset`` still works for random access.
+    """
+
+    def __init__(self, request_data, objects, *args, **kwargs):
+        super().__init__(request_data, objects, *args, **kwargs)
+        self.ordering = None
+        if hasattr(objects, 'query'):
+            self.ordering = keyset_ordering(objects)
+        if self.ordering is not None:
+            self.objects = objects.order_by(*order_by(self.ordering))
+
+    def _generate_uri(self, limit, offset, after=None):
+        if self.resource_uri is None:
+            return None
+        request_params = self.request_data.copy()
+        for k in ('limit', 'offset', 'after'):
+            request_params.pop(k, None)
+        request_params['limit'] = str(limit)
+        if after is None:
+            request_params['offset'] = str(offset)
+        else:
+            request_params['after'] = after
+        try:
+            encoded_params = request_params.urlencode()
+        except AttributeError:
+            encoded_params = urlencode(request_params)
+        return '%s?%s' % (self.resource_uri, encoded_params)
+
+    def page(self):
+        if self.ordering is None:
+            return super().page()
+        after = self.request_data.get('after')
+        limit = self.get_limit()
+        if after:
+            cursor = decode_cursor(after, self.ordering)
+            if cursor is None:
+                raise BadRequest("Invalid 'after' cursor provided.")
+            offset, count = cursor['offset'], cursor['count']
+            objects = self.objects.filter(
+                keyset_filter(self.ordering, cursor['values']))
+        else:
+            offset, count = self.get_offset(), self.get_count()
+            objects = self.objects[offset:]
+        objects = list(objects[:limit] if limit else objects)
+        meta = {'offset': offset, 'limit': limit, 'total_count': count}
+        if limit:
+            meta['previous'] = self.get_previous(limit, offset)
+            meta['next'] = None
+            if objects and offset + len(objects) < count:
+                meta['next'] = self._generate_uri(
+                    limit, None, encode_cursor(
+                        self.ordering, objects[-1],
+                        offset=offset + len(objects), count=count))
+        return {self.collection_name: objects, 'meta': meta}
@@ -0,0 +1,352 @@
+"""
+Vectorized pvlib model evaluation for parameter records.
+"""
+import numpy as np
+from pvlib.pvsystem import calcparams_cec, singlediode, sapm
+from pvlib.singlediode import bishop88
+from pvlib.temperature import sapm_cell
+
+CEC_PARAMS = (
+    'alpha_sc', 'a_ref', 'I_L_ref', 'I_o_ref', 'R_sh_ref', 'R_s', 'Adjust')
+SINGLEDIODE_METHODS = ('lambertw', 'newton', 'brentq')
+SINGLEDIODE_KEYS = ('i_sc', 'v_oc', 'i_mp', 'v_mp', 'p_mp')
+IVCURVE_PNTS = 100
+CHUNK_POINTS = 1000000
+# IEC 61853-1 irradiance and temperature matrix
+IEC61853_IRRADIANCE = (100.0, 200.0, 400.0, 600.0, 800.0, 1000.0, 1100.0)
+IEC61853_TEMPERATURE = (15.0, 25.0, 50.0, 75.0)
+SAPM_PARAMS = (
+    'Isco', 'Voco', 'Impo', 'Vmpo', 'Aisc', 'Aimp', 'C0', 'C1', 'Bvoco',
+    'Mbvoc', 'Bvmpo', 'Mbvmp', 'N', 'C2', 'C3', 'Cells_in_Series', 'IXO',
+    'IXXO', 'C4', 'C5', 'C6', 'C7')
+SAPM_THERMAL_PARAMS = ('A', 'B', 'DTC')
+SAPM_NAN_PARAMS = ('C4', 'C5', 'C6', 'C7', 'IXO', 'IXXO')
+SAPM_KEYS = ('i_sc', 'v_oc', 'i_mp', 'v_mp', 'p_mp', 'i_x', 'i_xx')
+SANDIA_INVERTER_PARAMS = (
+    'Paco', 'Pdco', 'Vdco', 'Pso', 'C0', 'C1', 'C2', 'C3', 'Pnt')
+STRING_SIZING_MODULE_PARAMS = CEC_PARAMS + ('T_NOCT', 'STC')
+STRING_SIZING_INVERTER_PARAMS = (
+    'Paco', 'Vdcmax', 'Idcmax', 'Mppt_low', 'Mppt_high')
+STRING_SIZING_KEYS = (
+    'min_modules', 'max_modules', 'strings', 'ilr', 'voc_cold', 'vmp_hot',
+    'isc_hot')
+# weighted efficiency levels as (fraction of Pdco, weight)
+CEC_EFFICIENCY_LEVELS = (
+    (0.1, 0.04), (0.2, 0.05), (0.3, 0.12), (0.5, 0.21), (0.75, 0.53),
+    (1.0, 0.05))
+EURO_EFFICIENCY_LEVELS = (
+    (0.05, 0.03), (0.1, 0.06), (0.2, 0.13), (0.3, 0.10), (0.5, 0.48),
+    (1.0, 0.20))
+LOW_IRRADIANCE = 200.0
+NOCT_IRRADIANCE = 800.0
+
+
+def stack_params(records, keys):
+    """
+    Stack parameter records into arrays with one row per record, and a
+    trailing axis of length one that broadcasts with the conditions.
+
+    :param records: sequence of dictionaries or mappings with ``keys``, or a
+        structured array with fields ``keys``
+    :param keys: names of the parameters to stack
+    :returns: dictionary of arrays with shape ``(len(records), 1)``, missing
+        values are ``NaN``
+    """
+    if isinstance(records, np.ndarray):
+        return {
+            k: records[k].astype(float)[:, np.newaxis] for k in keys}
+    return {
+        k: np.array([r[k] for r in records], dtype=float)[:, np.newaxis]
+        for k in keys}
+
+
+def get_ivcurve(v_oc, params, ivcurve_pnts=IVCURVE_PNTS):
+    """
+    Calculate IV curves from short circuit to open circuit, with points
+    concentrated near the knee. The last axis of the outputs is the curve, so
+    arrays of ``v_oc`` and ``params`` yield one curve per element.
+    """
+    logspace_pts = np.logspace(np.log10(11.0), 0.0, ivcurve_pnts)
+    v_oc = np.asarray(v_oc, dtype=float)[..., np.newaxis]
+    params = [np.asarray(p, dtype=float)[..., np.newaxis] for p in params]
+    return bishop88(v_oc * (11.0 - logspace_pts) / 10.0, *params)
+
+
+def cec_performance(effective_irradiance, temp_cell, cec_mod_params,
+                    method='lambertw', ivcurve_pnts=None):
+    """
+    Evaluate the CEC single diode model for all points in one call.
+
+    :param effective_irradiance: irradiance [W/m2], broadcast with temp_cell
+    :param temp_cell: cell temperature [C]
+    :param cec_mod_params: dictionary with keys in :data:`CEC_PARAMS`, values
+        can be scalars or arrays that broadcast with the conditions
+    :param method: one of :data:`SINGLEDIODE_METHODS`
+    :param ivcurve_pnts: number of IV curve points, or ``None`` to skip curves
+    :returns: dictionary of arrays with keys in :data:`SINGLEDIODE_KEYS` and
+        ``i``, ``v``, and ``p`` if ``ivcurve_pnts`` is given
+    """
+    params = calcparams_cec(
+        effective_irradiance=effective_irradiance, temp_cell=temp_cell,
+        **{k: cec_mod_params[k] for k in CEC_PARAMS})
+    params = np.broadcast_arrays(*params)
+    shape = params[0].shape
+    # singlediode only handles scalars or 1-D arrays, so flatten and reshape
+    result = singlediode(*[p.ravel() for p in params], method=method)
+    result = {
+        k: np.asarray(result[k]).reshape(shape) for k in SINGLEDIODE_KEYS}
+    if ivcurve_pnts:
+        # ivcurve_pnts deprecated in pvlib-0.10
+        result['i'], result['v'], result['p'] = get_ivcurve(
+            result['v_oc'], params, ivcurve_pnts)
+    return result
+
+
+def sapm_performance(effective_irradiance, temp_cell, pvmod_params):
+    """
+    Evaluate the Sandia array performance model in one broadcasted pass.
+
+    :param effective_irradiance: irradiance [W/m2]
+    :param temp_cell: cell temperature [C]
+    :param pvmod_params: dictionary with keys in :data:`SAPM_PARAMS`, values
+        can be scalars or arrays from :func:`stack_params`
+    :returns: dictionary of arrays with keys in :data:`SAPM_KEYS`
+    """
+    pvmod_params = {k: pvmod_params[k] for k in SAPM_PARAMS}
+    # missing optional coefficients are zero, same as the detail page
+    for k in SAPM_NAN_PARAMS:
+        pvmod_params[k] = np.nan_to_num(
+            np.asarray(pvmod_params[k], dtype=float), nan=0.0)
+    result = sapm(effective_irradiance, temp_cell, pvmod_params)
+    return {k: np.asarray(result[k]) for k in SAPM_KEYS}
+
+
+def sapm_temp_cell(poa_global, temp_air, wind_speed, pvmod_params):
+    """
+    Cell temperature from the Sandia thermal model using the module
+    coefficients ``A``, ``B``, and ``DTC``.
+    """
+    return sapm_cell(
+        poa_global, temp_air, wind_speed, pvmod_params['A'],
+        pvmod_params['B'], pvmod_params['DTC'])
+
+
+def sandia_inverter_unclipped(v_dc, p_dc, pvinv_params):
+    """
+    AC power from the Sandia inverter model before clipping and night tare.
+    Same as :func:`pvlib.inverter.sandia` but parameters can be stacked
+    arrays from :func:`stack_params`.
+    """
+    Paco = pvinv_params['Paco']
+    Pdco = pvinv_params['Pdco']
+    Vdco = pvinv_params['Vdco']
+    Pso = pvinv_params['Pso']
+    A = Pdco * (1 + pvinv_params['C1'] * (v_dc - Vdco))
+    B = Pso * (1 + pvinv_params['C2'] * (v_dc - Vdco))
+    C = pvinv_params['C0'] * (1 + pvinv_params['C3'] * (v_dc - Vdco))
+    return (Paco / (A - B) - C * (A - B)) * (p_dc - B) + C * (p_dc - B)**2
+
+
+def sandia_inverter_limits(power_ac, p_dc, pvinv_params):
+    """
+    Clip AC power at ``Paco`` and use the night tare below ``Pso``, using
+    :func:`numpy.where` so that limits broadcast with stacked parameters.
+    """
+    power_ac = np.minimum(pvinv_params['Paco'], power_ac)
+    return np.where(
+        p_dc < pvinv_params['Pso'], -np.abs(pvinv_params['Pnt']), power_ac)
+
+
+def sandia_inverter(v_dc, p_dc, pvinv_params):
+    """
+    Evaluate the Sandia inverter model in one broadcasted pass.
+
+    :param v_dc: DC voltage [V]
+    :param p_dc: DC power [W]
+    :param pvinv_params: dictionary with keys in
+        :data:`SANDIA_INVERTER_PARAMS`, values can be scalars or arrays from
+        :func:`stack_params`
+    :returns: AC power [W]
+    """
+    power_ac = sandia_inverter_unclipped(v_dc, p_dc, pvinv_params)
+    return sandia_inverter_limits(power_ac, p_dc, pvinv_params)
+
+
+def clipping_summary(p_dc, power_ac, power_ac_unclipped, pvinv_params,
+                     timestep=1.0):
+    """
+    Summarize clipping and efficiency along the last axis of the AC power.
+
+    :param p_dc: DC power [W]
+    :param power_ac: AC power after limits [W]
+    :param power_ac_unclipped: AC power before limits [W]
+    :param pvinv_params: dictionary with ``Paco`` and ``Pso``
+    :param timestep: duration of each value [h]
+    :returns: dictionary of arrays with ``dc_energy``, ``ac_energy``, and
+        ``clipped_energy`` [Wh], ``clipping_loss`` as a fraction of the
+        unclipped AC energy, ``clipped_steps``, and ``efficiency``
+    """
+    p_dc = np.broadcast_to(p_dc, np.shape(power_ac))
+    operating = p_dc >= pvinv_params['Pso']
+    clipped = np.where(
+        operating, np.maximum(power_ac_unclipped - pvinv_params['Paco'], 0),
+        0)
+    dc_energy = p_dc.sum(axis=-1) * timestep
+    ac_energy = power_ac.sum(axis=-1) * timestep
+    clipped_energy = clipped.sum(axis=-1) * timestep
+    with np.errstate(divide='ignore', invalid='ignore'):
+        clipping_loss = clipped_energy / (ac_energy + clipped_energy)
+        efficiency = ac_energy / dc_energy
+    return {
+        'dc_energy': dc_energy, 'ac_energy': ac_energy,
+        'clipped_energy': clipped_energy, 'clipping_loss': clipping_loss,
+        'clipped_steps': (clipped > 0).sum(axis=-1),
+        'efficiency': efficiency}
+
+
+def string_sizing(cec_mod_params, pvinv_params, temp_min, temp_max,
+                  target_ilr=1.25, irradiance=1000.0):
+    """
+    Size strings for every combination of modules and inverters.
+
+    Module voltages and currents are calculated once per module with the CEC
+    single diode model at the coldest cell temperature, equal to the minimum
+    ambient temperature, and at the hottest cell temperature, estimated from
+    the maximum ambient temperature and the module NOCT. Then every module is
+    paired with every inverter by broadcasting module columns with inverter
+    rows.
+
+    :param cec_mod_params: dictionary with keys in
+        :data:`STRING_SIZING_MODULE_PARAMS` and shape ``(N, 1)``
+    :param pvinv_params: dictionary with keys in
+        :data:`STRING_SIZING_INVERTER_PARAMS` and shape ``(1, M)``
+    :param temp_min: minimum site ambient temperature [C]
+    :param temp_max: maximum site ambient temperature [C]
+    :param target_ilr: the number of strings is chosen closest to this
+        inverter loading ratio without exceeding the inverter max DC current
+    :param irradiance: irradiance used to size strings [W/m2]
+    :returns: dictionary of arrays with shape ``(N, M)`` and keys in
+        :data:`STRING_SIZING_KEYS` and ``valid``, a boolean array that is true
+        if at least one string length and one string fit the inverter
+    """
+    t_noct = cec_mod_params['T_NOCT']
+    temp_hot = temp_max + (t_noct - 20.0) * irradiance / 800.0
+    temp_cell = np.concatenate(
+        [np.full_like(temp_hot, temp_min), temp_hot], axis=-1)
+    result = cec_performance(irradiance, temp_cell, cec_mod_params)
+    voc_cold, vmp_cold = result['v_oc'][:, :1], result['v_mp'][:, :1]
+    vmp_hot, isc_hot = result['v_mp'][:, 1:], result['i_sc'][:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_modules = np.floor(np.minimum(
+            pvinv_params['Vdcmax'] / voc_cold,
+            pvinv_params['Mppt_high'] / vmp_cold))
+        min_modules = np.maximum(
+            np.ceil(pvinv_params['Mppt_low'] / vmp_hot), 1.0)
+        max_strings = np.floor(pvinv_params['Idcmax'] / isc_hot)
+        string_power = max_modules * cec_mod_params['STC']
+        strings = np.clip(
+            np.round(target_ilr * pvinv_params['Paco'] / string_power),
+            1.0, max_strings)
+        ilr = strings * string_power / pvinv_params['Paco']
+    valid = (
+        np.isfinite(ilr) & (min_modules <= max_modules) & (max_strings >= 1))
+    shape = valid.shape
+    return {
+        'min_modules': min_modules, 'max_modules': max_modules,
+        'strings': strings, 'ilr': ilr,
+        'voc_cold': np.broadcast_to(voc_cold, shape),
+        'vmp_hot': np.broadcast_to(vmp_hot, shape),
+        'isc_hot': np.broadcast_to(isc_hot, shape), 'valid': valid}
+
+
+def noct_temp_cell(poa_global, temp_air, t_noct):
+    """
+    Cell temperature from the nominal operating cell temperature, which rises
+    linearly with irradiance above ambient, 800 [W/m2] at 20 [C] ambient.
+    """
+    return temp_air + (t_noct - 20.0) * poa_global / 800.0
+
+
+def chunked_energy(evaluate, params, weights, chunk_points=CHUNK_POINTS):
+    """
+    Sum weighted power over conditions for every stacked record, evaluating
+    blocks of records at a time to bound memory.
+
+    :param evaluate: callable that takes a dictionary of parameter arrays for
+        a block of records and returns power with shape
+        ``(records, conditions)``
+    :param params: dictionary of parameter arrays from :func:`stack_params`
+    :param weights: weight of each condition, *EG*: duration [h]
+    :param chunk_points: max number of records times conditions per block
+    :returns: weighted sum for each record, *EG*: energy [Wh]
+    """
+    weights = np.asarray(weights, dtype=float)
+    nrecords = len(next(iter(params.values()), []))
+    rows = max(chunk_points // max(weights.size, 1), 1)
+    energy = np.empty(nrecords)
+    for start in range(0, nrecords, rows):
+        block = {k: v[start:start + rows] for k, v in params.items()}
+        power = evaluate(block)
+        energy[start:start + rows] = np.nansum(power * weights, axis=-1)
+    return energy
+
+
+def top_n(values, n):
+    """
+    Indices of the ``n`` largest values in descending order, using a partial
+    sort so only the top values are fully sorted. ``NaN`` are ranked last.
+    """
+    values = np.where(np.isnan(values), -np.inf, values)
+    n = min(n, values.size)
+    if n < 1:
+        return np.array([], dtype=int)
+    idx = np.argpartition(-values, n - 1)[:n]
+    return idx[np.argsort(-values[idx], kind='stable')]
+
+
+def finite_or_none(values):
+    """Convert array to nested lists with NaN and inf replaced by ``None``."""
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def weighted_efficiency(pvinv_params, levels=CEC_EFFICIENCY_LEVELS):
+    """
+    Weighted efficiency of the Sandia inverter model at ``Vdco``.
+
+    :param pvinv_params: dictionary with keys in
+        :data:`SANDIA_INVERTER_PARAMS`, values can be stacked arrays from
+        :func:`stack_params`
+    :param levels: sequence of DC power as a fraction of ``Pdco`` and its
+        weight, *EG*: :data:`CEC_EFFICIENCY_LEVELS`
+    :returns: weighted efficiency of each record
+    """
+    fractions, weights = np.asarray(levels, dtype=float).T
+    p_dc = pvinv_params['Pdco'] * fractions
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eff = sandia_inverter(pvinv_params['Vdco'], p_dc, pvinv_params) / p_dc
+    return eff @ weights
+
+
+def module_metrics(evaluate, t_noct):
+    """
+    Relative efficiency at low irradiance and power at NOCT, from a module
+    model evaluated once for all records.
+
+    :param evaluate: callable that takes effective irradiance [W/m2] and cell
+        temperature [C] with shape ``(records, 3)`` and returns max power
+    :param t_noct: stacked nominal operating cell temperature [C]
+    :returns: dictionary with ``low_irradiance_eff``, the efficiency at
+        :data:`LOW_IRRADIANCE` relative to STC, and ``pmp_noct``, the max
+        power at :data:`NOCT_IRRADIANCE` and the NOCT
+    """
+    t_noct = np.asarray(t_noct, dtype=float)
+    irradiance = np.array([1000.0, LOW_IRRADIANCE, NOCT_IRRADIANCE])
+    temp_cell = np.where([True, True, False], 25.0, t_noct)
+    irradiance = np.broadcast_to(irradiance, temp_cell.shape)
+    p_mp = evaluate(irradiance, temp_cell)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        low_irradiance_eff = (
+            p_mp[..., 1] / LOW_IRRADIANCE / (p_mp[..., 0] / 1000.0))
+    return {'low_irradiance_eff': low_irradiance_eff,
+            'pmp_noct': p_mp[..., 2]}
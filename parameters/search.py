@@ -0,0 +1,298 @@
+"""
+Indexed, ranked search of the parameter catalogs.
+
+Each catalog table has a ``search_text`` column with its searchable values
+that is set by ``save()``. On PostgreSQL the column has a trigram index, so
+substring matches don't scan the table, and the matches are ranked by full
+text rank weighted toward the name plus trigram word similarity. The full
+text vector is a stored ``search_vector`` column generated by PostgreSQL from
+the name and search text, with a GIN index, so ranking doesn't build a vector
+for every matching row. It isn't a model field, so Django never writes it,
+and a migration that alters the name or search text column must drop it
+first. The trigram index needs the
+``pg_trgm`` extension, which the search text migration creates with
+``TrigramExtension``, so the database user must be a superuser, or the
+database owner on PostgreSQL 13+ where ``pg_trgm`` is trusted, or an
+administrator must create the extension first, *EG*: allow-list it in the
+``azure.extensions`` server parameter on Azure. On SQLite the
+name and search text are mirrored by triggers into an FTS5 table with the
+trigram tokenizer and ranked by BM25. Other databases fall back to an
+unindexed ``icontains`` filter without ranking.
+
+Search text can also have field terms that filter model fields directly,
+so they use the field indexes instead of the text::
+
+    Paco>5000 Vdcmax<=600 name:SMA tech:CdTe year>=2015
+
+Fields are model field names or the model ``QUERY_ALIASES``, case
+insensitive. Operators are ``>``, ``>=``, ``<``, ``<=``, ``=``, ``!=``, and
+``:``, which is a case insensitive substring match for text and choice
+labels, and the same as ``=`` for numbers and dates. Dates also compare with
+a year. Terms that don't start with a field name are free text.
+"""
+import logging
+import re
+import shlex
+from django.core.exceptions import ValidationError
+from django.db.models import (
+    BooleanField, CharField, DateField, FloatField, Q, TextField, Value)
+from django.db.models.expressions import RawSQL
+
+LOGGER = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'simple'
+# the trigram tokenizer can't match terms shorter than a trigram
+MIN_FTS_TERM = 3
+# BM25 weights of the name and search text columns
+FTS_WEIGHTS = (10.0, 1.0)
+
+
+def fts_table(model):
+    """Name of the SQLite FTS5 table that mirrors ``model``."""
+    return f'{model._meta.db_table}_fts'
+
+
+def _sqlite_statements(model):
+    table = model._meta.db_table
+    fts = fts_table(model)
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"Name, search_text, content='{table}', content_rowid='id', "
+        f"tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} "
+        f"BEGIN INSERT INTO {fts}(rowid, Name, search_text) "
+        f"VALUES (new.id, new.Name, new.search_text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, Name, search_text) "
+        f"VALUES ('delete', old.id, old.Name, old.search_text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au "
+        f"AFTER UPDATE OF Name, search_text ON {table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, Name, search_text) "
+        f"VALUES ('delete', old.id, old.Name, old.search_text); "
+        f"INSERT INTO {fts}(rowid, Name, search_text) "
+        f"VALUES (new.id, new.Name, new.search_text); END",
+        # the rank column, unlike bm25(), also works with window functions
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({weights})')",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"]
+
+
+def _postgresql_statements(model):
+    table = model._meta.db_table
+    # the pg_trgm extension is created by a migration, it needs privileges
+    return [
+        # icontains on PostgreSQL is UPPER(column) LIKE UPPER(%s)
+        f"CREATE INDEX IF NOT EXISTS {table}_search_trgm ON {table} "
+        f"USING gin (UPPER(search_text) gin_trgm_ops)",
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector "
+        f"tsvector GENERATED ALWAYS AS ("
+        f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, "
+        f"coalesce(\"Name\", '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, "
+        f"coalesce(search_text, '')), 'B')) STORED",
+        f"CREATE INDEX IF NOT EXISTS {table}_search_vector ON {table} "
+        f"USING gin (search_vector)"]
+
+
+def create_search_index(connection, model):
+    """
+    Create the search index of ``model`` if it doesn't exist, or do nothing
+    if the database isn't supported.
+    """
+    if connection.vendor == 'sqlite':
+        statements = _sqlite_statements(model)
+    elif connection.vendor == 'postgresql':
+        statements = _postgresql_statements(model)
+    else:
+        LOGGER.warning(
+            'search index not supported on %s, %s search is unindexed',
+            connection.vendor, model.__name__)
+        return
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def drop_search_index(connection, model):
+    """Drop the search index of ``model``."""
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        fts = fts_table(model)
+        statements = [
+            f'DROP TRIGGER IF EXISTS {fts}_{suffix}'
+            for suffix in ('ai', 'ad', 'au')]
+        statements.append(f'DROP TABLE IF EXISTS {fts}')
+    elif connection.vendor == 'postgresql':
+        statements = [
+            f'DROP INDEX IF EXISTS {table}_search_trgm',
+            f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector']
+    else:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def restore_search_indexes(sender, using, **kwargs):
+    """
+    Receiver for ``post_migrate``. SQLite migrations that remake a table drop
+    its triggers, so recreate any missing search triggers and rebuild.
+    """
+    from django.db import connections
+    from parameters.models import PVInverter, PVModule, CEC_Module
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    tables = connection.introspection.table_names()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='trigger'")
+        triggers = {row[0] for row in cursor.fetchall()}
+    for model in (PVInverter, PVModule, CEC_Module):
+        fts = fts_table(model)
+        if fts not in tables:
+            continue  # not migrated yet
+        if {f'{fts}_ai', f'{fts}_ad', f'{fts}_au'} - triggers:
+            LOGGER.info('restoring %s search index', model.__name__)
+            create_search_index(connection, model)
+
+
+QUERY_TERM = re.compile(
+    r'^(?P<field>[A-Za-z_]\w*)(?P<op>>=|<=|!=|>|<|=|:)(?P<value>.+)$')
+RANGE_LOOKUPS = {'>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte'}
+YEAR = re.compile(r'^\d{4}$')
+BOOLEANS = {
+    'true': True, 'yes': True, 'y': True, '1': True,
+    'false': False, 'no': False, 'n': False, '0': False}
+
+
+class QueryError(ValueError):
+    """A field term in the search text has an invalid operator or value."""
+
+
+def query_fields(model):
+    """
+    Fields of ``model`` that can be used in search terms, keyed by lower case
+    name and alias.
+    """
+    fields = {
+        f.name.lower(): f for f in model._meta.concrete_fields
+        if not f.is_relation and f.name != 'search_text'}
+    for alias, name in model.QUERY_ALIASES.items():
+        fields[alias.lower()] = model._meta.get_field(name)
+    return fields
+
+
+def _term_filter(field, op, value):
+    name = field.name
+    if field.choices:
+        if op in RANGE_LOOKUPS:
+            raise QueryError(f'{name} can only be compared with : = or !=')
+        value = value.lower()
+        if op == ':':
+            matches = [
+                k for k, label in field.flatchoices
+                if value in str(label).lower()]
+        else:
+            matches = [
+                k for k, label in field.flatchoices
+                if value == str(label).lower()]
+        q = Q(**{f'{name}__in': matches})
+    elif isinstance(field, (CharField, TextField)):
+        if op in RANGE_LOOKUPS:
+            raise QueryError(f'{name} can only be compared with : = or !=')
+        lookup = 'icontains' if op == ':' else 'iexact'
+        q = Q(**{f'{name}__{lookup}': value})
+    elif isinstance(field, BooleanField):
+        if op in RANGE_LOOKUPS or value.lower() not in BOOLEANS:
+            raise QueryError(f'{name} must be yes or no')
+        q = Q(**{name: BOOLEANS[value.lower()]})
+    else:
+        lookup = RANGE_LOOKUPS.get(op, 'exact')
+        if isinstance(field, DateField) and YEAR.match(value):
+            # year lookups are rewritten as date ranges, so they're indexed
+            name, value = f'{name}__year', int(value)
+        else:
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                raise QueryError(f'{name} has invalid value: {value}')
+        q = Q(**{f'{name}__{lookup}': value})
+    return ~q if op == '!=' else q
+
+
+def parse_query(model, text):
+    """
+    Split search text into filters on ``model`` fields and free text.
+
+    :returns: a tuple with a :class:`~django.db.models.Q` of all field terms
+        and a list of free text terms
+    :raises QueryError: if a field term is invalid
+    """
+    try:
+        terms = shlex.split(text)
+    except ValueError:
+        # unbalanced quotes
+        terms = text.split()
+    fields = query_fields(model)
+    q, free_text = Q(), []
+    for term in terms:
+        match = QUERY_TERM.match(term)
+        field = match and fields.get(match.group('field').lower())
+        if field is None:
+            free_text.append(term)
+            continue
+        q &= _term_filter(field, match.group('op'), match.group('value'))
+    return q, free_text
+
+
+def _fts_query(terms):
+    # quote each term so FTS5 operators in the input are literal
+    return ' '.join('"%s"' % t.replace('"', '""') for t in terms)
+
+
+def search(queryset, text):
+    """
+    Filter ``queryset`` by the field terms in ``text`` and to records that
+    contain every free text term, case insensitive, and annotate it with
+    ``search_rank``, higher is better.
+
+    :raises QueryError: if a field term is invalid
+    """
+    from django.db import connections
+    connection = connections[queryset.db]
+    q, terms = parse_query(queryset.model, text)
+    queryset = queryset.filter(q)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, FloatField()))
+    model = queryset.model
+    if connection.vendor == 'sqlite':
+        fts_terms = [t for t in terms if len(t) >= MIN_FTS_TERM]
+        for term in terms:
+            if len(term) < MIN_FTS_TERM:
+                queryset = queryset.filter(search_text__icontains=term)
+        if not fts_terms:
+            return queryset.annotate(search_rank=Value(0.0, FloatField()))
+        fts = fts_table(model)
+        table = model._meta.db_table
+        # rank is bm25, which is lower for better matches
+        return queryset.extra(
+            select={'search_rank': f'-{fts}.rank'},
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+            params=[_fts_query(fts_terms)])
+    for term in terms:
+        queryset = queryset.filter(search_text__icontains=term)
+    if connection.vendor != 'postgresql':
+        return queryset.annotate(search_rank=Value(0.0, FloatField()))
+    from django.contrib.postgres.search import (
+        SearchQuery, SearchRank, SearchVectorField, TrigramWordSimilarity)
+    # the stored vector, weighted A for the name and B for the search text
+    vector = RawSQL(
+        '%s.search_vector' % connection.ops.quote_name(model._meta.db_table),
+        (), output_field=SearchVectorField())
+    text = ' '.join(terms)
+    query = SearchQuery(text, config=SEARCH_CONFIG)
+    # only the rows that passed the indexed filter are ranked
+    return queryset.annotate(
+        search_rank=SearchRank(vector, query)
+        + TrigramWordSimilarity(text, 'search_text'))
@@ -0,0 +1,173 @@
+"""
+Per-process columnar store of parameter tables.
+
+Each table is loaded once into a NumPy structured array sorted by ``id``, so
+compute code can get parameter vectors for thousands of records without
+touching the database. Saves and deletes mark rows dirty through the model
+signals, and dirty rows are fetched together on the next access. Signals are
+only sent in the writing process, so each access also checks the shared
+generation of the model, see :mod:`parameters.cache`, and reloads the whole
+table if another process wrote to it.
+"""
+import threading
+import numpy as np
+from django.db import models
+from parameters.cache import generation
+from parameters.performance import stack_params
+
+# order matters, BooleanField and AutoField are checked before IntegerField
+FIELD_DTYPES = (
+    (models.FloatField, 'f8'),
+    (models.BooleanField, '?'),
+    (models.IntegerField, 'i8'),
+    (models.DateField, 'M8[D]'),
+    (models.CharField, 'O'),
+    (models.TextField, 'O'),
+)
+
+
+def _field_dtype(field):
+    """NumPy dtype for a concrete model field, or ``None`` to skip it."""
+    if field.is_relation:
+        return None
+    for field_type, dtype in FIELD_DTYPES:
+        if isinstance(field, field_type):
+            # nullable integers need NaN
+            if field.null and dtype == 'i8':
+                return 'f8'
+            return dtype
+    return None
+
+
+class ParameterStore:
+    """
+    Columnar cache of one parameter table.
+
+    :param model: a :class:`~parameters.models.PVBaseModel` subclass
+    """
+
+    def __init__(self, model):
+        self.model = model
+        dtype = []
+        for field in model._meta.concrete_fields:
+            field_dtype = _field_dtype(field)
+            if field_dtype is not None:
+                dtype.append((field.attname, field_dtype))
+        self.dtype = np.dtype(dtype)
+        self._table = None
+        self._generation = None
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    @property
+    def fields(self):
+        return self.dtype.names
+
+    def _fetch(self, pks=None):
+        queryset = self.model.objects.order_by('pk')
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+        rows = list(queryset.values_list(*self.fields))
+        return np.array(rows, dtype=self.dtype)
+
+    def _refresh(self):
+        gen = generation(self.model)
+        if gen != self._generation:
+            # written by another process, or the generation was evicted
+            self._table = None
+        if self._table is None:
+            self._dirty.clear()
+            self._generation = gen
+            self._table = self._fetch()
+        elif self._dirty:
+            pks = list(self._dirty)
+            self._dirty.clear()
+            fresh = self._fetch(pks)
+            keep = ~np.isin(self._table['id'], pks)
+            table = np.concatenate([self._table[keep], fresh])
+            # make a new array so readers keep a consistent snapshot
+            self._table = table[np.argsort(table['id'], kind='stable')]
+        return self._table
+
+    def table(self):
+        """The whole table as a structured array sorted by ``id``."""
+        with self._lock:
+            return self._refresh()
+
+    def rows(self, pks):
+        """
+        Row indices of ``pks`` in :meth:`table`, in the same order.
+
+        :returns: a tuple with the table, the row indices of the ``pks`` that
+            exist, and a list of the ``pks`` that don't exist
+        """
+        table = self.table()
+        pks = np.asarray(pks, dtype=int)
+        rows = np.searchsorted(table['id'], pks)
+        found = rows < table.size
+        found[found] = table['id'][rows[found]] == pks[found]
+        return table, rows[found], pks[~found].tolist()
+
+    def get(self, pks=None):
+        """
+        Records for ``pks``, or all records if ``None``.
+
+        :returns: a tuple with a structured array of records in the same order
+            as ``pks`` and a list of any ``pks`` that don't exist
+        """
+        if pks is None:
+            return self.table(), []
+        table, rows, missing = self.rows(pks)
+        return table[rows], missing
+
+    def params(self, fields, pks=None):
+        """
+        Parameter columns for ``pks`` stacked with one row per record, like
+        :func:`parameters.performance.stack_params`.
+
+        :returns: a tuple with a dictionary of float arrays with shape
+            ``(len(pks), 1)`` and a list of any ``pks`` that don't exist
+        """
+        records, missing = self.get(pks)
+        return stack_params(records, fields), missing
+
+    def invalidate(self, pk=None):
+        """
+        Mark the record ``pk`` dirty, or the whole table if ``None``. Call it
+        after the generation of the model is bumped for the write.
+        """
+        with self._lock:
+            if pk is None:
+                self._table = None
+            elif self._table is not None:
+                self._dirty.add(pk)
+                # if this write is the only one since the last access, keep
+                # the table and just fetch the dirty rows
+                gen = generation(self.model)
+                if gen == self._generation + 1:
+                    self._generation = gen
+
+
+STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(model):
+    """Get the parameter store for ``model``, creating it if needed."""
+    with _STORES_LOCK:
+        if model not in STORES:
+            STORES[model] = ParameterStore(model)
+        return STORES[model]
+
+
+def invalidate_store(sender, instance, **kwargs):
+    """Signal receiver for ``post_save`` and ``post_delete``."""
+    store = STORES.get(sender)
+    if store is not None:
+        store.invalidate(instance.pk)
+
+
+def clear_stores():
+    """Reload every store on next access, *EG*: after bulk changes."""
+    for store in STORES.values():
+        store.invalidate()
@@ -1,9 +1,32 @@
+import csv
+import json
 import os
+import re
 from datetime import date, datetime
-from parameters.models import PVModule, PVInverter, CEC_Module, MISSING_VINTAGE
-from django.test import TestCase, Client
+from io import BytesIO, StringIO
+from parameters.models import (
+    PVModule, PVInverter, PVInverterVersion, CEC_Module, UploadJob,
+    MISSING_VINTAGE, _existing_content)
+from parameters.jobs import (
+    STALE_JOB, run_upload, start_upload, upload_finished)
+from parameters.store import get_store, clear_stores
+from parameters.cache import bump_generation
+from parameters.search import search, QueryError
+from parameters.pagination import keyset_ordering
+from parameters.performance import SANDIA_INVERTER_PARAMS
+from django.core.cache import cache
+from django.core.exceptions import FieldError, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.functions import Lower
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+from unittest import mock
 from django.contrib.auth.models import User
+import numpy as np
 import pandas as pd
+import pytest
+from pvlib import inverter, pvsystem
 
 BASEDIR = os.path.dirname(__file__)
 TESTDIR = os.path.join(BASEDIR, 'data')
@@ -16,6 +39,7 @@ PVINV_CEC_DATE = date(int(MISSING_VINTAGE), 1, 1)
 PVINV_CEC_TYPE = ''
 
 
+@override_settings(WARM_PLOTS=False, UPLOAD_IN_BACKGROUND=False)
 class UploadTestCase(TestCase):
     def setUp(self):
         self.testuser = User.objects.create_superuser(
@@ -119,3 +143,768 @@ class UploadTestCase(TestCase):
                         self.assertIsNone(pvmod_val)
                 else:
                     self.assertAlmostEqual(pvmod_val, val)
+
+
+    def test_upload_summary(self):
+        with open(CEC_MODULES, 'rb') as fp:
+            data = fp.read()
+        lines = data.decode().splitlines(keepends=True)
+        nrows = len(lines) - 3
+        summary = CEC_Module.upload(BytesIO(data), self.testuser)
+        self.assertEqual(len(summary['created']), nrows)
+        self.assertEqual(
+            sorted(summary['created']),
+            sorted(CEC_Module.objects.values_list('pk', flat=True)))
+        self.assertEqual(summary['duplicate'], 0)
+        self.assertEqual(summary['failed'], [])
+        # metrics are set before the bulk insert
+        self.assertFalse(
+            CEC_Module.objects.filter(pmp_noct__isnull=True).exists())
+        summary = CEC_Module.upload(BytesIO(data), self.testuser)
+        self.assertEqual(summary['created'], [])
+        self.assertEqual(summary['duplicate'], nrows)
+        # invalid rows fail with their line number, repeated rows are
+        # duplicates, and the rest are created
+        CEC_Module.objects.all().delete()
+        columns = next(csv.reader(lines[:1]))
+        bad_row = next(csv.reader(lines[3:4]))
+        bad_row[columns.index('STC')] = 'abc'
+        bad = StringIO()
+        csv.writer(bad, lineterminator='\n').writerow(bad_row)
+        upload = ''.join(lines[:4] + [bad.getvalue()] + lines[4:] + lines[4:5])
+        summary = CEC_Module.upload(
+            BytesIO(upload.encode()), self.testuser, batch_size=2)
+        self.assertEqual(len(summary['created']), nrows)
+        self.assertEqual(summary['duplicate'], 1)
+        self.assertEqual(len(summary['failed']), 1)
+        self.assertEqual(summary['failed'][0]['row'], 5)
+        self.assertIn('STC', summary['failed'][0]['error'])
+
+    def test_upload_rollback(self):
+        with open(CEC_MODULES) as fp:
+            lines = fp.readlines()
+        upload = ''.join(lines).encode()
+        # an error after the first batch is inserted creates nothing
+        with mock.patch.object(
+                CEC_Module, 'set_metrics',
+                side_effect=[None, RuntimeError('metrics failed')]):
+            with self.assertRaises(RuntimeError):
+                CEC_Module.upload(BytesIO(upload), self.testuser, batch_size=2)
+        self.assertFalse(CEC_Module.objects.exists())
+        upload = ''.join(
+            [lines[0].rstrip() + ',Bogus\n'] + lines[1:])
+        with self.assertRaises(FieldError):
+            CEC_Module.upload(BytesIO(upload.encode()), self.testuser)
+        self.assertFalse(CEC_Module.objects.exists())
+        # short lines are missing values
+        upload = ''.join(lines + ['Short Module,Y\n'])
+        summary = CEC_Module.upload(BytesIO(upload.encode()), self.testuser)
+        self.assertEqual(len(summary['created']), len(lines) - 3)
+        self.assertEqual(summary['failed'][0]['row'], len(lines) + 1)
+        self.assertIn('STC: This field cannot be null.',
+                      summary['failed'][0]['error'])
+
+    def test_upload_stream(self):
+        with open(CEC_MODULES, 'rb') as fp:
+            lines = fp.read().decode().splitlines(keepends=True)
+        name = 'Sólar Ünïcödé €'
+        lines[3] = name + lines[3][lines[3].index(','):]
+        upload = SimpleUploadedFile('cec_modules.csv', ''.join(lines).encode())
+        # characters split between chunks are decoded
+        upload.DEFAULT_CHUNK_SIZE = 5
+        progress = []
+        summary = CEC_Module.upload(
+            upload, self.testuser, batch_size=2,
+            progress=lambda s, n, size: progress.append(
+                (len(s['created']), n, size)))
+        nrows = len(lines) - 3
+        self.assertEqual(len(summary['created']), nrows)
+        self.assertTrue(CEC_Module.objects.filter(Name=name).exists())
+        self.assertEqual(len(progress), -(-nrows // 2))
+        self.assertEqual(progress[-1], (nrows, upload.size, upload.size))
+        self.assertEqual(progress, sorted(progress))
+
+    def test_upload_messages(self):
+        self.client.force_login(self.testuser)
+        with open(CEC_MODULES) as fp:
+            nrows = len(fp.readlines()) - 3
+            fp.seek(0)
+            payload = {'uploadSelect': 'CEC Modules', 'uploadFile': fp}
+            r = self.client.post('/upload/', payload, follow=True)
+        self.assertContains(
+            r, f'{nrows} created, 0 duplicate, 0 unchanged, 0 failed')
+
+    def test_upload_job(self):
+        with open(CEC_MODULES, 'rb') as fp:
+            data = fp.read()
+        nrows = len(data.splitlines()) - 3
+        job, created = start_upload(
+            'CEC_Module', SimpleUploadedFile('cec.csv', data), self.testuser)
+        self.assertTrue(created)
+        self.assertEqual(job.status, UploadJob.PENDING)
+        self.assertEqual(job.size, len(data))
+        self.assertTrue(os.path.exists(job.path))
+        # the same file isn't imported twice at once
+        self.client.force_login(self.testuser)
+        payload = {
+            'uploadSelect': 'CEC Modules',
+            'uploadFile': SimpleUploadedFile('copy.csv', data)}
+        r = self.client.post('/upload/', payload, follow=True)
+        self.assertContains(r, 'copy.csv&quot; is already being uploaded.')
+        self.assertContains(r, f'/upload/jobs/{job.pk}/')
+        self.assertEqual(UploadJob.objects.count(), 1)
+        self.assertEqual(CEC_Module.objects.count(), 0)
+        receiver = mock.Mock()
+        upload_finished.connect(receiver)
+        self.addCleanup(upload_finished.disconnect, receiver)
+        job = run_upload(job.pk)
+        self.assertEqual(job.status, UploadJob.DONE)
+        receiver.assert_called_once()
+        self.assertEqual(receiver.call_args.kwargs['sender'], CEC_Module)
+        self.assertEqual(
+            sorted(receiver.call_args.kwargs['created']),
+            sorted(CEC_Module.objects.values_list('pk', flat=True)))
+        self.assertEqual(
+            (job.rows, job.created, job.duplicate, job.failed),
+            (nrows, nrows, 0, 0))
+        self.assertEqual(job.bytes_read, len(data))
+        self.assertFalse(os.path.exists(job.path))
+        r = self.client.get(f'/upload/jobs/{job.pk}/')
+        progress = r.json()
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['percent'], 100.0)
+        self.assertEqual(progress['eta'], 0.0)
+        self.assertIn(f'{nrows} created', progress['message'])
+        # the finished job isn't shown again
+        self.assertNotIn('upload_job', self.client.session)
+        # other users can't see the job
+        other = User.objects.create_user('other', 'other@test.com', 'x')
+        self.client.force_login(other)
+        self.assertEqual(
+            self.client.get(f'/upload/jobs/{job.pk}/').status_code, 404)
+        # the same file can be imported again once the job is finished
+        job, created = start_upload(
+            'CEC_Module', SimpleUploadedFile('cec.csv', data), self.testuser)
+        self.assertTrue(created)
+        job = run_upload(job.pk)
+        self.assertEqual((job.created, job.duplicate), (0, nrows))
+        # a file with the wrong format fails the job
+        job, created = start_upload(
+            'PVModule', SimpleUploadedFile('cec.csv', data), self.testuser)
+        job = run_upload(job.pk)
+        self.assertEqual(job.status, UploadJob.FAILED)
+        self.assertIn('has wrong format for Sandia Modules', job.message)
+
+    def test_interrupted_job(self):
+        with open(CEC_MODULES, 'rb') as fp:
+            data = fp.read()
+        job, _ = start_upload(
+            'CEC_Module', SimpleUploadedFile('cec.csv', data), self.testuser)
+        UploadJob.objects.filter(pk=job.pk).update(
+            modified_on=timezone.now() - STALE_JOB)
+        # a stale job doesn't block the same file, and its file is removed
+        new, created = start_upload(
+            'CEC_Module', SimpleUploadedFile('cec.csv', data), self.testuser)
+        self.assertTrue(created)
+        job.refresh_from_db()
+        self.assertEqual(job.status, UploadJob.FAILED)
+        self.assertFalse(os.path.exists(job.path))
+        self.assertTrue(os.path.exists(new.path))
+        run_upload(new.pk)
+
+
+@override_settings(WARM_PLOTS=False)
+class VersionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS) as fp:
+            self.lines = fp.readlines()
+
+    def upload(self, lines, version):
+        return PVInverter.upload(
+            BytesIO(''.join(lines).encode()), self.testuser, version)
+
+    def test_version_upload(self):
+        nrows = len(self.lines) - 3
+        summary = self.upload(self.lines, 1)
+        self.assertEqual(len(summary['created']), nrows)
+        # records are part of their own version
+        self.assertEqual(
+            PVInverterVersion.objects.filter(version=1).count(), nrows)
+        # the next version changes a record, removes one, and adds one
+        columns = next(csv.reader(self.lines[:1]))
+        changed = next(csv.reader(self.lines[3:4]))
+        paco = float(changed[columns.index('Paco')])
+        changed[columns.index('Paco')] = str(paco + 1)
+        added = next(csv.reader(self.lines[4:5]))
+        added[0] = 'New Inverter 240V [CEC 2024]'
+        rows = StringIO()
+        csv.writer(rows, lineterminator='\n').writerows([changed, added])
+        lines = self.lines[:3] + [rows.getvalue()] + self.lines[5:]
+        summary = self.upload(lines, 2)
+        self.assertEqual(len(summary['created']), 2)
+        self.assertEqual(summary['unchanged'], nrows - 2)
+        self.assertEqual(summary['duplicate'], 0)
+        # unchanged records are added to the new version, not copied
+        self.assertEqual(PVInverter.objects.count(), nrows + 2)
+        self.assertEqual(
+            PVInverterVersion.objects.filter(version=2).count(), nrows)
+        # the API shows the first, latest, and all versions of each record
+        r = self.client.get(
+            '/api/v1/pvinverter/', {'version': 2, 'limit': 0}).json()
+        pvinv = next(
+            obj for obj in r['objects']
+            if obj['Name'] == next(csv.reader(self.lines[5:6]))[0])
+        self.assertEqual(pvinv['SAM_Version'], '2018.11.11.r2')
+        self.assertEqual(pvinv['latest_version'], '2018.11.11.r3-r4')
+        self.assertEqual(
+            pvinv['versions'], ['2018.11.11.r2', '2018.11.11.r3-r4'])
+        summary = self.upload(lines, 2)
+        self.assertEqual(summary['created'], [])
+        self.assertEqual(summary['duplicate'], nrows)
+        r = self.client.get('/pvinverters/changelog/?from=1&to=2')
+        self.assertEqual(r.status_code, 200)
+        changelog = r.json()
+        self.assertEqual(changelog['from']['name'], '2018.11.11.r2')
+        self.assertEqual(
+            [c['Name'] for c in changelog['added']], [added[0]])
+        self.assertEqual(
+            [c['Name'] for c in changelog['removed']],
+            [next(csv.reader(self.lines[4:5]))[0]])
+        self.assertEqual(len(changelog['changed']), 1)
+        self.assertEqual(
+            changelog['changed'][0]['fields'], {'Paco': [paco, paco + 1]})
+        self.assertEqual(changelog['unchanged'], nrows - 2)
+        r = self.client.get('/pvinverters/changelog/?from=1&to=x')
+        self.assertEqual(r.status_code, 400)
+
+    def test_latest_version(self):
+        nrows = len(self.lines) - 3
+        self.upload(self.lines, 1)
+        self.upload(self.lines[:4] + self.lines[5:], 2)
+        removed = next(csv.reader(self.lines[4:5]))[0]
+        self.assertEqual(PVInverter.objects.count(), nrows)
+        self.assertEqual(PVInverter.library_version(), 2)
+        pvinvs = PVInverter.objects.in_version()
+        self.assertEqual(pvinvs.count(), nrows - 1)
+        self.assertFalse(pvinvs.filter(Name=removed).exists())
+        self.assertEqual(
+            set(pvinvs), set(PVInverter.objects.in_version(2)))
+        self.assertEqual(PVInverter.objects.in_version(1).count(), nrows)
+        self.assertEqual(PVInverter.objects.in_version('all').count(), nrows)
+        # catalog tables and the API show the latest version by default
+        payload = {
+            'draw': '1', 'start': '0', 'length': '100',
+            'columns[0][data]': 'Name'}
+        r = self.client.post('/pvinverters/', payload).json()
+        self.assertEqual(r['recordsTotal'], nrows - 1)
+        self.assertNotIn(removed, [row['Name'] for row in r['data']])
+        r = self.client.post(
+            '/pvinverters/', {**payload, 'version': 'all'}).json()
+        self.assertEqual(r['recordsTotal'], nrows)
+        r = self.client.post('/pvinverters/', {**payload, 'version': '99'})
+        self.assertIn('version', r.json()['error'])
+        r = self.client.get('/api/v1/pvinverter/?format=json&limit=0')
+        self.assertEqual(len(r.json()['objects']), nrows - 1)
+        r = self.client.get(
+            '/api/v1/pvinverter/?format=json&limit=0&version=1')
+        self.assertEqual(len(r.json()['objects']), nrows)
+        r = self.client.get('/api/v1/pvinverter/?format=json&version=x')
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get('/pvinverters/export/?format=ndjson&version=all')
+        self.assertEqual(
+            len(b''.join(r.streaming_content).splitlines()), nrows)
+
+    def test_identical_rows(self):
+        with open(CEC_MODULES) as fp:
+            lines = fp.readlines()
+        columns = next(csv.reader(lines[:1]))
+        row = next(csv.reader(lines[3:4]))
+        rows = StringIO()
+        writer = csv.writer(rows, lineterminator='\n')
+        for version in ('SAM 2023.10.31', 'SAM 2023.12.17'):
+            row[columns.index('Version')] = version
+            writer.writerow(row)
+        # identical rows of two versions in one batch are stored once
+        summary = CEC_Module.upload(
+            BytesIO((''.join(lines[:3]) + rows.getvalue()).encode()),
+            self.testuser)
+        self.assertEqual(len(summary['created']), 1)
+        self.assertEqual(summary['unchanged'], 1)
+        cecmod = CEC_Module.objects.get()
+        self.assertEqual(
+            sorted(cecmod.memberships.values_list('version', flat=True)),
+            [12, 13])
+        self.assertEqual(cecmod.latest_version, 13)
+
+    def test_identical_save(self):
+        self.upload(self.lines, 1)
+        pvinv = PVInverter.objects.first()
+        copy = PVInverter.objects.get(pk=pvinv.pk)
+        copy.pk = None
+        copy.SAM_Version = 2
+        # a record identical to another is a version of it
+        with self.assertRaises(ValidationError):
+            copy.save()
+        with self.assertRaises(ValidationError):
+            copy.full_clean()
+        other = PVInverter.objects.exclude(pk=pvinv.pk).first()
+        for field in PVInverter.content_fields():
+            setattr(other, field, getattr(pvinv, field))
+        other.SAM_Version = 2
+        with self.assertRaises(ValidationError):
+            other.save()
+        self.assertEqual(PVInverter.objects.count(), len(self.lines) - 3)
+
+    def test_concurrent_identical_upload(self):
+        nrows = len(self.lines) - 3
+        self.upload(self.lines, 1)
+        pvinv = PVInverter.objects.order_by('pk').first()
+        # another upload inserted the same content after this one checked
+        with mock.patch(
+                'parameters.models._existing_content',
+                side_effect=[({}, set()), mock.DEFAULT],
+                wraps=_existing_content):
+            summary = self.upload(self.lines[:4], 2)
+        self.assertEqual(summary['created'], [])
+        self.assertEqual(summary['unchanged'], 1)
+        self.assertEqual(PVInverter.objects.count(), nrows)
+        self.assertEqual(
+            sorted(pvinv.memberships.values_list('version', flat=True)),
+            [1, 2])
+
+
+class ParameterStoreTestCase(TestCase):
+    def setUp(self):
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, PVINV_SAM_VERSION)
+
+    def test_parameter_store(self):
+        store = get_store(PVInverter)
+        pvinvs = PVInverter.objects.order_by('id')
+        table = store.table()
+        self.assertEqual(table['id'].tolist(), [p.id for p in pvinvs])
+        self.assertEqual(table['Name'].tolist(), [p.Name for p in pvinvs])
+        self.assertTrue(np.allclose(table['Paco'], [p.Paco for p in pvinvs]))
+        first, last = pvinvs.first(), pvinvs.last()
+        params, missing = store.params(('Paco', 'Vdco'), [last.id, first.id])
+        self.assertEqual(missing, [])
+        self.assertEqual(params['Paco'].shape, (2, 1))
+        self.assertEqual(
+            params['Paco'][:, 0].tolist(), [last.Paco, first.Paco])
+        _, missing = store.get([first.id, 0])
+        self.assertEqual(missing, [0])
+        # saves, deletes, and creates are picked up without a full reload
+        first.Paco = 1234.5
+        first.save()
+        last.delete()
+        new = PVInverter.objects.get(pk=first.id)
+        new.pk = None
+        new.Name = 'new inverter'
+        new.save()
+        table = store.table()
+        pvinv_ids = PVInverter.objects.order_by('id').values_list(
+            'id', flat=True)
+        self.assertEqual(table['id'].tolist(), list(pvinv_ids))
+        records, _ = store.get([first.id, new.id])
+        self.assertEqual(records['Paco'].tolist(), [1234.5, 1234.5])
+        self.assertEqual(records['Name'][1], 'new inverter')
+
+    def test_parameter_store_other_process(self):
+        store = get_store(PVInverter)
+        pvinv = PVInverter.objects.first()
+        store.table()
+        # a local save only fetches the dirty row
+        pvinv.Paco = 1234.5
+        pvinv.save()
+        with mock.patch.object(store, '_fetch', wraps=store._fetch) as fetch:
+            records, _ = store.get([pvinv.id])
+        fetch.assert_called_once_with([pvinv.id])
+        self.assertEqual(records['Paco'].tolist(), [1234.5])
+        # writes in other processes don't send signals here, but bump the
+        # shared generation
+        PVInverter.objects.filter(pk=pvinv.id).update(Paco=2345.6)
+        bump_generation(PVInverter)
+        records, missing = store.get([pvinv.id])
+        self.assertEqual(missing, [])
+        self.assertEqual(records['Paco'].tolist(), [2345.6])
+
+
+class DerivedFieldsTestCase(TestCase):
+    def setUp(self):
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, PVINV_SAM_VERSION)
+        with open(SANDIA_MODULES, 'rb') as fp:
+            PVModule.upload(fp, self.testuser)
+
+    def test_derived_fields(self):
+        for pvinv in PVInverter.objects.all():
+            self.assertEqual(pvinv.Manufacturer, pvinv.Name.split(':', 1)[0])
+            src, yr = re.search(r'\[(\w*) (\d{4})\]', pvinv.Name).groups()
+            self.assertEqual(pvinv.Source, src)
+            self.assertEqual(pvinv.Vintage, date(int(yr), 1, 1))
+        pvmods = PVModule.objects.all()
+        for pvmod in pvmods:
+            nameplate = pvmod.Impo * pvmod.Vmpo
+            self.assertAlmostEqual(pvmod.nameplate, nameplate)
+            self.assertAlmostEqual(
+                pvmod.module_eff, nameplate / pvmod.Area / 1000.0)
+        # derived columns are filterable through the API
+        pvmod = pvmods.order_by('module_eff').last()
+        r = self.client.get(
+            '/api/v1/pvmodule/', {'module_eff__gte': pvmod.module_eff})
+        self.assertEqual(r.status_code, 200)
+        ids = [obj['id'] for obj in r.json()['objects']]
+        self.assertIn(pvmod.id, ids)
+        # saving recomputes the derived columns
+        pvmod.Impo *= 2
+        pvmod.save()
+        pvmod.refresh_from_db()
+        self.assertAlmostEqual(pvmod.nameplate, pvmod.Impo * pvmod.Vmpo)
+
+
+class ModelMetricsTestCase(TestCase):
+    def setUp(self):
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, PVINV_SAM_VERSION)
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+        with open(SANDIA_MODULES, 'rb') as fp:
+            PVModule.upload(fp, self.testuser)
+
+    def test_inverter_metrics(self):
+        pvinv = PVInverter.objects.first()
+        params = {k: getattr(pvinv, k) for k in SANDIA_INVERTER_PARAMS}
+        fractions = np.array([0.1, 0.2, 0.3, 0.5, 0.75, 1.0])
+        p_dc = pvinv.Pdco * fractions
+        eff = inverter.sandia(pvinv.Vdco, p_dc, params) / p_dc
+        weights = [0.04, 0.05, 0.12, 0.21, 0.53, 0.05]
+        self.assertAlmostEqual(pvinv.cec_efficiency, np.dot(eff, weights))
+        self.assertTrue(0 < pvinv.euro_efficiency < 1)
+
+    def test_module_metrics(self):
+        cecmod = CEC_Module.objects.first()
+        params = pvsystem.calcparams_cec(
+            np.array([1000.0, 200.0, 800.0]),
+            np.array([25.0, 25.0, cecmod.T_NOCT]), cecmod.alpha_sc,
+            cecmod.a_ref, cecmod.I_L_ref, cecmod.I_o_ref, cecmod.R_sh_ref,
+            cecmod.R_s, cecmod.Adjust)
+        p_mp = pvsystem.singlediode(*params)['p_mp']
+        self.assertAlmostEqual(
+            cecmod.low_irradiance_eff, p_mp[1] / 200.0 / (p_mp[0] / 1000.0))
+        self.assertAlmostEqual(cecmod.pmp_noct, p_mp[2])
+        for pvmod in PVModule.objects.all():
+            self.assertTrue(0 < pvmod.low_irradiance_eff < 1.2)
+            self.assertTrue(0 < pvmod.pmp_noct < pvmod.nameplate)
+
+    def test_api_metrics(self):
+        pvinv = PVInverter.objects.first()
+        auth = 'ApiKey testuser:' + self.testuser.api_key.key
+        url = f'/api/v1/pvinverter/{pvinv.pk}/'
+        # saves through the API recompute the metrics
+        r = self.client.patch(
+            url, json.dumps({'Pso': pvinv.Pso * 10}),
+            content_type='application/json', HTTP_AUTHORIZATION=auth)
+        self.assertEqual(r.status_code, 202)
+        edited = PVInverter.objects.get(pk=pvinv.pk)
+        self.assertEqual(edited.Pso, pvinv.Pso * 10)
+        self.assertLess(edited.cec_efficiency, pvinv.cec_efficiency)
+        expected = {
+            k: getattr(edited, k) for k in PVInverter.METRIC_FIELDS}
+        PVInverter.update_metrics([pvinv.pk])
+        edited.refresh_from_db()
+        for k, value in expected.items():
+            self.assertAlmostEqual(getattr(edited, k), value)
+
+    def test_update_metrics_command(self):
+        PVInverter.objects.update(cec_efficiency=None, euro_efficiency=None)
+        call_command('update_metrics', 'pvinverters', '--missing',
+                     stdout=StringIO())
+        self.assertFalse(
+            PVInverter.objects.filter(cec_efficiency__isnull=True).exists())
+        # the stores pick up the bulk update
+        table = get_store(PVInverter).table()
+        self.assertTrue(np.isfinite(table['cec_efficiency']).all())
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, PVINV_SAM_VERSION)
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+
+    def datatables(self, path, search_value):
+        payload = {
+            'draw': '1', 'start': '0', 'length': '100',
+            'search[value]': search_value, 'columns[0][data]': 'Name'}
+        return self.client.post(path, payload).json()
+
+    def test_search(self):
+        pvinv = PVInverter.objects.order_by('id').last()
+        mfg = pvinv.Manufacturer
+        expected = PVInverter.objects.filter(Name__icontains=mfg)
+        found = search(PVInverter.objects.all(), mfg.lower())
+        self.assertEqual(
+            sorted(found.values_list('id', flat=True)),
+            sorted(expected.values_list('id', flat=True)))
+        # numbers match as text and all terms must match
+        paco = '%g' % pvinv.Paco
+        found = search(PVInverter.objects.all(), f'{mfg} {paco}')
+        self.assertIn(pvinv.id, found.values_list('id', flat=True))
+        self.assertFalse(
+            search(PVInverter.objects.all(), f'{mfg} xyzzy').exists())
+        # short terms and FTS5 syntax are treated literally
+        self.assertTrue(search(PVInverter.objects.all(), 'V').exists())
+        self.assertFalse(
+            search(PVInverter.objects.all(), '"OR" NOT*').exists())
+        # the index follows saves and deletes
+        pvinv.Name = 'Unobtainium Inverters: XYZ-1 [CEC 2019]'
+        pvinv.save()
+        found = search(PVInverter.objects.all(), 'unobtainium')
+        self.assertEqual(list(found.values_list('id', flat=True)), [pvinv.id])
+        pvinv.delete()
+        self.assertFalse(
+            search(PVInverter.objects.all(), 'unobtainium').exists())
+
+    def test_datatables_search(self):
+        cecmod = CEC_Module.objects.first()
+        r = self.datatables('/cec_modules/', cecmod.Name)
+        self.assertEqual(r['recordsTotal'], CEC_Module.objects.count())
+        self.assertGreaterEqual(r['recordsFiltered'], 1)
+        # ranked with the best match first
+        self.assertEqual(r['data'][0]['id'], cecmod.id)
+        tech = cecmod.get_Technology_display()
+        r = self.datatables('/cec_modules/', tech)
+        self.assertEqual(
+            r['recordsFiltered'],
+            CEC_Module.objects.filter(Technology=cecmod.Technology).count())
+
+    def test_query_terms(self):
+        pvinvs = PVInverter.objects.all()
+        paco = pvinvs.order_by('Paco')[pvinvs.count() // 2].Paco
+        found = search(pvinvs, f'Paco>{paco:g} vdcmax<=600')
+        self.assertEqual(
+            set(found.values_list('id', flat=True)),
+            set(pvinvs.filter(Paco__gt=paco, Vdcmax__lte=600).values_list(
+                'id', flat=True)))
+        pvinv = pvinvs.first()
+        found = search(pvinvs, f'mfg:"{pvinv.Manufacturer}" year>=2000')
+        self.assertEqual(
+            found.count(),
+            pvinvs.filter(
+                Manufacturer__icontains=pvinv.Manufacturer,
+                Vintage__gte=date(2000, 1, 1)).count())
+        cecmods = CEC_Module.objects.all()
+        cecmod = cecmods.first()
+        tech = cecmod.get_Technology_display()
+        found = search(cecmods, f'tech={tech} bipv:no STC!={cecmod.STC}')
+        self.assertEqual(
+            found.count(),
+            cecmods.filter(Technology=cecmod.Technology, BIPV=False).exclude(
+                STC=cecmod.STC).count())
+        # every silicon technology
+        silicon = cecmods.filter(Technology__in=[1, 2, 3, 7, 8, 9, 11, 12])
+        self.assertEqual(
+            set(search(cecmods, 'tech:si').values_list('id', flat=True)),
+            set(silicon.values_list('id', flat=True)))
+        # unknown fields are free text, bad values are errors
+        self.assertFalse(search(pvinvs, 'foo>5000').exists())
+        with self.assertRaises(QueryError):
+            search(pvinvs, 'Paco>lots')
+        with self.assertRaises(QueryError):
+            search(pvinvs, 'name>SMA')
+        r = self.datatables('/pvinverters/', 'Paco>lots')
+        self.assertEqual(r['recordsFiltered'], 0)
+        self.assertIn('Paco', r['error'])
+
+    def test_datatables_queries(self):
+        pvinvs = PVInverter.objects.all()
+        total = pvinvs.count()
+        self.datatables('/pvinverters/', '')
+        # the total and repeated draws are cached
+        with self.assertNumQueries(0):
+            r = self.datatables('/pvinverters/', '')
+        self.assertEqual(r['recordsTotal'], total)
+        self.assertEqual(r['recordsFiltered'], total)
+        # other searches are one query, case and whitespace don't matter
+        with self.assertNumQueries(1):
+            r = self.datatables('/pvinverters/', 'Paco>1000')
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.datatables('/pvinverters/', ' paco>1000 '), r)
+        self.assertEqual(r['recordsTotal'], total)
+        self.assertEqual(
+            r['recordsFiltered'], pvinvs.filter(Paco__gt=1000).count())
+        r = self.datatables('/pvinverters/', 'xyzzy')
+        self.assertEqual(r['recordsFiltered'], 0)
+        # writes invalidate the total and the pages
+        pvinvs.first().delete()
+        r = self.datatables('/pvinverters/', '')
+        self.assertEqual(r['recordsTotal'], total - 1)
+        self.assertEqual(r['recordsFiltered'], total - 1)
+
+    def test_export(self):
+        pvinvs = PVInverter.objects.filter(Paco__gt=1000).order_by(
+            '-Paco', 'id')
+        r = self.client.get(
+            '/pvinverters/export/',
+            {'search': 'Paco>1000', 'order': '-Paco', 'format': 'csv'})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        self.assertIn('pvinverters.csv', r['Content-Disposition'])
+        rows = list(csv.DictReader(
+            StringIO(b''.join(r.streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [
+            p.id for p in pvinvs])
+        self.assertEqual(float(rows[0]['Paco']), pvinvs[0].Paco)
+        # choices are labels
+        r = self.client.get(
+            '/cec_modules/export/', {'order': 'Name', 'format': 'ndjson'})
+        rows = [
+            json.loads(line)
+            for line in b''.join(r.streaming_content).splitlines()]
+        cecmods = CEC_Module.objects.order_by('Name', 'id')
+        self.assertEqual([row['id'] for row in rows], [m.id for m in cecmods])
+        self.assertEqual(
+            rows[0]['Technology'], cecmods[0].get_Technology_display())
+        # bad searches and formats
+        r = self.client.get('/pvinverters/export/', {'search': 'Paco>x'})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get('/pvinverters/export/', {'format': 'xls'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_export_parquet(self):
+        pq = pytest.importorskip('pyarrow.parquet')
+        r = self.client.get(
+            '/cec_modules/export/', {'order': 'Name', 'format': 'parquet'})
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('cec_modules.parquet', r['Content-Disposition'])
+        table = pq.read_table(BytesIO(b''.join(r.streaming_content)))
+        cecmods = CEC_Module.objects.order_by('Name', 'id')
+        self.assertEqual(
+            table.column('id').to_pylist(), [m.id for m in cecmods])
+        self.assertEqual(
+            table.column('Technology')[0].as_py(),
+            cecmods[0].get_Technology_display())
+        self.assertEqual(table.column('Date')[0].as_py(), cecmods[0].Date)
+
+    def test_api_list_cache(self):
+        url = '/api/v1/pvinverter/?order_by=Paco&limit=5'
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, r.content)
+        # other parameters and formats aren't shared
+        r_json = self.client.get(url + '&format=json')
+        self.assertEqual(r_json['Content-Type'], 'application/json')
+        self.assertNotEqual(
+            self.client.get(url.replace('Paco', '-Paco')).content, r.content)
+        # errors aren't cached
+        for _ in range(2):
+            r = self.client.get('/api/v1/pvinverter/?order_by=Pso')
+            self.assertEqual(r.status_code, 400)
+        # writes invalidate the lists
+        pvinv = PVInverter.objects.order_by('Paco').first()
+        pvinv.delete()
+        self.assertNotIn(
+            f'/{pvinv.pk}/'.encode(), self.client.get(url).content)
+
+    def test_datatables_rows(self):
+        payload = {
+            'draw': '1', 'start': '0', 'length': '10', 'search[value]': '',
+            'columns[0][data]': 'Technology', 'columns[1][data]': 'R_s',
+            'order[0][column]': '0', 'order[0][dir]': 'desc',
+            'order[1][column]': '1', 'order[1][dir]': 'asc'}
+        r = self.client.post('/cec_modules/', payload).json()
+        # only table columns are returned or used to order
+        expected = CEC_Module.objects.order_by('-Technology', 'id')[:10]
+        self.assertEqual(
+            [row['id'] for row in r['data']], [m.id for m in expected])
+        self.assertNotIn('R_s', r['data'][0])
+        # choices are labels and dates are ISO format
+        cecmod = expected[0]
+        self.assertEqual(
+            r['data'][0]['Technology'], cecmod.get_Technology_display())
+        self.assertEqual(r['data'][0]['Date'], cecmod.Date.isoformat())
+        # all rows
+        payload['length'] = '-1'
+        r = self.client.post('/cec_modules/', payload).json()
+        self.assertEqual(len(r['data']), CEC_Module.objects.count())
+        self.assertIsNone(r['next'])
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, PVINV_SAM_VERSION)
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+
+    def test_keyset_ordering(self):
+        pvinvs = PVInverter.objects.all()
+        self.assertEqual(keyset_ordering(pvinvs), [('id', False)])
+        self.assertEqual(
+            keyset_ordering(pvinvs.order_by('-Paco', 'Name')),
+            [('Paco', True), ('Name', False), ('id', False)])
+        # nullable fields and expressions can't be keys
+        self.assertIsNone(keyset_ordering(pvinvs.order_by('cec_efficiency')))
+        self.assertIsNone(keyset_ordering(pvinvs.order_by(Lower('Name'))))
+
+    def test_api_pages(self):
+        expected = list(PVInverter.objects.order_by('-Paco', 'id').values_list(
+            'id', flat=True))
+        url = '/api/v1/pvinverter/?format=json&limit=3&order_by=-Paco'
+        ids = []
+        while url:
+            r = self.client.get(url).json()
+            self.assertEqual(r['meta']['total_count'], len(expected))
+            self.assertEqual(r['meta']['offset'], len(ids))
+            ids.extend(obj['id'] for obj in r['objects'])
+            url = r['meta']['next']
+        self.assertEqual(ids, expected)
+        # later pages use the cursor instead of offset
+        r = self.client.get(
+            '/api/v1/pvinverter/', {'limit': 3, 'order_by': '-Paco'}).json()
+        self.assertIn('after=', r['meta']['next'])
+        self.assertNotIn('offset=', r['meta']['next'])
+        r = self.client.get(
+            '/api/v1/pvinverter/', {'limit': 3, 'after': 'bogus'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_datatables_pages(self):
+        expected = list(CEC_Module.objects.order_by('STC', 'id').values_list(
+            'id', flat=True))
+        payload = {
+            'draw': '1', 'start': '0', 'length': '2', 'search[value]': '',
+            'columns[0][data]': 'Name', 'columns[1][data]': 'STC',
+            'order[0][column]': '1', 'order[0][dir]': 'asc'}
+        r = self.client.post('/cec_modules/', payload).json()
+        ids = [row['id'] for row in r['data']]
+        while r['next']:
+            payload.update(start=r['next']['start'], after=r['next']['after'])
+            with self.assertNumQueries(1):
+                r = self.client.post('/cec_modules/', payload).json()
+            self.assertEqual(r['recordsFiltered'], len(expected))
+            ids.extend(row['id'] for row in r['data'])
+        self.assertEqual(ids, expected)
+        # a cursor for another page is ignored
+        payload.update(start='2')
+        r = self.client.post('/cec_modules/', payload).json()
+        self.assertEqual([row['id'] for row in r['data']], expected[2:4])
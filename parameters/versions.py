@@ -0,0 +1,114 @@
+"""
+SAM library versions of the catalog records, and changelogs between them
+from the versions each record is part of. Records of two versions are
+matched by their unique key without the version, *EG*: the inverter
+``Name``, and compared by their content hash.
+"""
+import math
+from parameters.cache import cached_result, result_key
+from parameters.models import ALL_VERSIONS, LATEST_VERSION
+
+
+def parse_version(model, text):
+    """
+    Version of a catalog query from its text, :data:`LATEST_VERSION` by
+    default.
+
+    :param text: ``latest``, ``all``, a version number, or empty
+    :raises ValueError: if ``text`` isn't a version of ``model``
+    """
+    if not text or text in (LATEST_VERSION, ALL_VERSIONS):
+        return text or LATEST_VERSION
+    version = int(text)
+    if model.VERSION_FIELD is None or version not in dict(
+            model._meta.get_field(model.VERSION_FIELD).choices):
+        raise ValueError(
+            f'version must be {LATEST_VERSION}, {ALL_VERSIONS}, or a version '
+            f'of {model.__name__}')
+    return version
+
+
+def version_choices(model):
+    """
+    Versions to show in the catalog of ``model``, the latest and all, then
+    each version newest first, or none if the model doesn't have versions.
+    """
+    if model.VERSION_FIELD is None:
+        return []
+    field = model._meta.get_field(model.VERSION_FIELD)
+    return [
+        (LATEST_VERSION, 'Latest version'), (ALL_VERSIONS, 'All versions')
+    ] + [(v, name) for v, name in reversed(field.choices) if name]
+
+
+def _json_value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None  # NaN isn't valid JSON
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _version(model, version):
+    field = model._meta.get_field(model.VERSION_FIELD)
+    return {'version': version, 'name': dict(field.choices).get(version)}
+
+
+def _members(model, version, key_fields):
+    records = model.objects.filter(memberships__version=version).values(
+        'pk', 'content_hash', *key_fields)
+    return {tuple(r[f] for f in key_fields): r for r in records}
+
+
+def version_changelog(model, old, new):
+    """
+    Records added, removed, and changed from version ``old`` to ``new`` of
+    a model with a :attr:`~parameters.models.PVBaseModel.VERSION_FIELD`.
+
+    :returns: dictionary with the ``model``, the ``from`` and ``to``
+        versions, the ``added`` and ``removed`` records with their ids and
+        keys, the ``changed`` records with their ``previous`` ids and the
+        old and new values of each changed field, and the number of
+        ``unchanged`` records
+    """
+    key_fields = [
+        f for f in model._meta.unique_together[0] if f != model.VERSION_FIELD]
+    before = _members(model, old, key_fields)
+    after = _members(model, new, key_fields)
+
+    def record(r):
+        return {
+            'id': r['pk'], **{f: _json_value(r[f]) for f in key_fields}}
+
+    changed = [
+        key for key in sorted(after.keys() & before.keys())
+        if after[key]['content_hash'] != before[key]['content_hash']]
+    fields = model.content_fields()
+    values = {
+        r['pk']: r for r in model.objects.filter(pk__in=[
+            r['pk'] for key in changed for r in (before[key], after[key])
+        ]).values('pk', *fields)}
+    changes = []
+    for key in changed:
+        previous, current = values[before[key]['pk']], values[after[key]['pk']]
+        changes.append({
+            **record(after[key]), 'previous': previous['pk'],
+            'fields': {
+                f: [_json_value(previous[f]), _json_value(current[f])]
+                for f in fields if previous[f] != current[f]}})
+    return {
+        'model': model.__name__, 'from': _version(model, old),
+        'to': _version(model, new),
+        'added': [
+            record(after[k]) for k in sorted(after.keys() - before.keys())],
+        'removed': [
+            record(before[k]) for k in sorted(before.keys() - after.keys())],
+        'changed': changes,
+        'unchanged': len(after.keys() & before.keys()) - len(changed)}
+
+
+def changelog_data(model, old, new):
+    """:func:`version_changelog`, cached until the next write."""
+    return cached_result(
+        result_key(model, 'changelog', old, new),
+        lambda: version_changelog(model, old, new))
@@ -1,8 +1,25 @@
-from django.shortcuts import render, redirect
-from parameters.models import PVInverter, PVModule, CEC_Module
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
+from parameters.models import UploadJob
+from parameters.jobs import start_upload, run_upload, run_upload_async
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.exceptions import FieldError
+from django.conf import settings
+
+# number of failed rows listed in the upload message
+MAX_FAILED_MESSAGES = 5
+# upload selections and the model names
+UPLOAD_MODELS = {label: name for name, label in UploadJob.MODELS}
+
+
+def _job_messages(request, job):
+    if job.status == UploadJob.FAILED:
+        messages.error(request, job.message)
+        return
+    messages.success(request, job.message)
+    for failed in job.errors[:MAX_FAILED_MESSAGES]:
+        messages.warning(request, 'Line {}: {}'.format(
+            failed['row'], failed['error']))
 
 
 @login_required(redirect_field_name=None, login_url='/admin/')
@@ -11,27 +28,41 @@ def file_upload(request):
     if request.method == 'POST':
         upload_file = request.FILES.get('uploadFile')
         upload_select = request.POST.get('uploadSelect')
-        sam_version_select = request.POST.get('samVersionSelect')
-        if upload_file is not None:
-            try:
-                if upload_select == 'Sandia Modules':
-                    PVModule.upload(upload_file, user)
-                elif upload_select == 'CEC Inverters':
-                    PVInverter.upload(upload_file, user, sam_version_select)
-                elif upload_select == 'CEC Modules':
-                    CEC_Module.upload(upload_file, user)
-                else:
-                    raise KeyError('Selection "{}" is not valid.'.format(
-                        upload_select))
-            except (KeyError, FieldError) as exc:
-                messages.error(request,
-                    'File "{}" has wrong format for {}. -- {}'.format(
-                        upload_file.name, upload_select, exc))
-            else:
-                messages.success(request,
-                    'Uploaded {} file "{}" successfully.'.format(
-                        upload_select, upload_file.name))
-        else:
+        model = UPLOAD_MODELS.get(upload_select)
+        if upload_file is None:
             messages.warning(request, 'No file selected.')
+        elif model is None:
+            messages.error(request,
+                'File "{}" has wrong format for {}. -- Selection "{}" is '
+                'not valid.'.format(
+                    upload_file.name, upload_select, upload_select))
+        else:
+            sam_version = ''
+            if model == 'PVInverter':
+                sam_version = request.POST.get('samVersionSelect', '')
+            job, created = start_upload(model, upload_file, user, sam_version)
+            if not created:
+                messages.info(request,
+                    'File "{}" is already being uploaded.'.format(
+                        upload_file.name))
+            elif settings.UPLOAD_IN_BACKGROUND:
+                run_upload_async(job.pk)
+            else:
+                job = run_upload(job.pk)
+            if job.is_finished:
+                _job_messages(request, job)
+            else:
+                # the upload progress is shown on the next page
+                request.session['upload_job'] = job.pk
         return redirect(request.POST.get('next', 'home'))
     return redirect('home')
+
+
+@login_required(redirect_field_name=None, login_url='/admin/')
+def upload_job(request, job_id):
+    """Progress of an upload job, polled by the upload page."""
+    job = get_object_or_404(UploadJob, pk=job_id, user=request.user)
+    if job.is_finished and request.session.get('upload_job') == job.pk:
+        # stop showing the progress after it's been seen finished
+        del request.session['upload_job']
+    return JsonResponse(job.progress())
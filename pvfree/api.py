@@ -1,16 +1,37 @@
 """pvlib api"""
 
-from pvlib import solarposition, clearsky, atmosphere, iotools
+from pvlib import (
+    solarposition, clearsky, atmosphere, iotools, irradiance, location)
 from django.http import JsonResponse
+import numpy as np
 import pandas as pd
+from parameters.models import PVInverter, PVModule, CEC_Module
+from parameters.cache import cached_result, KEY_PREFIX, TIMEOUT
+from parameters.store import get_store
+from parameters.performance import (
+    cec_performance, sapm_performance, sapm_temp_cell, stack_params,
+    sandia_inverter_unclipped, sandia_inverter_limits, clipping_summary,
+    string_sizing, noct_temp_cell, chunked_energy, top_n, finite_or_none,
+    CEC_PARAMS, SAPM_PARAMS, SAPM_THERMAL_PARAMS, SANDIA_INVERTER_PARAMS,
+    STRING_SIZING_MODULE_PARAMS, STRING_SIZING_INVERTER_PARAMS,
+    STRING_SIZING_KEYS, IEC61853_IRRADIANCE, IEC61853_TEMPERATURE)
 from pvfree.forms import (
-    SolarPositionForm, LinkeTurbidityForm, AirmassForm, WeatherForm)
+    SolarPositionForm, LinkeTurbidityForm, AirmassForm, WeatherForm,
+    CECModulePerformanceForm, PVModulePerformanceForm,
+    PVInverterPerformanceForm, StringSizingForm, ModuleRankingForm,
+    MAX_POINTS)
 import json
 import calendar
 
 NREL = 'https://developer.nrel.gov'
 PSM3 = NREL + '/api/nsrdb/v2/solar/psm3-2-2-tmy-download.csv'
 PSM4 = NREL + '/api/nsrdb/v2/solar/nsrdb-GOES-tmy-v4-0-0-download.csv'
+MAX_PAIRS = 2000000
+# records times conditions, enough for the default conditions and the whole
+# CEC library, or a site year and a few hundred filtered modules
+MAX_RANKING_POINTS = 10 * MAX_POINTS
+SITE_TEMP_AIR = 20.0  # [C]
+SITE_WIND_SPEED = 1.0  # [m/s]
 
 def solarposition_resource(request):
     if request.method == 'GET':
@@ -218,3 +239,445 @@ def weather_resource(request):
         data = tmy_data[DATA_COLS].to_dict('index')
         # TODO: also return metadata like city, state, timezone, etc
     return JsonResponse(data)
+
+
+def _broadcast_conditions(effective_irradiance, temp_cell, grid):
+    """
+    Combine irradiance and temperature arrays, either as every combination if
+    ``grid`` is true, or element by element otherwise.
+    """
+    if grid:
+        # rows are temperatures, columns are irradiances
+        effective_irradiance, temp_cell = np.meshgrid(
+            effective_irradiance, temp_cell)
+        return effective_irradiance, temp_cell
+    return np.broadcast_arrays(effective_irradiance, temp_cell)
+
+
+def cec_module_performance_resource(request):
+    if request.method == 'GET':
+        params = CECModulePerformanceForm(request.GET)
+    else:
+        params = CECModulePerformanceForm(request.POST)
+    if params.is_valid():
+        cec_module_id = params.cleaned_data['cec_module']
+        effective_irradiance = params.cleaned_data['effective_irradiance']
+        temp_cell = params.cleaned_data['temp_cell']
+        grid = params.cleaned_data['grid']
+        method = params.cleaned_data['method']
+        ivcurve = params.cleaned_data['ivcurve']
+        ivcurve_pnts = params.cleaned_data['ivcurve_pnts']
+    else:
+        return JsonResponse(params.errors, status=400)
+    method = method or 'lambertw'  # ChoiceField defaults to empty string, ''
+    ivcurve_pnts = (ivcurve_pnts or 100) if ivcurve else None
+    try:
+        effective_irradiance, temp_cell = _broadcast_conditions(
+            effective_irradiance, temp_cell, grid)
+    except ValueError:
+        return JsonResponse(
+            {'temp_cell': ['Must be the same length as irradiance.']},
+            status=400)
+    npts = effective_irradiance.size * (ivcurve_pnts or 1)
+    if npts > MAX_POINTS:
+        return JsonResponse(
+            {'__all__': [f'Too many points, {npts} > {MAX_POINTS}.']},
+            status=400)
+    cec_mods, missing = get_store(CEC_Module).get([cec_module_id])
+    if missing:
+        return JsonResponse(
+            {'cec_module': [f'CEC Module {cec_module_id} does not exist.']},
+            status=404)
+    result = cec_performance(
+        effective_irradiance, temp_cell, cec_mods[0], method=method,
+        ivcurve_pnts=ivcurve_pnts)
+    data = {
+        'cec_module': cec_module_id, 'method': method,
+        'effective_irradiance': effective_irradiance.tolist(),
+        'temp_cell': temp_cell.tolist()}
+    data.update({k: finite_or_none(v) for k, v in result.items()})
+    return JsonResponse(data)
+
+
+def pvmodule_performance_resource(request):
+    if request.method == 'GET':
+        params = PVModulePerformanceForm(request.GET)
+    else:
+        params = PVModulePerformanceForm(request.POST)
+    if params.is_valid():
+        pvmodule_ids = params.cleaned_data['pvmodules'].tolist()
+        effective_irradiance = params.cleaned_data['effective_irradiance']
+        temp_cell = params.cleaned_data['temp_cell']
+        weather_data = params.cleaned_data['weather_data']
+    else:
+        return JsonResponse(params.errors, status=400)
+    if weather_data is not None:
+        times = weather_data.index
+        effective_irradiance = weather_data.get(
+            'effective_irradiance', weather_data.get('poa_global')).values
+    else:
+        times = None
+        try:
+            effective_irradiance, temp_cell = np.broadcast_arrays(
+                effective_irradiance, temp_cell)
+        except ValueError:
+            return JsonResponse(
+                {'temp_cell': ['Must be the same length as irradiance.']},
+                status=400)
+    npts = len(pvmodule_ids) * effective_irradiance.size
+    if npts > MAX_POINTS:
+        return JsonResponse(
+            {'__all__': [f'Too many points, {npts} > {MAX_POINTS}.']},
+            status=400)
+    # one row per module, one column per timestep
+    pvmod_params, missing = get_store(PVModule).params(
+        SAPM_PARAMS + SAPM_THERMAL_PARAMS, pvmodule_ids)
+    if missing:
+        return JsonResponse(
+            {'pvmodules': [f'Sandia Modules {missing} do not exist.']},
+            status=404)
+    if weather_data is not None:
+        if 'temp_cell' in weather_data:
+            temp_cell = weather_data['temp_cell'].values
+        else:
+            temp_cell = sapm_temp_cell(
+                weather_data['poa_global'].values,
+                weather_data['temp_air'].values,
+                weather_data['wind_speed'].values, pvmod_params)
+    result = sapm_performance(effective_irradiance, temp_cell, pvmod_params)
+    shape = (len(pvmodule_ids), effective_irradiance.size)
+    data = {
+        'pvmodules': pvmodule_ids,
+        'effective_irradiance': finite_or_none(effective_irradiance),
+        'temp_cell': finite_or_none(np.broadcast_to(temp_cell, shape))}
+    if times is not None:
+        data['index'] = times.strftime('%Y-%m-%dT%H:%M:%S%z').tolist()
+    data.update({
+        k: finite_or_none(np.broadcast_to(v, shape))
+        for k, v in result.items()})
+    return JsonResponse(data)
+
+
+def pvinverter_performance_resource(request):
+    if request.method == 'GET':
+        params = PVInverterPerformanceForm(request.GET)
+    else:
+        params = PVInverterPerformanceForm(request.POST)
+    if params.is_valid():
+        pvinverter_ids = params.cleaned_data['pvinverters']
+        paco_min = params.cleaned_data['paco_min']
+        paco_max = params.cleaned_data['paco_max']
+        sam_version = params.cleaned_data['sam_version']
+        p_dc = params.cleaned_data['p_dc']
+        v_dc = params.cleaned_data['v_dc']
+        clipping = params.cleaned_data['clipping']
+        timestep = params.cleaned_data['timestep']
+    else:
+        return JsonResponse(params.errors, status=400)
+    if timestep is None:
+        timestep = 1.0
+    if v_dc is not None:
+        try:
+            p_dc, v_dc = np.broadcast_arrays(p_dc, v_dc)
+        except ValueError:
+            return JsonResponse(
+                {'v_dc': ['Must be the same length as DC power.']},
+                status=400)
+    if pvinverter_ids is None:
+        pvinvs = PVInverter.objects.order_by('Paco', 'id')
+        if paco_min is not None:
+            pvinvs = pvinvs.filter(Paco__gte=paco_min)
+        if paco_max is not None:
+            pvinvs = pvinvs.filter(Paco__lte=paco_max)
+        if sam_version is not None:
+            # records carried forward unchanged are members of later versions
+            pvinvs = pvinvs.in_version(sam_version)
+        # fetch one more than the limit to detect too many inverters
+        max_inverters = MAX_POINTS // p_dc.size
+        pvinverter_ids = pvinvs.values_list('id', flat=True)
+        pvinverter_ids = list(pvinverter_ids[:max_inverters + 1])
+    pvinvs, missing = get_store(PVInverter).get(pvinverter_ids)
+    if missing:
+        return JsonResponse(
+            {'pvinverters': [f'Inverters {missing} do not exist.']},
+            status=404)
+    npts = len(pvinvs) * p_dc.size
+    if npts > MAX_POINTS:
+        return JsonResponse(
+            {'__all__': [f'Too many points, {npts} > {MAX_POINTS}.']},
+            status=400)
+    # one row per inverter, one column per timestep
+    pvinv_params = stack_params(pvinvs, SANDIA_INVERTER_PARAMS)
+    if v_dc is None:
+        v_dc = pvinv_params['Vdco']
+    power_ac_unclipped = sandia_inverter_unclipped(v_dc, p_dc, pvinv_params)
+    power_ac = sandia_inverter_limits(
+        power_ac_unclipped, p_dc, pvinv_params)
+    shape = (len(pvinvs), p_dc.size)
+    data = {
+        'pvinverters': pvinvs['id'].tolist(),
+        'Name': pvinvs['Name'].tolist(),
+        'p_dc': finite_or_none(p_dc),
+        'v_dc': finite_or_none(np.broadcast_to(v_dc, shape)),
+        'p_ac': finite_or_none(np.broadcast_to(power_ac, shape))}
+    if clipping:
+        summary = clipping_summary(
+            p_dc, np.broadcast_to(power_ac, shape), power_ac_unclipped,
+            pvinv_params, timestep)
+        data['clipping'] = {
+            k: finite_or_none(v.ravel()) for k, v in summary.items()}
+    return JsonResponse(data)
+
+
+def string_sizing_resource(request):
+    if request.method == 'GET':
+        params = StringSizingForm(request.GET)
+    else:
+        params = StringSizingForm(request.POST)
+    if params.is_valid():
+        temp_min = params.cleaned_data['temp_min']
+        temp_max = params.cleaned_data['temp_max']
+        target_ilr = params.cleaned_data['target_ilr']
+        module_name = params.cleaned_data['module_name']
+        technology = params.cleaned_data['technology']
+        version = params.cleaned_data['version']
+        stc_min = params.cleaned_data['stc_min']
+        stc_max = params.cleaned_data['stc_max']
+        inverter_name = params.cleaned_data['inverter_name']
+        paco_min = params.cleaned_data['paco_min']
+        paco_max = params.cleaned_data['paco_max']
+        sam_version = params.cleaned_data['sam_version']
+        include_invalid = params.cleaned_data['include_invalid']
+        order_by = params.cleaned_data['order_by']
+        limit = params.cleaned_data['limit']
+        offset = params.cleaned_data['offset']
+    else:
+        return JsonResponse(params.errors, status=400)
+    target_ilr = target_ilr or 1.25
+    order_by = order_by or '-ilr'  # ChoiceField defaults to empty string, ''
+    limit = limit or 20
+    offset = offset or 0
+    cec_mods = CEC_Module.objects.order_by('id')
+    if module_name:
+        cec_mods = cec_mods.filter(Name__icontains=module_name)
+    if technology is not None:
+        cec_mods = cec_mods.filter(Technology=technology)
+    if version is not None:
+        # records carried forward unchanged are members of later versions
+        cec_mods = cec_mods.in_version(version)
+    if stc_min is not None:
+        cec_mods = cec_mods.filter(STC__gte=stc_min)
+    if stc_max is not None:
+        cec_mods = cec_mods.filter(STC__lte=stc_max)
+    pvinvs = PVInverter.objects.order_by('id')
+    if inverter_name:
+        pvinvs = pvinvs.filter(Name__icontains=inverter_name)
+    if paco_min is not None:
+        pvinvs = pvinvs.filter(Paco__gte=paco_min)
+    if paco_max is not None:
+        pvinvs = pvinvs.filter(Paco__lte=paco_max)
+    if sam_version is not None:
+        pvinvs = pvinvs.in_version(sam_version)
+    cec_mods, _ = get_store(CEC_Module).get(
+        list(cec_mods.values_list('id', flat=True)))
+    pvinvs, _ = get_store(PVInverter).get(
+        list(pvinvs.values_list('id', flat=True)))
+    npairs = len(cec_mods) * len(pvinvs)
+    if npairs > MAX_PAIRS:
+        return JsonResponse(
+            {'__all__': [f'Too many pairs, {npairs} > {MAX_PAIRS}.']},
+            status=400)
+    meta = {
+        'limit': limit, 'offset': offset, 'total_count': 0,
+        'order_by': order_by}
+    if not npairs:
+        return JsonResponse({'meta': meta, 'objects': []})
+    # modules are rows and inverters are columns
+    cec_mod_params = stack_params(cec_mods, STRING_SIZING_MODULE_PARAMS)
+    pvinv_params = {
+        k: v.T for k, v in stack_params(
+            pvinvs, STRING_SIZING_INVERTER_PARAMS).items()}
+    result = string_sizing(
+        cec_mod_params, pvinv_params, temp_min, temp_max, target_ilr)
+    mod_idx, inv_idx = np.indices(result['valid'].shape)
+    result['cec_module'] = cec_mods['id'][mod_idx]
+    result['pvinverter'] = pvinvs['id'][inv_idx]
+    if include_invalid:
+        keep = np.ones(result['valid'].shape, dtype=bool)
+    else:
+        keep = result['valid']
+    result = {k: v[keep] for k, v in result.items()}
+    mod_idx, inv_idx = mod_idx[keep], inv_idx[keep]
+    # sort by the requested key, then by module and inverter IDs, NaN last
+    key = order_by.lstrip('-')
+    sort_key = np.nan_to_num(
+        result[key].astype(float), nan=np.inf, posinf=np.inf,
+        neginf=np.inf)
+    if order_by.startswith('-'):
+        sort_key = np.where(np.isinf(sort_key), np.inf, -sort_key)
+    order = np.lexsort(
+        (result['pvinverter'], result['cec_module'], sort_key))
+    page = order[offset:offset + limit]
+    objects = [{
+        'cec_module': int(result['cec_module'][n]),
+        'cec_module_name': cec_mods[mod_idx[n]]['Name'],
+        'pvinverter': int(result['pvinverter'][n]),
+        'pvinverter_name': pvinvs[inv_idx[n]]['Name'],
+        'valid': bool(result['valid'][n])} for n in page]
+    for k in STRING_SIZING_KEYS:
+        for obj, value in zip(objects, finite_or_none(result[k][page])):
+            obj[k] = value
+    meta['total_count'] = order.size
+    return JsonResponse({'meta': meta, 'objects': objects})
+
+
+def _site_year(lat, lon, tz, year):
+    """
+    Hourly clear sky irradiance for a year on an equator facing plane tilted
+    at the latitude, with constant air temperature and wind speed. Hours
+    without sun add no energy, so they're dropped. The site year is cached,
+    so rankings at the same site don't recalculate it.
+    """
+    def compute():
+        times = pd.date_range(
+            start=f'{year}-01-01 00:30', end=f'{year}-12-31 23:59:59',
+            freq='H', tz='Etc/GMT{:+d}'.format(-tz))
+        site = location.Location(lat, lon, tz=times.tz)
+        solpos = site.get_solarposition(times)
+        cs = site.get_clearsky(times, solar_position=solpos)
+        poa_global = irradiance.get_total_irradiance(
+            abs(lat), 180 if lat >= 0 else 0, solpos['apparent_zenith'],
+            solpos['azimuth'], cs['dni'], cs['ghi'], cs['dhi']
+        )['poa_global'].fillna(0)
+        poa_global = poa_global[poa_global > 0]
+        return pd.DataFrame({
+            'poa_global': poa_global, 'temp_air': SITE_TEMP_AIR,
+            'wind_speed': SITE_WIND_SPEED})
+
+    return cached_result(
+        f'{KEY_PREFIX}:site_year:{lat}:{lon}:{tz}:{year}', compute,
+        timeout=TIMEOUT)
+
+
+def module_ranking_resource(request):
+    if request.method == 'GET':
+        params = ModuleRankingForm(request.GET)
+    else:
+        params = ModuleRankingForm(request.POST)
+    if params.is_valid():
+        effective_irradiance = params.cleaned_data['effective_irradiance']
+        temp_cell = params.cleaned_data['temp_cell']
+        weather_data = params.cleaned_data['weather_data']
+        model = params.cleaned_data['model']
+        metric = params.cleaned_data['metric']
+        name = params.cleaned_data['name']
+        technology = params.cleaned_data['technology']
+        material = params.cleaned_data['material']
+        weights = params.cleaned_data['weights']
+        timestep = params.cleaned_data['timestep']
+        top = params.cleaned_data['top']
+        lat = params.cleaned_data['lat']
+        lon = params.cleaned_data['lon']
+        tz = params.cleaned_data['tz']
+        year = params.cleaned_data['year']
+    else:
+        return JsonResponse(params.errors, status=400)
+    # ChoiceField defaults to empty string, ''
+    model = model or 'cec'
+    metric = metric or 'energy_per_area'
+    timestep = 1.0 if timestep is None else timestep
+    top = top or 20
+    temp_air = wind_speed = None
+    if lat is not None:
+        weather_data = _site_year(lat, lon, tz or 0, year or 1990)
+        # the site year is hourly
+        timestep = 1.0
+    if weather_data is not None:
+        effective_irradiance = weather_data.get(
+            'effective_irradiance', weather_data.get('poa_global')).values
+        if 'temp_cell' in weather_data:
+            temp_cell = weather_data['temp_cell'].values
+        else:
+            temp_air = weather_data['temp_air'].values
+            wind_speed = weather_data['wind_speed'].values
+        weights = np.full(effective_irradiance.size, timestep)
+    elif effective_irradiance is not None:
+        try:
+            effective_irradiance, temp_cell = np.broadcast_arrays(
+                effective_irradiance, temp_cell)
+            if weights is None:
+                weights = np.full(effective_irradiance.size, timestep)
+            weights = np.broadcast_to(weights, effective_irradiance.shape)
+        except ValueError:
+            return JsonResponse(
+                {'__all__': [
+                    'Irradiance, temperature, and weights must be the same'
+                    ' length.']}, status=400)
+    else:
+        # default representative conditions, equally weighted
+        effective_irradiance, temp_cell = (
+            c.ravel() for c in np.meshgrid(
+                IEC61853_IRRADIANCE, IEC61853_TEMPERATURE))
+        weights = np.full(effective_irradiance.size, timestep)
+    if model == 'cec':
+        records = CEC_Module.objects.order_by('id')
+        if name:
+            records = records.filter(Name__icontains=name)
+        if technology is not None:
+            records = records.filter(Technology=technology)
+        fields = CEC_PARAMS + ('T_NOCT', 'A_c', 'STC')
+        area, nameplate = 'A_c', 'STC'
+    else:
+        records = PVModule.objects.order_by('id')
+        if name:
+            records = records.filter(Name__icontains=name)
+        if material is not None:
+            records = records.filter(Material=material)
+        fields = SAPM_PARAMS + SAPM_THERMAL_PARAMS + ('Area',)
+        area, nameplate = 'Area', None
+    ids = list(records.values_list('id', flat=True))
+    npts = len(ids) * effective_irradiance.size
+    if npts > MAX_RANKING_POINTS:
+        return JsonResponse(
+            {'__all__': [
+                f'Too many points, {npts} > {MAX_RANKING_POINTS}, filter'
+                ' modules or use fewer conditions.']}, status=400)
+    store = get_store(CEC_Module if model == 'cec' else PVModule)
+    records, _ = store.get(ids)
+    mod_params = stack_params(records, fields)
+    if nameplate is None:
+        mod_nameplate = (mod_params['Impo'] * mod_params['Vmpo']).ravel()
+    else:
+        mod_nameplate = mod_params[nameplate].ravel()
+
+    def evaluate(block):
+        block_temp_cell = temp_cell
+        if model == 'cec':
+            if block_temp_cell is None:
+                block_temp_cell = noct_temp_cell(
+                    effective_irradiance, temp_air, block['T_NOCT'])
+            return cec_performance(
+                effective_irradiance, block_temp_cell, block)['p_mp']
+        if block_temp_cell is None:
+            block_temp_cell = sapm_temp_cell(
+                effective_irradiance, temp_air, wind_speed, block)
+        return sapm_performance(
+            effective_irradiance, block_temp_cell, block)['p_mp']
+
+    energy = chunked_energy(evaluate, mod_params, weights)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            'energy': energy,
+            'energy_per_area': energy / mod_params[area].ravel(),
+            'energy_per_watt': energy / mod_nameplate}
+    ranked = top_n(metrics[metric], top)
+    objects = [{
+        'rank': rank + 1, 'id': int(records['id'][n]),
+        'Name': records['Name'][n]} for rank, n in enumerate(ranked)]
+    for k, v in metrics.items():
+        for obj, value in zip(objects, finite_or_none(v[ranked])):
+            obj[k] = value
+    meta = {
+        'model': model, 'metric': metric, 'top': top,
+        'total_count': len(records), 'conditions': effective_irradiance.size}
+    return JsonResponse({'meta': meta, 'objects': objects})
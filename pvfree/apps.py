@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class PvfreeConfig(AppConfig):
+    name = 'pvfree'
+
+    def ready(self):
+        from parameters.jobs import upload_finished
+        from pvfree.plots import warm_uploaded_plots
+        # cache the plots of uploaded records in every process that imports
+        # uploads, not just the ones that loaded the URLconf
+        upload_finished.connect(warm_uploaded_plots)
@@ -0,0 +1,260 @@
+"""
+Server side processing of the catalog tables for datatables.net.
+
+See: https://datatables.net/manual/server-side
+"""
+import json
+import re
+from datetime import date
+from django.db.models import Count, Window
+from django.db.models.functions import Lower
+from django.http import HttpResponse
+from parameters.cache import (
+    cached_result, generation, normalize_search, result_key, table_total)
+from parameters.pagination import (
+    decode_cursor, encode_cursor, keyset_filter, keyset_ordering, order_by)
+from parameters.models import LATEST_VERSION
+from parameters.search import search, QueryError
+from parameters.versions import parse_version
+
+COLUMN_ARG = re.compile(r'^columns\[(\d+)](.+)$')
+ORDER_ARG = re.compile(r'^order\[(\d+)](.+)$')
+
+
+def parse_request(post_request):
+    """
+    Parse Datatables.net serverSide arguments
+    See: https://datatables.net/manual/server-side
+    """
+    columns = []
+    order = []
+    for k, v in post_request.items():
+        if k.startswith('columns'):
+            m = COLUMN_ARG.match(k)
+            col_idx, col_key = m.groups()
+            col_idx = int(col_idx)
+            try:
+                columns[col_idx][col_key] = v
+            except IndexError:
+                columns.append({col_key: v})
+        elif k.startswith('order'):
+            m = ORDER_ARG.match(k)
+            order_idx, order_key = m.groups()
+            order_idx = int(order_idx)
+            try:
+                order[order_idx][order_key] = v
+            except IndexError:
+                order.append({order_key: v})
+    return columns, order
+
+
+def parse_order(columns, order):
+    """
+    Column names and ``True`` if descending from the datatables ``order``.
+    """
+    names = []
+    for o in order:
+        try:
+            name = columns[int(o['[column]'])]['[data]']
+        except (KeyError, IndexError, ValueError):
+            continue
+        names.append((name, o.get('[dir]') == 'desc'))
+    return names
+
+
+def json_default(obj):
+    """JSON encoder ``default`` for dates."""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+def json_response(data):
+    """Compact JSON response, faster than ``JsonResponse`` for big pages."""
+    return HttpResponse(
+        json.dumps(
+            data, default=json_default, separators=(',', ':'),
+            check_circular=False),
+        content_type='application/json')
+
+
+def choice_lookup(field):
+    """
+    Labels of an integer choice field in a list indexed by value, so rows
+    don't need ``get_FOO_display()``.
+    """
+    choices = dict(field.flatchoices)
+    labels = [None] * (max(choices, default=-1) + 1)
+    for value, label in choices.items():
+        labels[value] = str(label)
+    return labels
+
+
+class DatatablesBackend:
+    """
+    Search, order, and page a catalog table for datatables.net, selecting
+    only the table columns as tuples.
+
+    :param model: a :class:`~parameters.models.PVBaseModel` subclass
+    :param columns: field names of the table columns, only these are
+        returned or used to order
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.fields = ('id',) + tuple(columns)
+        self.lookups = [
+            (n, choice_lookup(field))
+            for n, field in enumerate(
+                model._meta.get_field(name) for name in self.fields)
+            if field.choices]
+
+    def order_by(self, order, search_value):
+        """
+        Arguments of ``order_by``.
+
+        :param order: list of column names and ``True`` if descending
+        """
+        order_by_list = []
+        for name, desc in order:
+            if name not in self.fields:
+                continue  # only order by table columns
+            # choices are ordered by their integer value, not the label
+            if desc:
+                # XXX: -Name yields "a" first instead of "Z" !
+                # handle case-sensitivity descending order for string fields
+                order_by_list.append(
+                    Lower(name).desc() if name == 'Name' else f'-{name}')
+            else:
+                order_by_list.append(name)
+        if order_by_list:
+            return order_by_list
+        if search_value and search_value.strip():
+            return ['-search_rank', 'Name']
+        return ['Name']
+
+    def page(self, queryset, start, length, search_value, total_records,
+             after=None, version=LATEST_VERSION):
+        """
+        Get a page of rows, the number of records that match the search, and
+        a keyset cursor for the next page, in one query. The filtered count
+        is a window count when there's a search, or carried in the cursor on
+        later pages. Pages that don't follow the previous page use
+        ``OFFSET``.
+
+        :param length: number of rows, or ``None`` for all rows
+        :returns: list of row tuples, number of filtered records, and a
+            dictionary with the ``start`` and ``after`` cursor of the next
+            page or ``None``
+        """
+        stop = None if length is None else start + length
+        ordering = keyset_ordering(queryset)
+        if ordering is not None:
+            # ties are ordered by id, the same as the cursor
+            queryset = queryset.order_by(*order_by(ordering))
+        context = {
+            'search': search_value or '', 'version': version,
+            'generation': generation(self.model)}
+        cursor = None
+        if after and ordering is not None:
+            cursor = decode_cursor(after, ordering, start=start, **context)
+        if cursor is not None:
+            filtered_records = cursor['count']
+            queryset = queryset.filter(
+                keyset_filter(ordering, cursor['values']))
+            rows = list(queryset.values_list(*self.fields)[:length])
+        elif not (search_value and search_value.strip()):
+            rows = list(
+                queryset.values_list(*self.fields)[start:stop])
+            filtered_records = total_records
+        else:
+            queryset = queryset.annotate(
+                filtered_records=Window(Count('pk')))
+            rows = list(queryset.values_list(
+                *self.fields, 'filtered_records')[start:stop])
+            if rows:
+                filtered_records = rows[0][-1]
+            else:
+                # past the last match, only happens if the matches changed
+                # since the previous draw
+                filtered_records = queryset.count() if start else 0
+        next_page = None
+        if (ordering is not None and rows
+                and start + len(rows) < filtered_records):
+            next_start = start + len(rows)
+            next_page = {
+                'start': next_start,
+                'after': encode_cursor(
+                    ordering, dict(zip(self.fields, rows[-1])),
+                    start=next_start, count=filtered_records, **context)}
+        return rows, filtered_records, next_page
+
+    def serialize(self, rows):
+        """Rows as dictionaries of column values with choice labels."""
+        fields = self.fields
+        nfields = len(fields)
+        data = []
+        for row in rows:
+            row = list(row[:nfields])
+            for n, labels in self.lookups:
+                value = row[n]
+                if value is not None:
+                    row[n] = labels[value] if 0 <= value < len(labels) else None
+            data.append(dict(zip(fields, row)))
+        return data
+
+    def result(self, order, start, length, search_value, after=None,
+               version=LATEST_VERSION):
+        """
+        Datatables response data except ``draw``, cached by the search,
+        order, version, and page until the next write to the table.
+
+        :param order: list of column names and ``True`` if descending
+        :param version: SAM library version of the records, see
+            :meth:`~parameters.models.CatalogQuerySet.in_version`
+        """
+        search_value = normalize_search(search_value)
+        order_by_list = self.order_by(order, search_value)
+        key = result_key(
+            self.model, 'datatables', search_value,
+            [str(o) for o in order_by_list], start, length, version)
+        return cached_result(key, lambda: self._result(
+            order_by_list, start, length, search_value, after, version))
+
+    def _result(self, order_by_list, start, length, search_value, after,
+                version):
+        total_records = table_total(self.model, version)
+        try:
+            queryset = search(
+                self.model.objects.in_version(version), search_value)
+        except QueryError as exc:
+            return {
+                'recordsTotal': total_records, 'recordsFiltered': 0,
+                'data': [], 'error': str(exc)}
+        rows, filtered_records, next_page = self.page(
+            queryset.order_by(*order_by_list), start, length, search_value,
+            total_records, after, version)
+        return {
+            'recordsTotal': total_records,
+            'recordsFiltered': filtered_records,
+            'data': self.serialize(rows),
+            'next': next_page}
+
+    def response(self, post_request):
+        """Datatables response to the serverSide POST arguments."""
+        columns, order = parse_request(post_request)
+        length = int(post_request.get('length'))
+        if length < 0:
+            length = None  # all rows
+        try:
+            version = parse_version(self.model, post_request.get('version'))
+        except ValueError as exc:
+            return json_response({
+                'draw': int(post_request.get('draw')), 'recordsTotal': 0,
+                'recordsFiltered': 0, 'data': [], 'error': str(exc)})
+        result = self.result(
+            parse_order(columns, order), int(post_request.get('start')),
+            length, post_request.get('search[value]'),
+            post_request.get('after'), version)
+        return json_response(
+            {'draw': int(post_request.get('draw')), **result})
@@ -0,0 +1,162 @@
+"""
+Streaming export of the filtered catalog tables.
+
+The export has the same search and order as the datatables view, and rows
+are read through a database cursor in chunks and written to the response
+as they are read, so the whole table is never in memory.
+"""
+import csv
+import io
+import json
+from itertools import islice
+from django.db.models import BooleanField, DateField, FloatField, IntegerField
+from django.http import JsonResponse, StreamingHttpResponse
+from parameters.search import search, QueryError
+from parameters.versions import parse_version
+from pvfree.datatables import json_default
+
+EXPORT_CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'}
+
+
+def parse_order(text):
+    """
+    Column names and ``True`` if descending from comma separated names with
+    a minus sign for descending, *EG*: ``Paco,-Name``.
+    """
+    return [
+        (name.lstrip('-'), name.startswith('-'))
+        for name in (text or '').split(',') if name.strip('-')]
+
+
+def export_batches(table, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Serialized rows of ``queryset`` in lists of up to ``chunk_size``."""
+    rows = queryset.values_list(*table.fields).iterator(chunk_size=chunk_size)
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            return
+        yield table.serialize(batch)
+
+
+class _Echo:
+    """File-like object that returns what's written, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(fields, batches):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for batch in batches:
+        yield ''.join(writer.writerow(row.values()) for row in batch)
+
+
+def _ndjson_chunks(batches):
+    for batch in batches:
+        yield ''.join(
+            json.dumps(row, default=json_default, separators=(',', ':'))
+            + '\n' for row in batch)
+
+
+class _ParquetSink(io.RawIOBase):
+    """Output stream that keeps the bytes written until they're popped."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._position
+
+    def pop(self):
+        value = b''.join(self._chunks)
+        self._chunks = []
+        return value
+
+
+def _arrow_type(pa, field):
+    if field.choices:
+        return pa.string()  # labels
+    if isinstance(field, BooleanField):
+        return pa.bool_()
+    if isinstance(field, IntegerField):
+        return pa.int64()
+    if isinstance(field, FloatField):
+        return pa.float64()
+    if isinstance(field, DateField):
+        return pa.date32()
+    return pa.string()
+
+
+def _parquet_chunks(model, fields, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([
+        (name, _arrow_type(pa, model._meta.get_field(name)))
+        for name in fields])
+    sink = _ParquetSink()
+    # one row group per chunk
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.pop()
+    yield sink.pop()
+
+
+def export_response(table, query, filename):
+    """
+    Stream the rows of a catalog table that match a search.
+
+    :param table: a :class:`~pvfree.datatables.DatatablesBackend`
+    :param query: the GET arguments with ``search`` text, ``order`` from
+        :func:`parse_order`, ``version`` from
+        :func:`~parameters.versions.parse_version`, and ``format`` which is
+        ``csv``, ``ndjson``, or ``parquet``
+    :param filename: name of the file without extension
+    """
+    fmt = query.get('format') or 'csv'
+    if fmt not in CONTENT_TYPES:
+        return JsonResponse(
+            {'error': f'format must be one of: {", ".join(CONTENT_TYPES)}'},
+            status=400)
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return JsonResponse(
+                {'error': 'parquet export requires pyarrow'}, status=400)
+    search_value = query.get('search') or ''
+    try:
+        version = parse_version(table.model, query.get('version'))
+        queryset = search(
+            table.model.objects.in_version(version), search_value)
+    except (QueryError, ValueError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    # ties are ordered by id, so exports are repeatable
+    queryset = queryset.order_by(
+        *table.order_by(parse_order(query.get('order')), search_value), 'id')
+    batches = export_batches(table, queryset)
+    if fmt == 'csv':
+        chunks = _csv_chunks(table.fields, batches)
+    elif fmt == 'ndjson':
+        chunks = _ndjson_chunks(batches)
+    else:
+        chunks = _parquet_chunks(table.model, table.fields, batches)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{fmt}"')
+    return response
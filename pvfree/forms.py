@@ -1,7 +1,60 @@
 import json
+import numpy as np
 import pandas as pd
 from django import forms
 from django.core.validators import MaxValueValidator, MinValueValidator
+from parameters.models import PVInverter, PVModule, CEC_Module
+from parameters.performance import SINGLEDIODE_METHODS, STRING_SIZING_KEYS
+
+MAX_POINTS = 100000
+
+
+class FloatArrayField(forms.CharField):
+    """
+    Parse a JSON list or comma separated string of numbers into a 1-D array.
+    """
+    dtype = float
+    default_error_messages = {
+        'invalid': 'Enter a JSON list or comma separated numbers.',
+        'max_points': 'Ensure there are at most %(max_points)d numbers.',
+    }
+
+    def __init__(self, *, max_points=MAX_POINTS, **kwargs):
+        self.max_points = max_points
+        super().__init__(**kwargs)
+
+    def clean(self, value):
+        value = super().clean(value)
+        if value in self.empty_values:
+            return None
+        try:
+            values = json.loads(value)
+        except json.JSONDecodeError:
+            values = value.split(',')
+        try:
+            values = np.asarray(values, dtype=self.dtype)
+        except (TypeError, ValueError):
+            raise forms.ValidationError(
+                self.error_messages['invalid'], code='invalid')
+        if values.ndim > 1:
+            raise forms.ValidationError(
+                self.error_messages['invalid'], code='invalid')
+        values = np.atleast_1d(values)
+        if values.size > self.max_points:
+            raise forms.ValidationError(
+                self.error_messages['max_points'], code='max_points',
+                params={'max_points': self.max_points})
+        return values
+
+
+class IntegerArrayField(FloatArrayField):
+    """
+    Parse a JSON list or comma separated string of integers, like record IDs.
+    """
+    dtype = int
+    default_error_messages = {
+        'invalid': 'Enter a JSON list or comma separated integers.',
+    }
 
 
 class SolarPositionForm(forms.Form):
@@ -117,3 +170,196 @@ class WeatherForm(forms.Form):
     tmy_email = forms.EmailField(
         max_length=100, label='Email Address', required=False)
     tmy_file = forms.FileField(required=False, label="TMY file")
+
+
+class CECModulePerformanceForm(forms.Form):
+    METHODS = [(m, m) for m in SINGLEDIODE_METHODS]
+    cec_module = forms.IntegerField(label='CEC Module ID')
+    effective_irradiance = FloatArrayField(
+        label='Effective Irradiance [W/m2]')
+    temp_cell = FloatArrayField(label='Cell Temperature [C]')
+    grid = forms.BooleanField(
+        label='Irradiance x Temperature Grid', required=False)
+    method = forms.ChoiceField(
+        label='Method', required=False, initial='lambertw', choices=METHODS)
+    ivcurve = forms.BooleanField(label='IV Curves', required=False)
+    ivcurve_pnts = forms.IntegerField(
+        label='IV Curve Points', required=False, initial=100,
+        validators=[MaxValueValidator(1000), MinValueValidator(2)])
+
+
+class ModuleConditionsForm(forms.Form):
+    """
+    Operating conditions given either as arrays of effective irradiance and
+    cell temperature or as a timestamped weather series.
+    """
+    WEATHER_COLUMNS = [
+        ('effective_irradiance', 'temp_cell'),
+        ('poa_global', 'temp_air', 'wind_speed')]
+    conditions_required = True
+    effective_irradiance = FloatArrayField(
+        label='Effective Irradiance [W/m2]', required=False)
+    temp_cell = FloatArrayField(label='Cell Temperature [C]', required=False)
+    weather_data = forms.CharField(
+        label='Weather Data', required=False, widget=forms.Textarea,
+        empty_value=None)
+
+    def clean_weather_data(self):
+        wdata = self.cleaned_data['weather_data']
+        if wdata is None:
+            return None
+        try:
+            weather_data = pd.DataFrame.from_dict(
+                json.loads(wdata), orient='index', dtype=float)
+            weather_data.index = pd.DatetimeIndex(weather_data.index)
+        except (AttributeError, TypeError, ValueError):
+            raise forms.ValidationError("Invalid data in weather data")
+        for columns in self.WEATHER_COLUMNS:
+            if weather_data.columns.isin(columns).sum() == len(columns):
+                return weather_data
+        raise forms.ValidationError(
+            "Weather data needs columns effective_irradiance and temp_cell"
+            " or poa_global, temp_air, and wind_speed")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        weather_data = cleaned_data.get('weather_data')
+        effective_irradiance = cleaned_data.get('effective_irradiance')
+        temp_cell = cleaned_data.get('temp_cell')
+        if weather_data is not None:
+            return cleaned_data
+        if effective_irradiance is None and temp_cell is None and (
+                not self.conditions_required):
+            return cleaned_data
+        if effective_irradiance is None or temp_cell is None:
+            raise forms.ValidationError(
+                "Enter weather data or effective irradiance and cell"
+                " temperature")
+        return cleaned_data
+
+
+class PVModulePerformanceForm(ModuleConditionsForm):
+    pvmodules = IntegerArrayField(label='Sandia Module IDs')
+
+
+class PVInverterPerformanceForm(forms.Form):
+    pvinverters = IntegerArrayField(label='Inverter IDs', required=False)
+    paco_min = forms.FloatField(label='Min Paco [W]', required=False)
+    paco_max = forms.FloatField(label='Max Paco [W]', required=False)
+    sam_version = forms.IntegerField(label='SAM Version', required=False)
+    p_dc = FloatArrayField(label='DC Power [W]')
+    v_dc = FloatArrayField(label='DC Voltage [V]', required=False)
+    clipping = forms.BooleanField(label='Clipping Summary', required=False)
+    timestep = forms.FloatField(
+        label='Timestep [h]', required=False, initial=1.0,
+        validators=[MinValueValidator(0)])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if (cleaned_data.get('pvinverters') is None
+                and cleaned_data.get('paco_min') is None
+                and cleaned_data.get('paco_max') is None):
+            raise forms.ValidationError(
+                "Enter inverter IDs or a Paco range")
+        return cleaned_data
+
+
+class StringSizingForm(forms.Form):
+    ORDER_BY = [
+        (o, o) for k in STRING_SIZING_KEYS + ('cec_module', 'pvinverter')
+        for o in (k, '-' + k)]
+    temp_min = forms.FloatField(
+        label='Min Ambient Temperature [C]',
+        validators=[MaxValueValidator(100), MinValueValidator(-100)])
+    temp_max = forms.FloatField(
+        label='Max Ambient Temperature [C]',
+        validators=[MaxValueValidator(100), MinValueValidator(-100)])
+    target_ilr = forms.FloatField(
+        label='Target Inverter Loading Ratio', required=False, initial=1.25,
+        validators=[MinValueValidator(0)])
+    module_name = forms.CharField(
+        label='Module Name', max_length=100, required=False)
+    technology = forms.TypedChoiceField(
+        label='Technology', required=False, choices=CEC_Module.TECH,
+        coerce=int, empty_value=None)
+    version = forms.TypedChoiceField(
+        label='Module Version', required=False, choices=CEC_Module.VERSION,
+        coerce=int, empty_value=None)
+    stc_min = forms.FloatField(label='Min STC [W]', required=False)
+    stc_max = forms.FloatField(label='Max STC [W]', required=False)
+    inverter_name = forms.CharField(
+        label='Inverter Name', max_length=100, required=False)
+    paco_min = forms.FloatField(label='Min Paco [W]', required=False)
+    paco_max = forms.FloatField(label='Max Paco [W]', required=False)
+    sam_version = forms.TypedChoiceField(
+        label='SAM Version', required=False, choices=PVInverter.SAM_VERSION,
+        coerce=int, empty_value=None)
+    include_invalid = forms.BooleanField(
+        label='Include Invalid Pairs', required=False)
+    order_by = forms.ChoiceField(
+        label='Order By', required=False, initial='-ilr', choices=ORDER_BY)
+    limit = forms.IntegerField(
+        label='Limit', required=False, initial=20,
+        validators=[MaxValueValidator(1000), MinValueValidator(1)])
+    offset = forms.IntegerField(
+        label='Offset', required=False, initial=0,
+        validators=[MinValueValidator(0)])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        temp_min = cleaned_data.get('temp_min')
+        temp_max = cleaned_data.get('temp_max')
+        if temp_min is not None and temp_max is not None and (
+                temp_min > temp_max):
+            raise forms.ValidationError(
+                "Max temperature must be greater than min temperature")
+        return cleaned_data
+
+
+class ModuleRankingForm(ModuleConditionsForm):
+    MODELS = [('cec', 'CEC'), ('sapm', 'SAPM')]
+    METRICS = [
+        ('energy_per_area', 'Energy per Area [Wh/m2]'),
+        ('energy_per_watt', 'Energy per Watt [Wh/W]'),
+        ('energy', 'Energy [Wh]')]
+    conditions_required = False
+    model = forms.ChoiceField(
+        label='Model', required=False, initial='cec', choices=MODELS)
+    metric = forms.ChoiceField(
+        label='Metric', required=False, initial='energy_per_area',
+        choices=METRICS)
+    name = forms.CharField(label='Name', max_length=100, required=False)
+    technology = forms.TypedChoiceField(
+        label='CEC Technology', required=False, choices=CEC_Module.TECH,
+        coerce=int, empty_value=None)
+    material = forms.TypedChoiceField(
+        label='Sandia Material', required=False, choices=PVModule.MATERIALS,
+        coerce=int, empty_value=None)
+    weights = FloatArrayField(label='Weights [h]', required=False)
+    timestep = forms.FloatField(
+        label='Timestep [h]', required=False, initial=1.0,
+        validators=[MinValueValidator(0)])
+    top = forms.IntegerField(
+        label='Top', required=False, initial=20,
+        validators=[MaxValueValidator(1000), MinValueValidator(1)])
+    lat = forms.FloatField(
+        label='Latitude', required=False,
+        validators=[MaxValueValidator(90), MinValueValidator(-90)])
+    lon = forms.FloatField(
+        label='Longitude', required=False,
+        validators=[MaxValueValidator(180), MinValueValidator(-180)])
+    tz = forms.IntegerField(
+        label='Timezone', required=False,
+        validators=[MaxValueValidator(12), MinValueValidator(-12)])
+    year = forms.IntegerField(
+        label='Year', required=False, initial=1990,
+        validators=[MaxValueValidator(2050), MinValueValidator(1950)])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lat = cleaned_data.get('lat')
+        lon = cleaned_data.get('lon')
+        if (lat is None) != (lon is None):
+            raise forms.ValidationError(
+                "Enter both latitude and longitude for a site year")
+        return cleaned_data
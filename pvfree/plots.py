@@ -0,0 +1,441 @@
+"""
+Curves of the catalog detail pages.
+
+The detail pages are drawn in the browser with BokehJS from the curve data
+of a record, so a page view doesn't build a figure. The curves only change
+when their record does, so they're cached by model, id, modification date,
+and a digest of the record values, since the modification date doesn't
+change for edits on the same day.
+"""
+import hashlib
+import logging
+import threading
+import warnings
+from bokeh.palettes import Category10_10, Colorblind5 as cmap, Viridis256
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+import numpy as np
+from pvlib.pvsystem import sapm, inverter
+from parameters.cache import KEY_PREFIX, TIMEOUT, cached_result, result_key
+from parameters.models import PVInverter, PVModule, CEC_Module
+from parameters.performance import (
+    CEC_PARAMS, IVCURVE_PNTS, SANDIA_INVERTER_PARAMS, SAPM_PARAMS,
+    cec_performance, sandia_inverter, sapm_performance, stack_params)
+
+LOGGER = logging.getLogger(__name__)
+
+# surface size as (rows, columns), *IE*: (y, x)
+SURFACE_SHAPE = (50, 200)
+MAX_SURFACE_SHAPE = (1000, 1000)
+MAX_SURFACE_POINTS = 250000
+# surfaces are averaged down to this size for the browser
+DISPLAY_SHAPE = (100, 200)
+SURFACE_IRRADIANCE = (50.0, 1200.0)  # [W/m2]
+SURFACE_TEMPERATURE = (-10.0, 90.0)  # [C]
+# number of records that can be compared, one color each
+MAX_COMPARE = len(Category10_10)
+
+
+def record_dict(obj):
+    """All field values of a catalog record, keyed by field name."""
+    return {k.name: getattr(obj, k.name) for k in obj._meta.get_fields()}
+
+
+def _params(obj, keys):
+    """Model parameters of a record as floats, missing values are NaN."""
+    return {
+        k: np.nan if getattr(obj, k) is None else float(getattr(obj, k))
+        for k in keys}
+
+
+def _curves(title, x_label, y_label, labels, xs, ys, palette=cmap,
+            **markers):
+    """
+    Curve data for BokehJS.
+
+    :param labels: legend label of each curve
+    :param xs: list of the x values of each curve
+    :param ys: list of the y values of each curve
+    :param palette: colors of the curves, at least one per curve
+    :param markers: marker name and ``(x, y)`` with one point per curve
+    """
+    def finite(values):
+        # NaN isn't valid JSON
+        return [v if np.isfinite(v) else None for v in values]
+
+    xs, ys = [finite(x) for x in xs], [finite(y) for y in ys]
+    return {
+        'title': title, 'x_label': x_label, 'y_label': y_label,
+        'colors': list(palette[:len(labels)]),
+        'lines': [
+            {'label': label, 'x': x, 'y': y}
+            for label, x, y in zip(labels, xs, ys)],
+        'markers': [
+            {'marker': marker, 'x': finite(x), 'y': finite(y)}
+            for marker, (x, y) in markers.items()]}
+
+
+def pvinverter_curves(pvinv):
+    """Efficiency versus DC power at the MPPT limits and nominal voltage."""
+    pvinv_dict = record_dict(pvinv)
+    dc_voltages = [pvinv.Mppt_low, pvinv.Vdco, pvinv.Mppt_high]
+    pwr_lvl = np.array([0.1, 0.2, 0.3, 0.5, 0.75, 1])
+    dc_power = pvinv.Pdco * pwr_lvl
+    dc_power, dc_voltage = np.meshgrid(dc_power, dc_voltages)
+    pac = inverter.sandia(dc_voltage, dc_power, pvinv_dict)
+    eff = pac / dc_power
+    eff_disp = 100*eff
+    if pvinv.Paco > 1000:
+        dc_power_disp = dc_power/1000
+        disp_units = 'kW'
+    else:
+        dc_power_disp = dc_power
+        disp_units = 'W'
+    return _curves(
+        pvinv.Name, f'DC power, Pdc [{disp_units}]', 'efficiency [%]',
+        ['{:d} [V]'.format(int(vdc)) for vdc in dc_voltages],
+        dc_power_disp.tolist(), eff_disp.tolist())
+
+
+def pvmodule_curves(pvmod):
+    """Efficiency versus effective irradiance at several cell temperatures."""
+    pvmod_dict = record_dict(pvmod)
+    for k in ['IXO', 'IXXO', 'C4', 'C5', 'C6', 'C7']:
+        if pvmod_dict[k] is None:
+            pvmod_dict[k] = 0.
+    celltemps = np.linspace(0, 100, 5)  # [C]
+    effirrad = np.linspace(100, 1000, 10)  # [W/m2]
+    effirrad, celltemp = np.meshgrid(effirrad, celltemps)
+    # Ee in [W/m2] pvlib>=0.7, in suns for pvlib<0.7
+    results = sapm(effirrad, celltemp, pvmod_dict)
+    eff = results['p_mp'] / effirrad / pvmod.Area * 100
+    return _curves(
+        pvmod.Name, 'effective irradiance, Ee [W/m' + u"\u00B2" + ']',
+        'efficiency [%]', ['{:d} [C]'.format(int(ct)) for ct in celltemps],
+        effirrad.tolist(), eff.tolist())
+
+
+def cec_module_curves(cec_mod):
+    """IV curves at several cell temperatures."""
+    celltemps = np.array([0.0, 25.0, 50.0, 75.0, 100.0])
+    effirrad = 1000
+    # all temperatures in one evaluation
+    result = cec_performance(
+        effirrad, celltemps, _params(cec_mod, CEC_PARAMS), method='newton',
+        ivcurve_pnts=IVCURVE_PNTS)
+    return _curves(
+        cec_mod.Name, 'voltage, V [V]', 'current, I [A]',
+        ['{:d} [C]'.format(int(ct)) for ct in celltemps],
+        result['v'].tolist(), result['i'].tolist(),
+        square=([0.0] * len(celltemps), result['i_sc'].tolist()),
+        circle=(result['v_oc'].tolist(), [0.0] * len(celltemps)),
+        triangle=(result['v_mp'].tolist(), result['i_mp'].tolist()))
+
+
+CURVES = {
+    PVInverter: pvinverter_curves,
+    PVModule: pvmodule_curves,
+    CEC_Module: cec_module_curves}
+
+
+def downsample(values, shape):
+    """
+    Average blocks of a 2-D array so it's no bigger than ``shape``, ignoring
+    NaN. Edge blocks are smaller if the size isn't a multiple of the block.
+    """
+    values = np.asarray(values, dtype=float)
+    factors = [
+        int(np.ceil(n / max_n)) for n, max_n in zip(values.shape, shape)]
+    if factors == [1, 1]:
+        return values
+    padded_shape = [
+        int(np.ceil(n / f)) * f for n, f in zip(values.shape, factors)]
+    padded = np.full(padded_shape, np.nan)
+    padded[:values.shape[0], :values.shape[1]] = values
+    blocks = padded.reshape(
+        padded_shape[0] // factors[0], factors[0],
+        padded_shape[1] // factors[1], factors[1])
+    with warnings.catch_warnings():
+        # all NaN blocks are NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(blocks, axis=(1, 3))
+
+
+def _surface(title, x_label, y_label, z_label, x, y, z):
+    """
+    Surface data for BokehJS, ``z`` has a row for each ``y`` and a column for
+    each ``x``.
+    """
+    z_disp = downsample(z, DISPLAY_SHAPE)
+    x_disp = downsample(x[np.newaxis, :], (1, DISPLAY_SHAPE[1]))[0]
+    y_disp = downsample(y[:, np.newaxis], (DISPLAY_SHAPE[0], 1))[:, 0]
+    finite = np.isfinite(z_disp)
+    return {
+        'title': title, 'x_label': x_label, 'y_label': y_label,
+        'z_label': z_label, 'shape': list(np.shape(z)),
+        'x': x_disp.tolist(), 'y': y_disp.tolist(),
+        'z': np.where(finite, z_disp, None).tolist(),
+        'low': float(z_disp[finite].min()) if finite.any() else None,
+        'high': float(z_disp[finite].max()) if finite.any() else None,
+        'palette': list(Viridis256)}
+
+
+def pvinverter_surface(pvinv, shape):
+    """Efficiency over DC power and DC voltage."""
+    v_low, v_high = pvinv.Mppt_low, pvinv.Mppt_high
+    if not v_low < v_high:
+        v_low, v_high = 0.8 * pvinv.Vdco, 1.2 * pvinv.Vdco
+    dc_voltage = np.linspace(v_low, v_high, shape[0])
+    dc_power = pvinv.Pdco * np.linspace(0.05, 1.0, shape[1])
+    power_ac = sandia_inverter(
+        dc_voltage[:, np.newaxis], dc_power[np.newaxis, :],
+        _params(pvinv, SANDIA_INVERTER_PARAMS))
+    eff = power_ac / dc_power * 100
+    if pvinv.Paco > 1000:
+        dc_power, disp_units = dc_power / 1000, 'kW'
+    else:
+        disp_units = 'W'
+    return _surface(
+        pvinv.Name, f'DC power, Pdc [{disp_units}]', 'DC voltage, Vdc [V]',
+        'efficiency [%]', dc_power, dc_voltage, eff)
+
+
+def pvmodule_surface(pvmod, shape):
+    """Efficiency over effective irradiance and cell temperature."""
+    celltemps = np.linspace(*SURFACE_TEMPERATURE, shape[0])
+    effirrad = np.linspace(*SURFACE_IRRADIANCE, shape[1])
+    results = sapm_performance(
+        effirrad[np.newaxis, :], celltemps[:, np.newaxis],
+        _params(pvmod, SAPM_PARAMS))
+    eff = results['p_mp'] / effirrad / pvmod.Area * 100
+    return _surface(
+        pvmod.Name, 'effective irradiance, Ee [W/m' + u"\u00B2" + ']',
+        'cell temperature, Tc [C]', 'efficiency [%]', effirrad, celltemps,
+        eff)
+
+
+def cec_module_surface(cec_mod, shape):
+    """Efficiency over effective irradiance and cell temperature."""
+    celltemps = np.linspace(*SURFACE_TEMPERATURE, shape[0])
+    effirrad = np.linspace(*SURFACE_IRRADIANCE, shape[1])
+    # newton is several times faster than lambertw for dense grids
+    results = cec_performance(
+        effirrad[np.newaxis, :], celltemps[:, np.newaxis],
+        _params(cec_mod, CEC_PARAMS), method='newton')
+    eff = results['p_mp'] / effirrad / cec_mod.A_c * 100
+    return _surface(
+        cec_mod.Name, 'effective irradiance, Ee [W/m' + u"\u00B2" + ']',
+        'cell temperature, Tc [C]', 'efficiency [%]', effirrad, celltemps,
+        eff)
+
+
+SURFACES = {
+    PVInverter: pvinverter_surface,
+    PVModule: pvmodule_surface,
+    CEC_Module: cec_module_surface}
+
+
+def _compare_curves(objs, x_label, y_label, xs, ys, **markers):
+    return _curves(
+        'comparison', x_label, y_label, [obj.Name for obj in objs],
+        xs.tolist(), ys.tolist(), palette=Category10_10, **markers)
+
+
+def compare_pvinverters(pvinvs):
+    """Efficiency versus fraction of rated DC power at nominal voltage."""
+    params = stack_params(
+        [_params(pvinv, SANDIA_INVERTER_PARAMS) for pvinv in pvinvs],
+        SANDIA_INVERTER_PARAMS)
+    pwr_lvl = np.linspace(0.05, 1.0, 20)
+    dc_power = params['Pdco'] * pwr_lvl
+    eff = sandia_inverter(params['Vdco'], dc_power, params) / dc_power * 100
+    return _compare_curves(
+        pvinvs, 'DC power, Pdc/Pdco [%]', 'efficiency [%]',
+        np.broadcast_to(pwr_lvl * 100, eff.shape), eff)
+
+
+def compare_pvmodules(pvmods):
+    """Efficiency versus effective irradiance at 25 [C]."""
+    params = stack_params(
+        [_params(pvmod, SAPM_PARAMS) for pvmod in pvmods], SAPM_PARAMS)
+    area = np.array([[pvmod.Area] for pvmod in pvmods], dtype=float)
+    effirrad = np.linspace(100, 1000, 10)  # [W/m2]
+    results = sapm_performance(effirrad, 25.0, params)
+    eff = results['p_mp'] / effirrad / area * 100
+    return _compare_curves(
+        pvmods, 'effective irradiance, Ee [W/m' + u"\u00B2" + ']',
+        'efficiency [%]', np.broadcast_to(effirrad, eff.shape), eff)
+
+
+def compare_cec_modules(cec_mods):
+    """IV curves at standard test conditions."""
+    params = stack_params(
+        [_params(cec_mod, CEC_PARAMS) for cec_mod in cec_mods], CEC_PARAMS)
+    result = cec_performance(
+        1000.0, 25.0, params, method='newton', ivcurve_pnts=IVCURVE_PNTS)
+    # one row per module
+    result = {k: v[:, 0] for k, v in result.items()}
+    return _compare_curves(
+        cec_mods, 'voltage, V [V]', 'current, I [A]', result['v'],
+        result['i'], square=([0.0] * len(cec_mods), result['i_sc'].tolist()),
+        circle=(result['v_oc'].tolist(), [0.0] * len(cec_mods)),
+        triangle=(result['v_mp'].tolist(), result['i_mp'].tolist()))
+
+
+COMPARISONS = {
+    PVInverter: compare_pvinverters,
+    PVModule: compare_pvmodules,
+    CEC_Module: compare_cec_modules}
+
+# parameters in the comparison table
+COMPARE_FIELDS = {
+    PVInverter: (
+        'Manufacturer', 'Vac', 'Paco', 'Pdco', 'Vdco', 'Pso', 'C0', 'C1', 'C2',
+        'C3', 'Pnt', 'Vdcmax', 'Idcmax', 'Mppt_low', 'Mppt_high',
+        'cec_efficiency', 'euro_efficiency'),
+    PVModule: (
+        'Vintage', 'Area', 'Material', 'Cells_in_Series', 'Isco', 'Voco',
+        'Impo', 'Vmpo', 'Aisc', 'Aimp', 'Bvoco', 'Bvmpo', 'nameplate',
+        'fill_factor', 'module_eff', 'noct', 'low_irradiance_eff',
+        'pmp_noct'),
+    CEC_Module: (
+        'Manufacturer', 'Date', 'Technology', 'Bifacial', 'STC', 'T_NOCT',
+        'A_c', 'N_s', 'I_sc_ref', 'V_oc_ref', 'I_mp_ref', 'V_mp_ref',
+        'alpha_sc', 'beta_oc', 'gamma_r', 'a_ref', 'I_L_ref', 'I_o_ref',
+        'R_s', 'R_sh_ref', 'Adjust', 'nameplate', 'low_irradiance_eff',
+        'pmp_noct')}
+
+
+def _display(obj, name):
+    field = obj._meta.get_field(name)
+    value = getattr(obj, name)
+    if field.choices:
+        return getattr(obj, f'get_{name}_display')()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None  # NaN isn't valid JSON
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _compare(model, ids):
+    objs = list(model.objects.filter(pk__in=ids).order_by('pk'))
+    if len(objs) != len(ids):
+        return None  # missing records aren't cached
+    with np.errstate(all='ignore'):
+        curves = COMPARISONS[model](objs)
+    params = []
+    for name in COMPARE_FIELDS[model]:
+        values = [_display(obj, name) for obj in objs]
+        params.append({
+            'name': name, 'values': values,
+            'differs': len(set(map(repr, values))) > 1})
+    return {
+        'records': [{'id': obj.pk, 'Name': obj.Name} for obj in objs],
+        'curves': curves, 'params': params}
+
+
+def compare_data(model, ids):
+    """
+    Overlaid curves and a parameter table of several records, from one
+    stacked evaluation, cached per set of ids until the next write.
+
+    :param ids: primary keys of the records, at most :data:`MAX_COMPARE`
+    :returns: dictionary with ``records``, ``curves``, and ``params``, a list
+        of the values of each parameter and if they differ, or ``None`` if a
+        record doesn't exist
+    """
+    ids = sorted(set(ids))
+    return cached_result(
+        result_key(model, 'compare', ids), lambda: _compare(model, ids),
+        timeout=TIMEOUT)
+
+
+def curves_key(obj):
+    """Cache key of the curves of ``obj``."""
+    values = repr([
+        getattr(obj, f.attname) for f in obj._meta.concrete_fields])
+    digest = hashlib.sha1(values.encode()).hexdigest()
+    return (
+        f'{KEY_PREFIX}:{obj._meta.label_lower}:curves:{obj.pk}:'
+        f'{obj.modified_on.isoformat()}:{digest}')
+
+
+def curve_data(obj):
+    """Curves of ``obj``, cached until it changes."""
+    key = curves_key(obj)
+    curves = cache.get(key)
+    if curves is None:
+        curves = CURVES[type(obj)](obj)
+        cache.set(key, curves, timeout=TIMEOUT)
+    return curves
+
+
+def surface_data(obj, shape=SURFACE_SHAPE):
+    """
+    Performance surface of ``obj`` in one vectorized evaluation, cached
+    until it changes.
+
+    :param shape: number of rows and columns, *IE*: ``(y, x)``, evaluated
+    """
+    key = f'{curves_key(obj)}:surface:{shape[0]}x{shape[1]}'
+    surface = cache.get(key)
+    if surface is None:
+        with np.errstate(all='ignore'):
+            surface = SURFACES[type(obj)](obj, shape)
+        cache.set(key, surface, timeout=TIMEOUT)
+    return surface
+
+
+def warm_plots(model, pks=None):
+    """
+    Cache the curves of records, *EG*: after an upload.
+
+    :param pks: records to cache, or ``None`` for all records
+    :returns: number of records cached
+    """
+    queryset = model.objects.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    count = 0
+    for obj in queryset.iterator():
+        try:
+            curve_data(obj)
+        except Exception as exc:
+            # a bad record shouldn't fail the upload, its page will show it
+            LOGGER.warning(
+                'could not compute %s %s curves: %s', model.__name__, obj.pk,
+                exc)
+            continue
+        count += 1
+    return count
+
+
+def _warm_plots_thread(model, pks):
+    try:
+        count = warm_plots(model, pks)
+        LOGGER.debug('%s curves cached: %d', model.__name__, count)
+    finally:
+        # the thread has its own connection
+        connection.close()
+
+
+def warm_plots_async(model, pks):
+    """
+    Cache the curves of records in a background thread, so the request that
+    created them doesn't wait.
+    """
+    thread = threading.Thread(
+        target=_warm_plots_thread, args=(model, list(pks)), daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_uploaded_plots(sender, created, **kwargs):
+    """
+    Receiver for ``upload_finished``, connected by the app config, see
+    :data:`settings.WARM_PLOTS`.
+    """
+    if settings.WARM_PLOTS and created:
+        warm_plots_async(sender, created)
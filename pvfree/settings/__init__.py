@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'parameters',
+    'pvfree',
     'tastypie',
 ]
 
@@ -64,6 +65,35 @@ DATABASES = {
     'default': dj_database_url.config(env='ELEPHANT_SQL', conn_max_age=600),
 }
 
+# Caches
+# catalog searches are cached until the next write, which bumps a generation
+# counter in the cache, so the cache must be shared by all gunicorn workers:
+# use Redis if REDIS_URL is set, otherwise a database table created by the
+# parameters migrations
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    # requires the redis package
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'pvfree_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# cache the detail page plots of uploaded records in a background thread
+WARM_PLOTS = True
+
+# import uploads in a background thread and poll their progress
+UPLOAD_IN_BACKGROUND = True
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.6/topics/i18n/
 
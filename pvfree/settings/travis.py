@@ -18,3 +18,12 @@ DATABASES = {
         'PORT': '5432',
     }
 }
+
+# Caches
+# one process, so local memory is shared by all requests
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
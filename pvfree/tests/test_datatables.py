@@ -0,0 +1,78 @@
+import os
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from parameters.models import CEC_Module, LATEST_VERSION
+from pvfree.views import CEC_MODULE_TABLE
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+TESTDIR = os.path.join(BASEDIR, 'parameters', 'data')
+CEC_MODULES = os.path.join(TESTDIR, 'cec_modules.csv')
+SILICON = [1, 2, 3, 7, 8, 9, 11, 12]
+
+
+class DatatablesBackendTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+        self.cecmods = CEC_Module.objects.in_version(LATEST_VERSION)
+
+    def test_result_order(self):
+        result = CEC_MODULE_TABLE.result([('STC', True)], 0, None, '')
+        self.assertEqual(result['recordsTotal'], self.cecmods.count())
+        self.assertEqual(result['recordsFiltered'], self.cecmods.count())
+        self.assertEqual(
+            [row['id'] for row in result['data']],
+            list(self.cecmods.order_by('-STC', 'id').values_list(
+                'id', flat=True)))
+        # choices are labels, only table columns are returned
+        cecmod = self.cecmods.get(pk=result['data'][0]['id'])
+        self.assertEqual(
+            result['data'][0]['Technology'], cecmod.get_Technology_display())
+        self.assertNotIn('alpha_sc', result['data'][0])
+        # names descend case insensitive, other columns are ignored
+        result = CEC_MODULE_TABLE.result(
+            [('alpha_sc', False), ('Name', True)], 0, None, '')
+        names = [row['Name'] for row in result['data']]
+        self.assertEqual(names, sorted(names, key=str.lower, reverse=True))
+
+    def test_result_pages(self):
+        order = [('STC', False)]
+        expected = list(self.cecmods.order_by('STC', 'id').values_list(
+            'id', flat=True))
+        first = CEC_MODULE_TABLE.result(order, 0, 3, '')
+        self.assertEqual([row['id'] for row in first['data']], expected[:3])
+        self.assertEqual(first['next']['start'], 3)
+        # the keyset cursor and the offset give the same next page
+        after = CEC_MODULE_TABLE.result(
+            order, 3, 3, '', after=first['next']['after'])
+        offset = CEC_MODULE_TABLE.result(order, 3, 3, '')
+        self.assertEqual([row['id'] for row in after['data']], expected[3:6])
+        self.assertEqual(after['data'], offset['data'])
+        last = CEC_MODULE_TABLE.result(order, 6, 3, '')
+        self.assertEqual([row['id'] for row in last['data']], expected[6:])
+        self.assertIsNone(last['next'])
+
+    def test_result_filtered_count(self):
+        silicon = self.cecmods.filter(Technology__in=SILICON)
+        result = CEC_MODULE_TABLE.result([], 0, 2, 'tech:si')
+        self.assertEqual(result['recordsFiltered'], silicon.count())
+        self.assertLessEqual(len(result['data']), 2)
+        # the same search in other case and spacing is cached
+        with self.assertNumQueries(0):
+            cached = CEC_MODULE_TABLE.result([], 0, 2, '  TECH:SI ')
+        self.assertEqual(cached, result)
+        # a write invalidates the cached count
+        cecmod = silicon.first()
+        cecmod.Technology = CEC_Module.TECH_TYPES['CdTe']
+        cecmod.save()
+        result = CEC_MODULE_TABLE.result([], 0, 2, 'tech:si')
+        self.assertEqual(result['recordsFiltered'], silicon.count())
+        self.assertNotIn(cecmod.pk, [row['id'] for row in result['data']])
+        # bad field terms are errors
+        result = CEC_MODULE_TABLE.result([], 0, 2, 'STC>lots')
+        self.assertEqual(result['recordsFiltered'], 0)
+        self.assertIn('STC', result['error'])
@@ -0,0 +1,364 @@
+import json
+import os
+from io import BytesIO
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth.models import User
+from pvlib import irradiance
+from pvlib.pvsystem import calcparams_cec, singlediode, sapm
+from pvlib.inverter import sandia
+from pvlib.temperature import sapm_cell
+import numpy as np
+from parameters.models import PVInverter, PVModule, CEC_Module
+from parameters.store import clear_stores
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+TESTDIR = os.path.join(BASEDIR, 'parameters', 'data')
+CEC_MODULES = os.path.join(TESTDIR, 'cec_modules.csv')
+SANDIA_MODULES = os.path.join(TESTDIR, 'sandia_modules.csv')
+CEC_INVERTERS = os.path.join(TESTDIR, 'cec_inverters.csv')
+EFFIRRAD = [200.0, 400.0, 600.0, 800.0, 1000.0]
+CELLTEMPS = [0.0, 25.0, 50.0]
+
+
+class CECModulePerformanceTestCase(TestCase):
+    def setUp(self):
+        # test transactions roll back without signals
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+        self.cec_mod = CEC_Module.objects.first()
+
+    def test_cec_module_performance_grid(self):
+        data = {
+            'cec_module': self.cec_mod.pk, 'grid': True,
+            'effective_irradiance': json.dumps(EFFIRRAD),
+            'temp_cell': ','.join(str(tc) for tc in CELLTEMPS),
+            'ivcurve': True, 'ivcurve_pnts': 20}
+        r = self.client.get('/api/v1/pvlib/cec-module-performance/', data)
+        self.assertEqual(r.status_code, 200)
+        result = r.json()
+        effirrad, celltemp = np.meshgrid(EFFIRRAD, CELLTEMPS)
+        params = calcparams_cec(
+            effirrad.ravel(), celltemp.ravel(), self.cec_mod.alpha_sc,
+            self.cec_mod.a_ref, self.cec_mod.I_L_ref, self.cec_mod.I_o_ref,
+            self.cec_mod.R_sh_ref, self.cec_mod.R_s, self.cec_mod.Adjust)
+        expected = singlediode(*params)
+        for k in ('i_sc', 'v_oc', 'i_mp', 'v_mp', 'p_mp'):
+            assert np.allclose(np.ravel(result[k]), expected[k])
+        self.assertEqual(np.shape(result['v']), (3, 5, 20))
+        assert np.allclose(
+            np.array(result['v'])[..., -1].ravel(), expected['v_oc'])
+
+    def test_cec_module_performance_errors(self):
+        url = '/api/v1/pvlib/cec-module-performance/'
+        data = {
+            'cec_module': self.cec_mod.pk, 'effective_irradiance': '1000',
+            'temp_cell': '[25, 50]', 'method': 'newton'}
+        r = self.client.post(url, data)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.json()['p_mp']), 2)
+        data['effective_irradiance'] = '[1000, 800, 600]'
+        r = self.client.post(url, data)
+        self.assertEqual(r.status_code, 400)
+        data['effective_irradiance'] = 'bad'
+        r = self.client.post(url, data)
+        self.assertEqual(r.status_code, 400)
+        data['effective_irradiance'] = '1000'
+        data['cec_module'] = 0
+        r = self.client.post(url, data)
+        self.assertEqual(r.status_code, 404)
+
+
+class PVModulePerformanceTestCase(TestCase):
+    def setUp(self):
+        # test transactions roll back without signals
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(SANDIA_MODULES, 'rb') as fp:
+            PVModule.upload(fp, self.testuser)
+        self.pvmods = PVModule.objects.order_by('-id')[:3]
+
+    def _pvmod_dict(self, pvmod):
+        pvmod_dict = {
+            k.name: getattr(pvmod, k.name)
+            for k in PVModule._meta.get_fields()}
+        for k in PVModule.NAN_FIELDS:
+            if pvmod_dict[k] is None:
+                pvmod_dict[k] = 0.
+        return pvmod_dict
+
+    def test_pvmodule_performance_arrays(self):
+        data = {
+            'pvmodules': ','.join(str(pvmod.pk) for pvmod in self.pvmods),
+            'effective_irradiance': json.dumps(EFFIRRAD),
+            'temp_cell': '25'}
+        r = self.client.post('/api/v1/pvlib/pvmodule-performance/', data)
+        self.assertEqual(r.status_code, 200)
+        result = r.json()
+        self.assertEqual(np.shape(result['p_mp']), (3, 5))
+        for n, pvmod in enumerate(self.pvmods):
+            expected = sapm(
+                np.array(EFFIRRAD), 25.0, self._pvmod_dict(pvmod))
+            assert np.allclose(result['p_mp'][n], expected['p_mp'])
+            assert np.allclose(result['v_oc'][n], expected['v_oc'])
+
+    def test_pvmodule_performance_weather(self):
+        pvmod = self.pvmods[0]
+        weather_data = {
+            '2019-01-01T12:00:00-0800': {
+                'poa_global': 800.0, 'temp_air': 10.0, 'wind_speed': 2.0},
+            '2019-01-01T13:00:00-0800': {
+                'poa_global': 600.0, 'temp_air': 12.0, 'wind_speed': 1.0}}
+        data = {
+            'pvmodules': pvmod.pk, 'weather_data': json.dumps(weather_data)}
+        r = self.client.get('/api/v1/pvlib/pvmodule-performance/', data)
+        self.assertEqual(r.status_code, 200)
+        result = r.json()
+        self.assertEqual(len(result['index']), 2)
+        poa = np.array([800.0, 600.0])
+        temp_cell = sapm_cell(
+            poa, np.array([10.0, 12.0]), np.array([2.0, 1.0]),
+            pvmod.A, pvmod.B, pvmod.DTC)
+        expected = sapm(poa, temp_cell, self._pvmod_dict(pvmod))
+        assert np.allclose(result['temp_cell'][0], temp_cell)
+        assert np.allclose(result['p_mp'][0], expected['p_mp'])
+
+    def test_pvmodule_performance_errors(self):
+        url = '/api/v1/pvlib/pvmodule-performance/'
+        r = self.client.get(url, {'pvmodules': self.pvmods[0].pk})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(url, {
+            'pvmodules': self.pvmods[0].pk, 'weather_data': '{"bad": 1}'})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(url, {
+            'pvmodules': '0', 'effective_irradiance': '1000',
+            'temp_cell': '25'})
+        self.assertEqual(r.status_code, 404)
+
+
+class PVInverterPerformanceTestCase(TestCase):
+    def setUp(self):
+        # test transactions roll back without signals
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, 1)
+
+    def test_pvinverter_performance_paco_band(self):
+        pvinvs = PVInverter.objects.filter(
+            Paco__gte=1000, Paco__lte=60000).order_by('Paco', 'id')
+        pwr_lvl = np.array([0.0, 0.1, 0.5, 1.0, 1.2])
+        p_dc = pwr_lvl * pvinvs.last().Pdco
+        data = {
+            'paco_min': 1000, 'paco_max': 60000, 'p_dc': json.dumps(
+                p_dc.tolist()), 'clipping': True}
+        r = self.client.post('/api/v1/pvlib/pvinverter-performance/', data)
+        self.assertEqual(r.status_code, 200)
+        result = r.json()
+        self.assertEqual(result['pvinverters'], [p.pk for p in pvinvs])
+        for n, pvinv in enumerate(pvinvs):
+            pvinv_dict = {
+                k.name: getattr(pvinv, k.name)
+                for k in PVInverter._meta.get_fields()}
+            expected = sandia(pvinv.Vdco, p_dc, pvinv_dict)
+            assert np.allclose(result['p_ac'][n], expected)
+            self.assertAlmostEqual(
+                result['clipping']['ac_energy'][n], expected.sum())
+        # largest inverter clips only at 120% of its rated DC power
+        self.assertEqual(result['clipping']['clipped_steps'][-1], 1)
+        assert result['clipping']['clipping_loss'][-1] > 0
+
+    def test_pvinverter_performance_errors(self):
+        url = '/api/v1/pvlib/pvinverter-performance/'
+        r = self.client.get(url, {'p_dc': '1000'})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(url, {
+            'pvinverters': '1', 'p_dc': '[1000, 2000]', 'v_dc': '[1, 2, 3]'})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(url, {'pvinverters': '0', 'p_dc': '1000'})
+        self.assertEqual(r.status_code, 404)
+
+
+class StringSizingTestCase(TestCase):
+    def setUp(self):
+        # test transactions roll back without signals
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, 1)
+        # the test inverters have MPPT windows too narrow for any module
+        PVInverter.objects.filter(Paco__gt=1000).update(
+            Vdcmax=1000, Mppt_low=300, Mppt_high=800)
+
+    def test_string_sizing(self):
+        url = '/api/v1/pvlib/string-sizing/'
+        data = {
+            'temp_min': -10, 'temp_max': 40, 'include_invalid': True,
+            'order_by': 'cec_module', 'limit': 1000}
+        r = self.client.get(url, data)
+        self.assertEqual(r.status_code, 200)
+        result = r.json()
+        npairs = CEC_Module.objects.count() * PVInverter.objects.count()
+        self.assertEqual(result['meta']['total_count'], npairs)
+        cec_mod_ids = [obj['cec_module'] for obj in result['objects']]
+        self.assertEqual(cec_mod_ids, sorted(cec_mod_ids))
+        obj = next(obj for obj in result['objects'] if obj['valid'])
+        cec_mod = CEC_Module.objects.get(pk=obj['cec_module'])
+        pvinv = PVInverter.objects.get(pk=obj['pvinverter'])
+        params = calcparams_cec(
+            1000.0, -10.0, cec_mod.alpha_sc, cec_mod.a_ref, cec_mod.I_L_ref,
+            cec_mod.I_o_ref, cec_mod.R_sh_ref, cec_mod.R_s, cec_mod.Adjust)
+        cold = singlediode(*params)
+        max_modules = np.floor(min(
+            pvinv.Vdcmax / cold['v_oc'], pvinv.Mppt_high / cold['v_mp']))
+        self.assertAlmostEqual(obj['voc_cold'], cold['v_oc'])
+        self.assertEqual(obj['max_modules'], max_modules)
+        self.assertLessEqual(obj['min_modules'], obj['max_modules'])
+        self.assertAlmostEqual(
+            obj['ilr'],
+            obj['strings'] * max_modules * cec_mod.STC / pvinv.Paco)
+        # only valid pairs sorted by decreasing loading ratio by default
+        r = self.client.get(url, {'temp_min': -10, 'temp_max': 40})
+        self.assertEqual(r.status_code, 200)
+        objects = r.json()['objects']
+        assert all(obj['valid'] for obj in objects)
+        ilr = [obj['ilr'] for obj in objects]
+        self.assertEqual(ilr, sorted(ilr, reverse=True))
+
+    def test_string_sizing_errors(self):
+        url = '/api/v1/pvlib/string-sizing/'
+        r = self.client.get(url, {'temp_min': 40, 'temp_max': -10})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(url, {
+            'temp_min': -10, 'temp_max': 40, 'order_by': 'bad'})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(url, {
+            'temp_min': -10, 'temp_max': 40, 'module_name': 'no such'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()['meta']['total_count'], 0)
+
+
+class LibraryVersionTestCase(TestCase):
+    def setUp(self):
+        # test transactions roll back without signals
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        # the same rows in two versions are stored once, in their first one
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, 1)
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, 2)
+        with open(CEC_MODULES) as fp:
+            data = fp.read()
+        for version in ('SAM 2023.10.31', 'SAM 2023.12.17'):
+            CEC_Module.upload(BytesIO(
+                data.replace('SAM 2018.11.11 r2', version).encode()),
+                self.testuser)
+        self.version = CEC_Module.VER_TYPES['SAM 2023.12.17']
+
+    def test_newer_version(self):
+        pvinvs = PVInverter.objects.order_by('Paco', 'id')
+        self.assertFalse(pvinvs.filter(SAM_Version=2).exists())
+        r = self.client.get('/api/v1/pvlib/pvinverter-performance/', {
+            'paco_min': 0, 'sam_version': 2, 'p_dc': '1000'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()['pvinverters'], [p.pk for p in pvinvs])
+        r = self.client.get('/api/v1/pvlib/string-sizing/', {
+            'temp_min': -10, 'temp_max': 40, 'include_invalid': True,
+            'version': self.version, 'sam_version': 2, 'limit': 1000})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            r.json()['meta']['total_count'],
+            CEC_Module.objects.count() * PVInverter.objects.count())
+
+
+class ModuleRankingTestCase(TestCase):
+    def setUp(self):
+        # test transactions roll back without signals
+        clear_stores()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+        with open(SANDIA_MODULES, 'rb') as fp:
+            PVModule.upload(fp, self.testuser)
+
+    def test_module_ranking_cec(self):
+        data = {
+            'effective_irradiance': json.dumps(EFFIRRAD), 'temp_cell': 25,
+            'weights': '[1, 2, 3, 2, 1]', 'top': 3}
+        r = self.client.get('/api/v1/pvlib/module-ranking/', data)
+        self.assertEqual(r.status_code, 200)
+        result = r.json()
+        self.assertEqual(result['meta']['total_count'], 7)
+        self.assertEqual(len(result['objects']), 3)
+        expected = {}
+        for cec_mod in CEC_Module.objects.all():
+            params = calcparams_cec(
+                np.array(EFFIRRAD), 25.0, cec_mod.alpha_sc, cec_mod.a_ref,
+                cec_mod.I_L_ref, cec_mod.I_o_ref, cec_mod.R_sh_ref,
+                cec_mod.R_s, cec_mod.Adjust)
+            energy = np.dot(singlediode(*params)['p_mp'], [1, 2, 3, 2, 1])
+            expected[cec_mod.pk] = energy / cec_mod.A_c
+        ranked = sorted(expected, key=expected.get, reverse=True)[:3]
+        self.assertEqual([obj['id'] for obj in result['objects']], ranked)
+        for obj in result['objects']:
+            self.assertAlmostEqual(obj['energy_per_area'], expected[obj['id']])
+
+    def test_module_ranking_sapm_weather(self):
+        weather_data = {
+            '2019-01-01T12:00:00-0800': {
+                'poa_global': 800.0, 'temp_air': 10.0, 'wind_speed': 2.0},
+            '2019-01-01T13:00:00-0800': {
+                'poa_global': 600.0, 'temp_air': 12.0, 'wind_speed': 1.0}}
+        data = {
+            'model': 'sapm', 'metric': 'energy_per_watt',
+            'weather_data': json.dumps(weather_data)}
+        r = self.client.post('/api/v1/pvlib/module-ranking/', data)
+        self.assertEqual(r.status_code, 200)
+        objects = r.json()['objects']
+        self.assertEqual(len(objects), PVModule.objects.count())
+        self.assertEqual([obj['rank'] for obj in objects][:2], [1, 2])
+        energy_per_watt = [obj['energy_per_watt'] for obj in objects]
+        self.assertEqual(
+            energy_per_watt, sorted(energy_per_watt, reverse=True))
+        # default IEC 61853-1 conditions
+        r = self.client.get('/api/v1/pvlib/module-ranking/', {'top': 1})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()['meta']['conditions'], 28)
+
+    def test_module_ranking_site_year(self):
+        cache.clear()
+        data = {'lat': 37.8, 'lon': -122.3, 'tz': -8, 'year': 2019, 'top': 3}
+        with mock.patch(
+                'pvfree.api.irradiance.get_total_irradiance',
+                wraps=irradiance.get_total_irradiance) as get_poa:
+            r = self.client.get('/api/v1/pvlib/module-ranking/', data)
+            self.assertEqual(r.status_code, 200)
+            result = r.json()
+            # only daylight hours of the year
+            self.assertGreater(result['meta']['conditions'], 4000)
+            self.assertLess(result['meta']['conditions'], 4600)
+            self.assertEqual(len(result['objects']), 3)
+            # same site reuses the cached year
+            r = self.client.get('/api/v1/pvlib/module-ranking/', data)
+            self.assertEqual(r.json(), result)
+            get_poa.assert_called_once()
+        r = self.client.get('/api/v1/pvlib/module-ranking/', {'lat': 37.8})
+        self.assertEqual(r.status_code, 400)
+
+    def test_module_ranking_too_many_points(self):
+        with mock.patch('pvfree.api.MAX_RANKING_POINTS', 100):
+            r = self.client.get('/api/v1/pvlib/module-ranking/')
+        self.assertEqual(r.status_code, 400)
+        self.assertIn('Too many points', r.json()['__all__'][0])
@@ -0,0 +1,159 @@
+import os
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+import numpy as np
+from parameters.jobs import run_upload, start_upload
+from parameters.models import PVInverter, PVModule, CEC_Module
+from pvfree import plots
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+TESTDIR = os.path.join(BASEDIR, 'parameters', 'data')
+CEC_MODULES = os.path.join(TESTDIR, 'cec_modules.csv')
+SANDIA_MODULES = os.path.join(TESTDIR, 'sandia_modules.csv')
+CEC_INVERTERS = os.path.join(TESTDIR, 'cec_inverters.csv')
+
+
+class PlotCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.testuser = User.objects.create_superuser(
+            'testuser', 'user@test.com', '@Test123')
+        with open(CEC_INVERTERS, 'rb') as fp:
+            PVInverter.upload(fp, self.testuser, 1)
+        with open(CEC_MODULES, 'rb') as fp:
+            CEC_Module.upload(fp, self.testuser)
+
+    def test_curves(self):
+        pvinv = PVInverter.objects.first()
+        r = self.client.get(f'/pvinverters/{pvinv.pk}/')
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, f'/pvinverters/{pvinv.pk}/curves/')
+        curves = self.client.get(f'/pvinverters/{pvinv.pk}/curves/').json()
+        self.assertEqual(curves['title'], pvinv.Name)
+        self.assertEqual(len(curves['lines']), 3)
+        self.assertEqual(len(curves['lines'][0]['x']), 6)
+        cecmod = CEC_Module.objects.first()
+        curves = self.client.get(f'/cec_modules/{cecmod.pk}/curves/').json()
+        self.assertEqual(len(curves['lines']), 5)
+        self.assertEqual(
+            [m['marker'] for m in curves['markers']],
+            ['square', 'circle', 'triangle'])
+        self.assertEqual(
+            self.client.get('/cec_modules/0/curves/').status_code, 404)
+
+    def test_curves_cache(self):
+        pvinv = PVInverter.objects.first()
+        url = f'/pvinverters/{pvinv.pk}/curves/'
+        compute = mock.Mock(wraps=plots.pvinverter_curves)
+        with mock.patch.dict(plots.CURVES, {PVInverter: compute}):
+            r1 = self.client.get(url)
+            r2 = self.client.get(url)
+            self.assertEqual(compute.call_count, 1)
+            self.assertEqual(r1.json(), r2.json())
+            # edits on the same day change the curves
+            pvinv.Paco *= 2
+            pvinv.save()
+            self.client.get(url)
+            self.assertEqual(compute.call_count, 2)
+
+    def test_warm_plots(self):
+        cecmods = CEC_Module.objects.all()
+        self.assertEqual(plots.warm_plots(CEC_Module), cecmods.count())
+        compute = mock.Mock()
+        with mock.patch.dict(plots.CURVES, {CEC_Module: compute}):
+            for cecmod in cecmods:
+                r = self.client.get(f'/cec_modules/{cecmod.pk}/curves/')
+                self.assertEqual(r.status_code, 200)
+            compute.assert_not_called()
+
+    @override_settings(WARM_PLOTS=True)
+    def test_warm_uploaded_plots(self):
+        with open(CEC_MODULES, 'rb') as fp:
+            data = fp.read().replace(b'A10Green', b'B10Green')
+        job, _ = start_upload(
+            'CEC_Module', SimpleUploadedFile('cec.csv', data), self.testuser)
+        # connected by the app config, without the URLconf
+        with mock.patch('pvfree.plots.warm_plots_async') as warm:
+            job = run_upload(job.pk)
+        warm.assert_called_once_with(CEC_Module, mock.ANY)
+        self.assertEqual(len(warm.call_args.args[1]), job.created)
+
+    def test_surface(self):
+        cecmod = CEC_Module.objects.first()
+        r = self.client.get(f'/cec_modules/{cecmod.pk}/')
+        self.assertContains(r, f'/cec_modules/{cecmod.pk}/surface/')
+        url = f'/cec_modules/{cecmod.pk}/surface/'
+        surface = self.client.get(url).json()
+        self.assertEqual(surface['shape'], list(plots.SURFACE_SHAPE))
+        self.assertEqual(len(surface['z']), plots.SURFACE_SHAPE[0])
+        self.assertEqual(len(surface['z'][0]), plots.SURFACE_SHAPE[1])
+        self.assertLess(surface['low'], surface['high'])
+        # bigger surfaces are downsampled for the browser
+        surface = self.client.get(url, {'ny': 200, 'nx': 400}).json()
+        self.assertEqual(surface['shape'], [200, 400])
+        self.assertEqual(len(surface['y']), plots.DISPLAY_SHAPE[0])
+        self.assertEqual(len(surface['x']), plots.DISPLAY_SHAPE[1])
+        self.assertEqual(len(surface['z']), plots.DISPLAY_SHAPE[0])
+        self.assertEqual(len(surface['z'][0]), plots.DISPLAY_SHAPE[1])
+        for query in ({'nx': 'x'}, {'ny': 1}, {'nx': 1001},
+                      {'ny': 1000, 'nx': 1000}):
+            self.assertEqual(self.client.get(url, query).status_code, 400)
+        pvinv = PVInverter.objects.first()
+        surface = self.client.get(f'/pvinverters/{pvinv.pk}/surface/').json()
+        self.assertEqual(surface['shape'], list(plots.SURFACE_SHAPE))
+
+    def test_downsample(self):
+        values = np.arange(15, dtype=float).reshape(3, 5)
+        values[0, 0] = np.nan
+        result = plots.downsample(values, (2, 2))
+        self.assertEqual(result.shape, (2, 2))
+        self.assertEqual(result[0, 0], np.mean([1, 2, 5, 6, 7]))
+        self.assertEqual(result[1, 1], np.mean([13, 14]))
+        self.assertEqual(plots.downsample(values, (3, 5)).shape, values.shape)
+
+    def test_compare(self):
+        cecmods = list(CEC_Module.objects.order_by('pk')[:3])
+        ids = ','.join(str(cecmod.pk) for cecmod in reversed(cecmods))
+        r = self.client.get('/cec_modules/compare/', {'ids': ids})
+        self.assertContains(r, '/cec_modules/compare/data/')
+        url = '/cec_modules/compare/data/'
+        comparison = self.client.get(url, {'ids': ids}).json()
+        self.assertEqual(
+            [rec['id'] for rec in comparison['records']],
+            [cecmod.pk for cecmod in cecmods])
+        curves = comparison['curves']
+        self.assertEqual(len(curves['lines']), 3)
+        self.assertEqual(len(curves['colors']), 3)
+        self.assertEqual(len(curves['markers'][0]['x']), 3)
+        # the stacked evaluation is the same as the detail page at 25 [C]
+        detail = plots.curve_data(cecmods[0])
+        np.testing.assert_allclose(
+            curves['lines'][0]['y'], detail['lines'][1]['y'])
+        params = {p['name']: p for p in comparison['params']}
+        self.assertEqual(
+            params['STC']['values'], [cecmod.STC for cecmod in cecmods])
+        self.assertTrue(params['STC']['differs'])
+        # cached per set of ids, in any order
+        with self.assertNumQueries(0):
+            r = self.client.get(url, {'ids': ids[::-1]})
+        self.assertEqual(r.json(), comparison)
+        for query in ({}, {'ids': 'x,1'}, {'ids': str(cecmods[0].pk)},
+                      {'ids': ','.join(map(str, range(1, 12)))}):
+            self.assertEqual(self.client.get(url, query).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {'ids': f'{cecmods[0].pk},0'}).status_code,
+            404)
+        pvinvs = PVInverter.objects.order_by('pk')[:2]
+        comparison = self.client.get('/pvinverters/compare/data/', {
+            'ids': ','.join(str(pvinv.pk) for pvinv in pvinvs)}).json()
+        self.assertEqual(len(comparison['curves']['lines']), 2)
+        with open(SANDIA_MODULES, 'rb') as fp:
+            PVModule.upload(fp, self.testuser)
+        pvmods = PVModule.objects.order_by('pk')[:2]
+        comparison = self.client.get('/pvmodules/compare/data/', {
+            'ids': ','.join(str(pvmod.pk) for pvmod in pvmods)}).json()
+        self.assertEqual(len(comparison['curves']['lines']), 2)
+        self.assertEqual(len(comparison['curves']['lines'][0]['y']), 10)
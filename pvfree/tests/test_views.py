@@ -1,23 +1,28 @@
-from pvfree import views
+from django.db.models import Q
+from parameters.models import CEC_Module, PVModule
+from parameters.search import parse_query
+from pvfree import datatables
 
 
-def test__datatables_helper():
+def test_parse_request():
     testdata = dict.fromkeys(TESTDATA)
     for k, v in TESTDATA.items():
         testdata[k] = v[-1]  # django gets the last item in the queryset
-    columns, order = views._datatables_helper(testdata)
+    columns, order = datatables.parse_request(testdata)
     assert columns == COL_EXPECTED
     assert order == ORDER_EXPECTED
 
 
-def test__filter_by_technology():
-    all_silicon_tech = views._filter_by_technology('si')
-    assert all_silicon_tech == [1, 2, 3, 7, 8, 9, 11, 12]
+def test_search_technology():
+    q, free_text = parse_query(CEC_Module, 'tech:si')
+    assert q == Q(Technology__in=[1, 2, 3, 7, 8, 9, 11, 12])
+    assert free_text == []
 
 
-def test__filter_by_cell_material():
-    all_silicon_tech = views._filter_by_cell_material('si')
-    assert all_silicon_tech == [1, 2, 5, 7, 8, 9, 10, 11]
+def test_search_cell_material():
+    q, free_text = parse_query(PVModule, 'tech:si')
+    assert q == Q(Material__in=[1, 2, 5, 7, 8, 9, 10, 11])
+    assert free_text == []
 
 
 # TODO: make these black
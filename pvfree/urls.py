@@ -7,7 +7,9 @@ from parameters import views as param_views
 from django.contrib import admin
 from pvfree.api import (
     solarposition_resource, linke_turbidity_resource, airmass_resource,
-    weather_resource)
+    weather_resource, cec_module_performance_resource,
+    pvmodule_performance_resource, pvinverter_performance_resource,
+    string_sizing_resource, module_ranking_resource)
 
 admin.autodiscover()
 v1_api = Api(api_name='v1')
@@ -21,24 +23,60 @@ v1_api.register(UserResource())
 urlpatterns = [
     re_path(r'^$', pvfree_views.home, name='home'),
     re_path(r'^pvinverters/$', pvfree_views.pvinverters, name='pvinverters'),
+    re_path(r'^pvinverters/export/$', pvfree_views.pvinverters_export,
+        name='pvinverters_export'),
+    re_path(r'^pvinverters/compare/$', pvfree_views.pvinverters_compare,
+        name='pvinverters_compare'),
+    re_path(r'^pvinverters/compare/data/$', pvfree_views.pvinverters_compare_data,
+        name='pvinverters_compare_data'),
+    re_path(r'^pvinverters/changelog/$', pvfree_views.pvinverters_changelog,
+        name='pvinverters_changelog'),
     re_path(r'^pvinverters/(?P<pvinverter_id>\d+)/$',
         pvfree_views.pvinverter_detail, name='pvinverter_detail'),
+    re_path(r'^pvinverters/(?P<pvinverter_id>\d+)/curves/$',
+        pvfree_views.pvinverter_curves, name='pvinverter_curves'),
+    re_path(r'^pvinverters/(?P<pvinverter_id>\d+)/surface/$',
+        pvfree_views.pvinverter_surface, name='pvinverter_surface'),
     re_path(r'^sam_versions/$', pvfree_views.sam_versions,
         name='sam_versions'),
     re_path(r'^pvmodules/$', pvfree_views.pvmodules, name='pvmodules'),
+    re_path(r'^pvmodules/export/$', pvfree_views.pvmodules_export,
+        name='pvmodules_export'),
+    re_path(r'^pvmodules/compare/$', pvfree_views.pvmodules_compare,
+        name='pvmodules_compare'),
+    re_path(r'^pvmodules/compare/data/$', pvfree_views.pvmodules_compare_data,
+        name='pvmodules_compare_data'),
     re_path(r'^pvmodules_tech/$', pvfree_views.pvmodules_tech,
         name='pvmodules_tech'),
     re_path(r'^pvmodules/(?P<pvmodule_id>\d+)/$', pvfree_views.pvmodule_detail,
         name='pvmodule_detail'),
+    re_path(r'^pvmodules/(?P<pvmodule_id>\d+)/curves/$',
+        pvfree_views.pvmodule_curves, name='pvmodule_curves'),
+    re_path(r'^pvmodules/(?P<pvmodule_id>\d+)/surface/$',
+        pvfree_views.pvmodule_surface, name='pvmodule_surface'),
     re_path(r'^cec_modules/$', pvfree_views.cec_modules, name='cec_modules'),
+    re_path(r'^cec_modules/export/$', pvfree_views.cec_modules_export,
+        name='cec_modules_export'),
+    re_path(r'^cec_modules/compare/$', pvfree_views.cec_modules_compare,
+        name='cec_modules_compare'),
+    re_path(r'^cec_modules/compare/data/$', pvfree_views.cec_modules_compare_data,
+        name='cec_modules_compare_data'),
+    re_path(r'^cec_modules/changelog/$', pvfree_views.cec_modules_changelog,
+        name='cec_modules_changelog'),
     re_path(r'^cec_modules_tech/$', pvfree_views.cec_modules_tech,
         name='cec_modules_tech'),
     re_path(r'^cec_modules_versions/$', pvfree_views.cec_modules_versions,
         name='cec_modules_versions'),
     re_path(r'^cec_modules/(?P<cec_module_id>\d+)/$',
         pvfree_views.cec_module_detail, name='cec_module_detail'),
+    re_path(r'^cec_modules/(?P<cec_module_id>\d+)/curves/$',
+        pvfree_views.cec_module_curves, name='cec_module_curves'),
+    re_path(r'^cec_modules/(?P<cec_module_id>\d+)/surface/$',
+        pvfree_views.cec_module_surface, name='cec_module_surface'),
     re_path(r'^pvlib/$', pvfree_views.pvlib, name='pvlib'),
     re_path(r'^upload/$', param_views.file_upload, name='file_upload'),
+    re_path(r'^upload/jobs/(?P<job_id>\d+)/$', param_views.upload_job,
+        name='upload_job'),
     re_path(r'^api/', include(v1_api.urls)),
     re_path(r'^api/v1/pvlib/weather/$', weather_resource, name='weather'),
     re_path(r'^api/v1/pvlib/solarposition/$', solarposition_resource,
@@ -46,6 +84,16 @@ urlpatterns = [
     re_path(r'^api/v1/pvlib/linke-turbidity/$', linke_turbidity_resource,
         name='linke_turbidity'),
     re_path(r'^api/v1/pvlib/airmass/$', airmass_resource, name='airmass'),
+    re_path(r'^api/v1/pvlib/cec-module-performance/$',
+        cec_module_performance_resource, name='cec_module_performance'),
+    re_path(r'^api/v1/pvlib/pvmodule-performance/$',
+        pvmodule_performance_resource, name='pvmodule_performance'),
+    re_path(r'^api/v1/pvlib/pvinverter-performance/$',
+        pvinverter_performance_resource, name='pvinverter_performance'),
+    re_path(r'^api/v1/pvlib/string-sizing/$', string_sizing_resource,
+        name='string_sizing'),
+    re_path(r'^api/v1/pvlib/module-ranking/$', module_ranking_resource,
+        name='module_ranking'),
     re_path(r'^admin/', admin.site.urls),
 ]
 
@@ -1,167 +1,168 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-from django.db.models.functions import Lower
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from urllib.parse import urlencode
 from parameters.models import PVInverter, PVModule, CEC_Module
-from bokeh.plotting import figure
-from bokeh.models import Legend, LegendItem
-from bokeh.embed import components
-from bokeh.resources import CDN as bokeh_CDN
-from bokeh.palettes import Colorblind5 as cmap
+from parameters.versions import changelog_data, version_choices
+from bokeh.resources import Resources
 from pvfree.forms import (
     SolarPositionForm, LinkeTurbidityForm, AirmassForm, WeatherForm)
-from pvlib.pvsystem import sapm, calcparams_cec, singlediode, inverter
-from pvlib.singlediode import bishop88
-import numpy as np
-import re
+from pvfree.datatables import DatatablesBackend
+from pvfree.export import export_response
+from pvfree.plots import (
+    MAX_COMPARE, MAX_SURFACE_POINTS, MAX_SURFACE_SHAPE, SURFACE_SHAPE,
+    compare_data, curve_data, record_dict, surface_data)
+
+# BokehJS with the API to draw the detail page curves in the browser
+BOKEH_RESOURCES = Resources(mode='cdn', components=['bokeh', 'bokeh-api'])
 
 
 def home(request):
     return render(request, 'index.html', {'path': request.path})
 
 
-def _datatables_helper(post_request):
-    """
-    Parse Datatables.net serverSide arguments
-    See: https://datatables.net/manual/server-side
-    """
-    columns = []
-    order = []
-    for k, v in post_request.items():
-        if k.startswith('columns'):
-            m = re.match('^columns\[(\d+)](.+)$', k)
-            col_idx, col_key = m.groups()
-            col_idx = int(col_idx)
-            try:
-                columns[col_idx][col_key] = v
-            except IndexError:
-                columns.append({col_key: v})
-        elif k.startswith('order'):
-            m = re.match('^order\[(\d+)](.+)$', k)
-            order_idx, order_key = m.groups()
-            order_idx = int(order_idx)
-            try:
-                order[order_idx][order_key] = v
-            except IndexError:
-                order.append({order_key: v})
-    return columns, order
+PVINVERTER_TABLE = DatatablesBackend(PVInverter, (
+    'Name', 'Vac', 'Paco', 'Vdco', 'Pdco', 'Pso', 'Pnt', 'Vdcmax', 'Idcmax',
+    'Mppt_low', 'Mppt_high', 'CEC_Date', 'CEC_Type', 'Manufacturer',
+    'Vintage', 'Source', 'cec_efficiency', 'euro_efficiency'))
+PVMODULE_TABLE = DatatablesBackend(PVModule, (
+    'Name', 'Vintage', 'Area', 'Material', 'Cells_in_Series',
+    'Parallel_Strings', 'Isco', 'Voco', 'Impo', 'Vmpo', 'Aisc', 'Aimp',
+    'Bvoco', 'Bvmpo', 'nameplate', 'fill_factor', 'module_eff', 'noct',
+    'low_irradiance_eff', 'pmp_noct'))
+CEC_MODULE_TABLE = DatatablesBackend(CEC_Module, (
+    'Name', 'Date', 'Bifacial', 'T_NOCT', 'A_c', 'N_s', 'I_sc_ref',
+    'V_oc_ref', 'I_mp_ref', 'V_mp_ref', 'Technology', 'STC', 'nameplate',
+    'low_irradiance_eff', 'pmp_noct'))
+
+
+def _surface_response(obj, query):
+    """Surface of ``obj`` with ``ny`` rows and ``nx`` columns from GET."""
+    shape = []
+    for arg, default, max_n in zip(
+            ('ny', 'nx'), SURFACE_SHAPE, MAX_SURFACE_SHAPE):
+        try:
+            n = int(query.get(arg, default))
+        except ValueError:
+            n = 0
+        if not 2 <= n <= max_n:
+            return JsonResponse(
+                {'error': f'{arg} must be an integer from 2 to {max_n}'},
+                status=400)
+        shape.append(n)
+    if shape[0] * shape[1] > MAX_SURFACE_POINTS:
+        return JsonResponse(
+            {'error': f'nx * ny must be at most {MAX_SURFACE_POINTS}'},
+            status=400)
+    return JsonResponse(surface_data(obj, tuple(shape)))
+
+
+def _compare_ids(query):
+    """Record ids from the comma separated ``ids`` GET argument."""
+    try:
+        ids = {int(pk) for pk in query.get('ids', '').split(',')}
+    except ValueError:
+        return None
+    return sorted(ids) if 2 <= len(ids) <= MAX_COMPARE else None
+
+
+def _compare_error():
+    return JsonResponse(
+        {'error': f'ids must be 2 to {MAX_COMPARE} comma separated integers'},
+        status=400)
+
+
+def _compare_page(request, title, description, name):
+    """Page that draws the comparison of records from the ``ids``."""
+    ids = _compare_ids(request.GET)
+    if ids is None:
+        return _compare_error()
+    return render(
+        request, 'compare.html', {
+            'path': request.path, 'title': title,
+            'description': description,
+            'data_url': reverse(f'{name}_compare_data'),
+            'detail_url': reverse(name),
+            'query': urlencode({'ids': ','.join(map(str, ids))}),
+            'bokeh_resources': BOKEH_RESOURCES})
+
+
+def _changelog_response(model, query):
+    """Changelog of ``model`` between the ``from`` and ``to`` versions."""
+    versions = dict(model._meta.get_field(model.VERSION_FIELD).choices)
+    try:
+        old, new = int(query['from']), int(query['to'])
+    except (KeyError, ValueError):
+        old = new = None
+    if old not in versions or new not in versions:
+        return JsonResponse(
+            {'error': 'from and to must be versions in {}'.format(
+                sorted(versions))}, status=400)
+    return JsonResponse(changelog_data(model, old, new))
+
+
+def _compare_response(model, query):
+    """Comparison of the records with ``ids`` from GET."""
+    ids = _compare_ids(query)
+    if ids is None:
+        return _compare_error()
+    comparison = compare_data(model, ids)
+    if comparison is None:
+        raise Http404(f'No {model._meta.object_name} matches the given ids.')
+    return JsonResponse(comparison)
 
 
 def pvinverters(request):
     if request.method == 'GET':
         # using datatables.net with ajax to return values from POST
-        return render(request, 'pvinverters.html', {'path': request.path})
+        return render(
+            request, 'pvinverters.html', {
+                'path': request.path,
+                'versions': version_choices(PVInverter)})
     elif request.method == 'POST':
-        columns, order = _datatables_helper(request.POST)
-        draw = int(request.POST.get('draw'))
-        start = int(request.POST.get('start'))
-        length = int(request.POST.get('length'))
-        search_value = request.POST.get('search[value]')
-        limit = start+length
-        total_records = PVInverter.objects.count()
-        if search_value:
-            pvinv_set = (
-                PVInverter.objects.filter(Name__icontains=search_value)
-                | PVInverter.objects.filter(Vac__icontains=search_value)
-                | PVInverter.objects.filter(Paco__icontains=search_value)
-                | PVInverter.objects.filter(Vdco__icontains=search_value)
-                | PVInverter.objects.filter(Pdco__icontains=search_value)
-                | PVInverter.objects.filter(Pso__icontains=search_value)
-                | PVInverter.objects.filter(Pnt__icontains=search_value)
-                | PVInverter.objects.filter(Vdcmax__icontains=search_value)
-                | PVInverter.objects.filter(Idcmax__icontains=search_value)
-                | PVInverter.objects.filter(Mppt_low__icontains=search_value)
-                | PVInverter.objects.filter(Mppt_high__icontains=search_value)
-                | PVInverter.objects.filter(CEC_Date__icontains=search_value)
-                | PVInverter.objects.filter(CEC_Type__icontains=search_value))
-        else:
-            pvinv_set = PVInverter.objects.all()
-        # TODO: move boilerplate to function, redundant with cec_module
-        col_data = [col["[data]"] for col in columns]
-        if len(order):
-            order_by_list = [
-                ("-" if o['[dir]']=='desc' else "")+col_data[int(o['[column]'])]
-                for o in order]
-            # XXX: -Name yields "a" first instead of "Z" !
-            # handle case-sensitivity descending order for string fields
-            if '-Name' in order_by_list:
-                name_idx = order_by_list.index('-Name')
-                order_by_list[name_idx] = Lower('Name').desc()
-        else:
-            order_by_list = []
-        pvinv_set = pvinv_set.order_by(*order_by_list)
-        filtered_records = pvinv_set.count()
-        data = [{
-            'id': pvinv.id,
-            'Name': pvinv.Name,
-            'Vac': pvinv.Vac,
-            'Paco': pvinv.Paco,
-            'Vdco': pvinv.Vdco,
-            'Pdco': pvinv.Pdco,
-            'Pso': pvinv.Pso,
-            'Pnt': pvinv.Pnt,
-            'Vdcmax': pvinv.Vdcmax,
-            'Idcmax': pvinv.Idcmax,
-            'Mppt_low': pvinv.Mppt_low,
-            'Mppt_high': pvinv.Mppt_high,
-            'CEC_Date': pvinv.CEC_Date,
-            'CEC_Type': pvinv.CEC_Type}
-            for pvinv in pvinv_set[start:limit]]
-        response = {
-            'draw': draw,
-            'recordsTotal': total_records,
-            'recordsFiltered': filtered_records,
-            'data': data}
-        return JsonResponse(response)
+        return PVINVERTER_TABLE.response(request.POST)
+
+
+def pvinverters_export(request):
+    return export_response(PVINVERTER_TABLE, request.GET, 'pvinverters')
+
+
+def pvinverters_compare(request):
+    return _compare_page(
+        request, 'PV Inverters', 'Efficiency vs. DC power at nominal voltage.',
+        'pvinverters')
+
+
+def pvinverters_compare_data(request):
+    return _compare_response(PVInverter, request.GET)
+
+
+def pvinverters_changelog(request):
+    return _changelog_response(PVInverter, request.GET)
 
 
 def pvinverter_detail(request, pvinverter_id):
     pvinv = get_object_or_404(PVInverter, pk=pvinverter_id)
-    fieldnames = PVInverter._meta.get_fields()
-    pvinv_dict = {k.name: getattr(pvinv, k.name) for k in fieldnames}
-    dc_voltages = [pvinv.Mppt_low, pvinv.Vdco, pvinv.Mppt_high]
-    pwr_lvl = np.array([0.1, 0.2, 0.3, 0.5, 0.75, 1])
-    dc_power = pvinv.Pdco * pwr_lvl
-    dc_power, dc_voltage = np.meshgrid(dc_power, dc_voltages)
-    pac = inverter.sandia(dc_voltage, dc_power, pvinv_dict)
-    eff = pac / dc_power
-    eff_disp = 100*eff
-    if pvinv.Paco > 1000:
-        dc_power_disp = dc_power/1000
-        disp_units = 'kW'
-    else:
-        dc_power_disp = dc_power
-        disp_units = 'W'
-    fig = figure(
-        x_axis_label=f'DC power, Pdc [{disp_units}]',
-        y_axis_label='efficiency [%]',
-        title=pvinv.Name,
-        width=800, height=600, sizing_mode='scale_width')
-    r = fig.multi_line(
-        dc_power_disp.tolist(), eff_disp.tolist(), color=cmap[:3], line_width=4)
-    legend = Legend(items=[
-        LegendItem(label='{:d} [V]'.format(int(vdc)), renderers=[r], index=n)
-        for n, vdc in enumerate(dc_voltages)])
-    fig.add_layout(legend)
-    plot_script, plot_div = components(fig)
+    pvinv_dict = record_dict(pvinv)
     return render(
         request, 'pvinverter_detail.html', {
-            'path': request.path, 'pvinv': pvinv, 'plot_script': plot_script,
-            'plot_div': plot_div, 'pvinv_dict': pvinv_dict,
-            'bokeh_resources': bokeh_CDN})
+            'path': request.path, 'pvinv': pvinv, 'pvinv_dict': pvinv_dict,
+            'bokeh_resources': BOKEH_RESOURCES})
 
 
-def sam_versions(request):
-    return JsonResponse(dict(PVInverter.SAM_VERSION))
+def pvinverter_curves(request, pvinverter_id):
+    pvinv = get_object_or_404(PVInverter, pk=pvinverter_id)
+    return JsonResponse(curve_data(pvinv))
+
+
+def pvinverter_surface(request, pvinverter_id):
+    pvinv = get_object_or_404(PVInverter, pk=pvinverter_id)
+    return _surface_response(pvinv, request.GET)
 
 
-def _filter_by_cell_material(search_term):
-    search_term = str(search_term).lower()
-    search_results = []
-    for cell_mat, idx in PVModule.CELL_TYPES.items():
-        if search_term in cell_mat.lower():
-            search_results.append(idx)
-    return search_results
+def sam_versions(request):
+    return JsonResponse(dict(PVInverter.SAM_VERSION))
 
 
 def pvmodules(request):
@@ -169,184 +170,62 @@ def pvmodules(request):
         # using datatables.net with ajax to return values from API
         return render(request, 'pvmodules.html', {'path': request.path})
     elif request.method == 'POST':
-        columns, order = _datatables_helper(request.POST)
-        draw = int(request.POST.get('draw'))
-        start = int(request.POST.get('start'))
-        length = int(request.POST.get('length'))
-        search_value = request.POST.get('search[value]')
-        limit = start+length
-        total_records = PVModule.objects.count()
-        if search_value:
-            cell_mat_search = _filter_by_cell_material(search_value)
-            pvmod_set = (
-                PVModule.objects.filter(Name__icontains=search_value)
-                | PVModule.objects.filter(Vintage__icontains=search_value)
-                | PVModule.objects.filter(Area__icontains=search_value)
-                | PVModule.objects.filter(Material__in=cell_mat_search)
-                | PVModule.objects.filter(Cells_in_Series__icontains=search_value)
-                | PVModule.objects.filter(Parallel_Strings__icontains=search_value)
-                | PVModule.objects.filter(Isco__icontains=search_value)
-                | PVModule.objects.filter(Voco__icontains=search_value)
-                | PVModule.objects.filter(Impo__icontains=search_value)
-                | PVModule.objects.filter(Vmpo__icontains=search_value)
-                | PVModule.objects.filter(Aisc__icontains=search_value)
-                | PVModule.objects.filter(Aimp__icontains=search_value)
-                | PVModule.objects.filter(Bvoco__icontains=search_value)
-                | PVModule.objects.filter(Bvmpo__icontains=search_value))
-        else:
-            pvmod_set = PVModule.objects.all()
-        # TODO: move boilerplate to function, redundant with cec_module
-        col_data = [col["[data]"] for col in columns]
-        if len(order):
-            order_by_list = [
-                ("-" if o['[dir]']=='desc' else "")+col_data[int(o['[column]'])]
-                for o in order]
-            # XXX: -Name yields "a" first instead of "Z" !
-            # handle case-sensitivity descending order for string fields
-            if '-Name' in order_by_list:
-                name_idx = order_by_list.index('-Name')
-                order_by_list[name_idx] = Lower('Name').desc()
-            # Material is an integer field not string
-        else:
-            order_by_list = []
-        pvmod_set = pvmod_set.order_by(*order_by_list)
-        filtered_records = pvmod_set.count()
-        data = [{
-            'id': pvmod.id,
-            'Name': pvmod.Name,
-            'Vintage': pvmod.Vintage,
-            'Area': pvmod.Area,
-            'Material': pvmod.get_Material_display(),
-            'Cells_in_Series': pvmod.Cells_in_Series,
-            'Parallel_Strings': pvmod.Parallel_Strings,
-            'Isco': pvmod.Isco,
-            'Voco': pvmod.Voco,
-            'Impo': pvmod.Impo,
-            'Vmpo': pvmod.Vmpo,
-            'Aisc': pvmod.Aisc,
-            'Aimp': pvmod.Aimp,
-            'Bvoco': pvmod.Bvoco,
-            'Bvmpo': pvmod.Bvmpo}
-            for pvmod in pvmod_set[start:limit]]
-        response = {
-            'draw': draw,
-            'recordsTotal': total_records,
-            'recordsFiltered': filtered_records,
-            'data': data}
-        return JsonResponse(response)
+        return PVMODULE_TABLE.response(request.POST)
+
+
+def pvmodules_export(request):
+    return export_response(PVMODULE_TABLE, request.GET, 'pvmodules')
 
 
 def pvmodules_tech(request):
     return JsonResponse(PVModule.TECH_DICT)
 
 
+def pvmodules_compare(request):
+    return _compare_page(
+        request, 'PV Modules', 'Efficiency vs. irradiance at 25 [C].',
+        'pvmodules')
+
+
+def pvmodules_compare_data(request):
+    return _compare_response(PVModule, request.GET)
+
+
 def pvmodule_detail(request, pvmodule_id):
     pvmod = get_object_or_404(PVModule, pk=pvmodule_id)
-    fieldnames = PVModule._meta.get_fields()
-    pvmod_dict = {k.name: getattr(pvmod, k.name) for k in fieldnames}
+    pvmod_dict = record_dict(pvmod)
     for k in ['IXO', 'IXXO', 'C4', 'C5', 'C6', 'C7']:
         if pvmod_dict[k] is None:
             pvmod_dict[k] = 0.
-    celltemps = np.linspace(0, 100, 5)  # [C]
-    effirrad = np.linspace(100, 1000, 10)  # [W/m2]
-    effirrad, celltemp = np.meshgrid(effirrad, celltemps)
-    # Ee in [W/m2] pvlib>=0.7, in suns for pvlib<0.7
-    results = sapm(effirrad, celltemp, pvmod_dict)
-    eff = results['p_mp'] / effirrad / pvmod.Area * 100
-    fig = figure(
-        x_axis_label='effective irradiance, Ee [W/m' + u"\u00B2" + ']',
-        y_axis_label='efficiency [%]',
-        title=pvmod.Name,
-        width=800, height=600, sizing_mode='scale_width'
-    )
-    r = fig.multi_line(
-        effirrad.tolist(), eff.tolist(), color=cmap, line_width=4)
-    legend = Legend(items=[
-        LegendItem(label='{:d} [C]'.format(int(ct)), renderers=[r], index=n)
-        for n, ct in enumerate(celltemps)])
-    fig.add_layout(legend)
-    plot_script, plot_div = components(fig)
     return render(
         request, 'pvmodule_detail.html', {
-            'path': request.path, 'pvmod': pvmod, 'plot_script': plot_script,
-            'plot_div': plot_div, 'pvmod_dict': pvmod_dict,
-            'bokeh_resources': bokeh_CDN})
+            'path': request.path, 'pvmod': pvmod, 'pvmod_dict': pvmod_dict,
+            'bokeh_resources': BOKEH_RESOURCES})
+
+
+def pvmodule_curves(request, pvmodule_id):
+    pvmod = get_object_or_404(PVModule, pk=pvmodule_id)
+    return JsonResponse(curve_data(pvmod))
 
 
-def _filter_by_technology(search_term):
-    search_term = str(search_term).lower()
-    search_results = []
-    for tech, idx in CEC_Module.TECH_TYPES.items():
-        if search_term in tech.lower():
-            search_results.append(idx)
-    return search_results
+def pvmodule_surface(request, pvmodule_id):
+    pvmod = get_object_or_404(PVModule, pk=pvmodule_id)
+    return _surface_response(pvmod, request.GET)
 
 
 def cec_modules(request):
     if request.method == 'GET':
         # using datatables.net with ajax to return values from POST
-        return render(request, 'cec_modules.html', {'path': request.path})
+        return render(
+            request, 'cec_modules.html', {
+                'path': request.path,
+                'versions': version_choices(CEC_Module)})
     elif request.method == 'POST':
-        columns, order = _datatables_helper(request.POST)
-        draw = int(request.POST.get('draw'))
-        start = int(request.POST.get('start'))
-        length = int(request.POST.get('length'))
-        search_value = request.POST.get('search[value]')
-        limit = start+length
-        total_records = CEC_Module.objects.count()
-        if search_value:
-            tech_search = _filter_by_technology(search_value)
-            cecmod_set = (
-                CEC_Module.objects.filter(Name__icontains=search_value)
-                | CEC_Module.objects.filter(Date__icontains=search_value)
-                | CEC_Module.objects.filter(Bifacial__icontains=search_value)
-                | CEC_Module.objects.filter(T_NOCT__icontains=search_value)
-                | CEC_Module.objects.filter(A_c__icontains=search_value)
-                | CEC_Module.objects.filter(N_s__icontains=search_value)
-                | CEC_Module.objects.filter(I_sc_ref__icontains=search_value)
-                | CEC_Module.objects.filter(V_oc_ref__icontains=search_value)
-                | CEC_Module.objects.filter(I_mp_ref__icontains=search_value)
-                | CEC_Module.objects.filter(V_mp_ref__icontains=search_value)
-                | CEC_Module.objects.filter(Technology__in=tech_search)
-                | CEC_Module.objects.filter(STC__icontains=search_value))
-        else:
-            cecmod_set = CEC_Module.objects.all()
-        col_data = [col["[data]"] for col in columns]
-        if len(order):
-            order_by_list = [
-                ("-" if o['[dir]']=='desc' else "")+col_data[int(o['[column]'])]
-                for o in order]
-            # XXX: -Name yields "a" first instead of "Z" !
-            # handle case-sensitivity descending order for string fields
-            if '-Name' in order_by_list:
-                name_idx = order_by_list.index('-Name')
-                order_by_list[name_idx] = Lower('Name').desc()
-            # Technology is an integer field not string
-        else:
-            order_by_list = []
-        cecmod_set = cecmod_set.order_by(*order_by_list)
-        filtered_records = cecmod_set.count()
-        data = [{
-            'id': cecmod.id,
-            'Name': cecmod.Name,
-            'Date': cecmod.Date,
-            'Bifacial': cecmod.Bifacial,
-            'T_NOCT': cecmod.T_NOCT,
-            'A_c': cecmod.A_c,
-            'N_s': cecmod.N_s,
-            'I_sc_ref': cecmod.I_sc_ref,
-            'V_oc_ref': cecmod.V_oc_ref,
-            'I_mp_ref': cecmod.I_mp_ref,
-            'V_mp_ref': cecmod.V_mp_ref,
-            'Technology': cecmod.get_Technology_display(),
-            'STC': cecmod.STC,}
-            for cecmod in cecmod_set[start:limit]]
-        response = {
-            'draw': draw,
-            'recordsTotal': total_records,
-            'recordsFiltered': filtered_records,
-            'data': data}
-        return JsonResponse(response)
+        return CEC_MODULE_TABLE.response(request.POST)
+
+
+def cec_modules_export(request):
+    return export_response(CEC_MODULE_TABLE, request.GET, 'cec_modules')
 
 
 def cec_modules_tech(request):
@@ -357,68 +236,41 @@ def cec_modules_versions(request):
     return JsonResponse(dict(CEC_Module.VERSION))
 
 
-def _get_ivcurve(v_oc, params, ivcurve_pnts=100):
-    logspace_pts = np.logspace(np.log10(11.0), 0.0, ivcurve_pnts)
-    return bishop88(v_oc * (11.0 - logspace_pts) / 10.0, *params)
+def cec_modules_compare(request):
+    return _compare_page(
+        request, 'CEC Modules', 'Module IV-curves at standard test conditions.',
+        'cec_modules')
+
+
+def cec_modules_compare_data(request):
+    return _compare_response(CEC_Module, request.GET)
+
+
+def cec_modules_changelog(request):
+    return _changelog_response(CEC_Module, request.GET)
 
 
 def cec_module_detail(request, cec_module_id):
     cec_mod = get_object_or_404(CEC_Module, pk=cec_module_id)
-    fieldnames = CEC_Module._meta.get_fields()
-    cec_mod_dict = {k.name: getattr(cec_mod, k.name) for k in fieldnames}
-    # for k in ['IXO', 'IXXO', 'C4', 'C5', 'C6', 'C7']:
-    #     if cec_mod_dict[k] is None:
-    #         cec_mod_dict[k] = 0.
-    celltemps = [0.0, 25.0, 50.0, 75.0, 100.0]
-    effirrad = 1000
-    results = []
-    for tc in celltemps:
-        params = calcparams_cec(
-            effective_irradiance=effirrad, temp_cell=tc,
-            alpha_sc=cec_mod_dict['alpha_sc'],
-            a_ref=cec_mod_dict['a_ref'],
-            I_L_ref=cec_mod_dict['I_L_ref'],
-            I_o_ref=cec_mod_dict['I_o_ref'],
-            R_sh_ref=cec_mod_dict['R_sh_ref'],
-            R_s=cec_mod_dict['R_s'],
-            Adjust=cec_mod_dict['Adjust'])
-        result = singlediode(*params, method='newton')
-        # ivcurve_pnts deprecated in pvlib-0.10
-        ivp = _get_ivcurve(result['v_oc'], params)
-        result['i'], result['v'], result['p'] = ivp
-        results.append(result)
-    current = np.concatenate([r['i'].reshape(1, 100) for r in results], axis=0)
-    voltage = np.concatenate([r['v'].reshape(1, 100) for r in results], axis=0)
-    # eff = results['p_mp'] / effirrad / cec_mod.Area * 100 / 1000
-    fig = figure(
-        x_axis_label='voltage, V [V]',
-        y_axis_label='current, I [A]',
-        title=cec_mod.Name,
-        width=800, height=600, sizing_mode='scale_width'
-    )
-    plot = fig.multi_line(
-        voltage.tolist(), current.tolist(), color=cmap, line_width=4)
-    legend = Legend(items=[
-        LegendItem(label='{:d} [C]'.format(int(ct)), renderers=[plot], index=n)
-        for n, ct in enumerate(celltemps)])
-    fig.scatter(
-        0, [r['i_sc'] for r in results], size=15, color=cmap, marker='square')
-    fig.scatter(
-        [r['v_oc'] for r in results], 0, size=15, color=cmap)
-    fig.scatter(
-        [r['v_mp'] for r in results], [r['i_mp'] for r in results], size=15,
-        color=cmap, marker='triangle')
-    fig.add_layout(legend)
-    plot_script, plot_div = components(fig)
+    cec_mod_dict = record_dict(cec_mod)
     return render(
         request, 'cec_module_detail.html', {
             'path': request.path, 'cec_mod': cec_mod,
-            'plot_script': plot_script, 'plot_div': plot_div,
-            'bokeh_resources': bokeh_CDN,
+            'bokeh_resources': BOKEH_RESOURCES,
             'cec_mod_dict': cec_mod_dict,
             'cec_mod_tech': dict(CEC_Module.TECH)})
 
 
+def cec_module_curves(request, cec_module_id):
+    cec_mod = get_object_or_404(CEC_Module, pk=cec_module_id)
+    return JsonResponse(curve_data(cec_mod))
+
+
+def cec_module_surface(request, cec_module_id):
+    cec_mod = get_object_or_404(CEC_Module, pk=cec_module_id)
+    return _surface_response(cec_mod, request.GET)
+
+
 def pvlib(request):
     FORMS = {
         'weatherform': WeatherForm, 'solposform': SolarPositionForm,